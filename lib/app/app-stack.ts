@@ -1,12 +1,15 @@
 import { Stack, StackProps, RemovalPolicy, CustomResource, Duration } from 'aws-cdk-lib';
 import { Construct } from 'constructs';
-import { Runtime, Code, Tracing, SingletonFunction } from 'aws-cdk-lib/aws-lambda';
+import { Runtime, Code, Tracing, SingletonFunction, Function } from 'aws-cdk-lib/aws-lambda';
 import { PythonFunction, PythonLayerVersion } from '@aws-cdk/aws-lambda-python-alpha';
 import { RetentionDays } from 'aws-cdk-lib/aws-logs';
 import { OpenApiGatewayToLambda } from '@aws-solutions-constructs/aws-openapigateway-lambda';
 import { Asset } from 'aws-cdk-lib/aws-s3-assets';
 import { Table, AttributeType, BillingMode, ProjectionType } from "aws-cdk-lib/aws-dynamodb";
 import { Effect, Policy, PolicyDocument, PolicyStatement, Role, ServicePrincipal } from "aws-cdk-lib/aws-iam";
+import { Queue } from 'aws-cdk-lib/aws-sqs';
+import { Bucket, BlockPublicAccess, BucketEncryption } from 'aws-cdk-lib/aws-s3';
+import { SqsEventSource } from 'aws-cdk-lib/aws-lambda-event-sources';
 import { AppCognitoPool } from './cognito';
 
 
@@ -48,6 +51,8 @@ export class ApiSecurityAppStack extends Stack {
         type: AttributeType.STRING
       },
       billingMode: BillingMode.PAY_PER_REQUEST,
+      // Expiry of the idempotency key records of place_order
+      timeToLiveAttribute: "expiresAt",
       removalPolicy: this.removalPolicy,
     })
     table.addGlobalSecondaryIndex({
@@ -85,6 +90,14 @@ export class ApiSecurityAppStack extends Stack {
       layerVersionName: `${props.prefix}-helpers-layer`,
       removalPolicy: RemovalPolicy.RETAIN, // we need to keep the old layer version otherwise the custom resource will fail
     });
+    // NumPy is only used by aggregation_helpers (get_service_stats), it is deployed in its own
+    // layer so that the other functions do not ship it
+    const aggregationLayer = new PythonLayerVersion(this, 'aggregationLayer', {
+      entry: './resources/lambdas/aggregation_layer',
+      description: `${props.prefix}-aggregation Lambda Layer`,
+      compatibleRuntimes: [props.runtime],
+      layerVersionName: `${props.prefix}-aggregation-layer`,
+    });
 
     //
     // Cognito
@@ -103,6 +116,28 @@ export class ApiSecurityAppStack extends Stack {
       path: './resources/openapi/api-definition.yaml'
     });
 
+    //
+    // Optional asynchronous order placement (deploy with `-c asyncOrders=true`)
+    // place_order queues the orders and the process_orders_queue function places them in bulk
+    //
+    const asyncOrders = ['true', true].includes(this.node.tryGetContext('asyncOrders'));
+    const ordersDeadLetterQueue = asyncOrders ? new Queue(this, 'OrdersDeadLetterQueue', {
+      queueName: `${this.prefix}-orders-dlq`,
+      retentionPeriod: Duration.days(14),
+    }) : undefined;
+    const ordersQueue = ordersDeadLetterQueue ? new Queue(this, 'OrdersQueue', {
+      queueName: `${this.prefix}-orders`,
+      // At least 6 times the timeout of the consumer function
+      visibilityTimeout: Duration.minutes(6),
+      deadLetterQueue: {
+        queue: ordersDeadLetterQueue,
+        maxReceiveCount: 5,
+      },
+    }) : undefined;
+
+    // The API handlers time their phases and return them in a Server-Timing header and as
+    // PhaseDuration metrics when deployed with `-c phaseTiming=true`
+    const phaseTiming = ['true', true].includes(this.node.tryGetContext('phaseTiming'));
     const default_lambda_props = {
       runtime: this.runtime,
       handler: 'main.lambda_handler',
@@ -113,78 +148,75 @@ export class ApiSecurityAppStack extends Stack {
         CORS_ORIGIN: 'temp-value',
         TABLE_NAME: table.tableName,
         COGNITO_USER_POOL_ID: cognito.userPool.userPoolId,
+        ...(ordersQueue ? { ORDERS_QUEUE_URL: ordersQueue.queueUrl } : {}),
+        ...(phaseTiming ? { SERVER_TIMING_HEADER: 'true', PHASE_METRICS: 'true' } : {}),
       },
       timeout: Duration.seconds(10)
     };
 
+    if (ordersQueue) {
+      const processOrdersQueueFunction = new Function(this, 'ProcessOrdersQueue', {
+        ...default_lambda_props,
+        functionName: `${this.prefix}-process-orders-queue`,
+        code: Code.fromAsset('./resources/lambdas/process_orders_queue'),
+        timeout: Duration.minutes(1),
+      });
+      processOrdersQueueFunction.addEventSource(new SqsEventSource(ordersQueue, {
+        batchSize: 25,
+        maxBatchingWindow: Duration.seconds(1),
+        reportBatchItemFailures: true,
+      }));
+      table.grantReadWriteData(processOrdersQueueFunction);
+    }
+
+    // The API can either be served by one Lambda function per route (default) or by a single
+    // router Lambda function dispatching all the routes (deploy with `-c apiRouter=true`),
+    // which shares the warm containers, clients and caches between the routes.
+    const apiRoutes = [
+      { id: 'list-products', functionName: 'list-products', folder: 'list_products' },
+      { id: 'place-order', functionName: 'place-order', folder: 'place_order' },
+      { id: 'place-orders-batch', functionName: 'place-orders-batch', folder: 'place_orders_batch' },
+      { id: 'get-order', functionName: 'get-order', folder: 'get_order' },
+      { id: 'get-order-status', functionName: 'get-order-status', folder: 'get_order_status' },
+      { id: 'get-orders', functionName: 'get-orders', folder: 'get_orders' },
+      { id: 'list-customer-orders', functionName: 'list-customer-orders', folder: 'list_customer_orders' },
+      { id: 'get-shop', functionName: 'get-shop', folder: 'get_shop' },
+      { id: 'get-shops', functionName: 'get-shops', folder: 'get_shops' },
+      { id: 'regenerate-token', functionName: 'regenerate-shop-token', folder: 'regenerate_shop_token' },
+      { id: 'list-orders', functionName: 'list-shop-orders', folder: 'list_shop_orders' },
+      { id: 'get-sales', functionName: 'get-shop-sales', folder: 'get_shop_sales' },
+      { id: 'get-service-stats', functionName: 'get-service-stats', folder: 'get_service_stats', layers: [aggregationLayer] },
+    ];
+    const apiRouterMode = ['true', true].includes(this.node.tryGetContext('apiRouter'));
+    const apiRouterFunction = apiRouterMode ? new Function(this, 'ApiRouter', {
+      ...default_lambda_props,
+      layers: [helpersLayer, aggregationLayer],
+      functionName: `${this.prefix}-api-router`,
+      handler: 'router/main.lambda_handler',
+      // The router imports the api_* functions of the route folders
+      code: Code.fromAsset('./resources/lambdas', {
+        exclude: ['helpers_layer', 'aggregation_layer', 'migrations', 'export_orders', 'prefill_table_with_testdata', 'set_test_users_password'],
+      }),
+      environment: {
+        ...default_lambda_props.environment,
+        POWERTOOLS_METRICS_NAMESPACE: `${this.prefix}-api`,
+      },
+    }) : undefined;
+
     const apiGatwayToLambda = new OpenApiGatewayToLambda(this, 'OpenApiGatewayToLambda', {
       apiDefinitionAsset,
-      apiIntegrations: [
-        {
-          id: 'list-products',
-          lambdaFunctionProps: {
-            ...default_lambda_props,
-            functionName: `${this.prefix}-list-products`,
-            code: Code.fromAsset('./resources/lambdas/list_products'),
-          }
-        },
-        {
-          id: 'place-order',
-          lambdaFunctionProps: {
-            ...default_lambda_props,
-            functionName: `${this.prefix}-place-order`,
-            code: Code.fromAsset('./resources/lambdas/place_order')
-          }
-        },
-        {
-          id: 'get-order',
-          lambdaFunctionProps: {
-            ...default_lambda_props,
-            functionName: `${this.prefix}-get-order`,
-            code: Code.fromAsset('./resources/lambdas/get_order'),
-          }
-        },
-        {
-          id: 'get-shop',
-          lambdaFunctionProps: {
-            ...default_lambda_props,
-            functionName: `${this.prefix}-get-shop`,
-            code: Code.fromAsset('./resources/lambdas/get_shop'),
-          }
-        },
-        {
-          id: 'regenerate-token',
-          lambdaFunctionProps: {
-            ...default_lambda_props,
-            functionName: `${this.prefix}-regenerate-shop-token`,
-            code: Code.fromAsset('./resources/lambdas/regenerate_shop_token'),
-          }
-        },
-        {
-          id: 'list-orders',
-          lambdaFunctionProps: {
-            ...default_lambda_props,
-            functionName: `${this.prefix}-list-shop-orders`,
-            code: Code.fromAsset('./resources/lambdas/list_shop_orders'),
-          }
-        },
-        {
-          id: 'get-sales',
-          lambdaFunctionProps: {
-            ...default_lambda_props,
-            functionName: `${this.prefix}-get-shop-sales`,
-            code: Code.fromAsset('./resources/lambdas/get_shop_sales'),
-          }
-        },
-        {
-          id: 'get-service-stats',
-          lambdaFunctionProps: {
-            ...default_lambda_props,
-            functionName: `${this.prefix}-get-service-stats`,
-            code: Code.fromAsset('./resources/lambdas/get_service_stats'),
-          }
-        },
-      ]
+      apiIntegrations: apiRoutes.map(route => apiRouterFunction ? {
+        id: route.id,
+        existingLambdaObj: apiRouterFunction,
+      } : {
+        id: route.id,
+        lambdaFunctionProps: {
+          ...default_lambda_props,
+          functionName: `${this.prefix}-${route.functionName}`,
+          code: Code.fromAsset(`./resources/lambdas/${route.folder}`),
+          layers: [helpersLayer, ...(route.layers ?? [])],
+        }
+      }),
     });
 
 
@@ -192,15 +224,18 @@ export class ApiSecurityAppStack extends Stack {
     // Add IAM Policy to All Lambda Functions
     //
     // List the IAM Roles of all Lambda functions
-    const lambdaRoles = apiGatwayToLambda.apiLambdaFunctions
+    // In router mode all the routes share the same function and role
+    const lambdaRoles = new Set(apiGatwayToLambda.apiLambdaFunctions
       .filter(lambda => lambda.lambdaFunction !== undefined)
-      .map(lambda => lambda.lambdaFunction!.role!);
+      .map(lambda => lambda.lambdaFunction!.role!));
     // Add permissions to the Lambda functions
     for (var role of lambdaRoles) {
       // Add DynamoDB permissions
       table.grantReadWriteData(role);
       // Grant permissions to access the Cognito User Pool
       cognito.userPool.grant(role, 'cognito-idp:AdminGetUser');
+      // Grant permissions to queue the orders
+      ordersQueue?.grantSendMessages(role);
     }
 
     //
@@ -212,7 +247,10 @@ export class ApiSecurityAppStack extends Stack {
       actions: ['execute-api:Invoke'],
       resources: [
         `arn:aws:execute-api:${region}:${account}:${apiGatwayToLambda.apiGateway.restApiId}/prod/POST/order`,
+        `arn:aws:execute-api:${region}:${account}:${apiGatwayToLambda.apiGateway.restApiId}/prod/POST/orders/batch`,
         `arn:aws:execute-api:${region}:${account}:${apiGatwayToLambda.apiGateway.restApiId}/prod/GET/order/*`,
+        `arn:aws:execute-api:${region}:${account}:${apiGatwayToLambda.apiGateway.restApiId}/prod/GET/orders`,
+        `arn:aws:execute-api:${region}:${account}:${apiGatwayToLambda.apiGateway.restApiId}/prod/GET/me/orders`,
         `arn:aws:execute-api:${region}:${account}:${apiGatwayToLambda.apiGateway.restApiId}/prod/GET/products`
       ],
     });
@@ -224,8 +262,11 @@ export class ApiSecurityAppStack extends Stack {
       actions: ['execute-api:Invoke'],
       resources: [
         `arn:aws:execute-api:${region}:${account}:${apiGatwayToLambda.apiGateway.restApiId}/prod/POST/order`,
+        `arn:aws:execute-api:${region}:${account}:${apiGatwayToLambda.apiGateway.restApiId}/prod/POST/orders/batch`,
         `arn:aws:execute-api:${region}:${account}:${apiGatwayToLambda.apiGateway.restApiId}/prod/GET/order/*`,
+        `arn:aws:execute-api:${region}:${account}:${apiGatwayToLambda.apiGateway.restApiId}/prod/GET/orders`,
         `arn:aws:execute-api:${region}:${account}:${apiGatwayToLambda.apiGateway.restApiId}/prod/GET/shop/\${aws:PrincipalTag/shopId}`,
+        `arn:aws:execute-api:${region}:${account}:${apiGatwayToLambda.apiGateway.restApiId}/prod/GET/shops`,
         `arn:aws:execute-api:${region}:${account}:${apiGatwayToLambda.apiGateway.restApiId}/prod/GET/shop/\${aws:PrincipalTag/shopId}/*`,
         `arn:aws:execute-api:${region}:${account}:${apiGatwayToLambda.apiGateway.restApiId}/prod/POST/shop/\${aws:PrincipalTag/shopId}/*`,
         `arn:aws:execute-api:${region}:${account}:${apiGatwayToLambda.apiGateway.restApiId}/prod/GET/products`
@@ -234,7 +275,8 @@ export class ApiSecurityAppStack extends Stack {
     cognito.authenticatedAdminRole.addToPrincipalPolicy(new PolicyStatement({
       actions: ['execute-api:Invoke'],
       resources: [
-        `arn:aws:execute-api:${region}:${account}:${apiGatwayToLambda.apiGateway.restApiId}/prod/GET/service-stats`
+        `arn:aws:execute-api:${region}:${account}:${apiGatwayToLambda.apiGateway.restApiId}/prod/GET/service-stats`,
+        `arn:aws:execute-api:${region}:${account}:${apiGatwayToLambda.apiGateway.restApiId}/prod/GET/shops`
       ],
     }));
 
@@ -310,5 +352,73 @@ export class ApiSecurityAppStack extends Stack {
         timeout: Duration.minutes(5)
     });
     table.grantReadWriteData(ensureShopTokenLambda);
+
+    // python lambda function to call migrations/normalize_order_timestamps/index.py
+    const normalizeOrderTimestampsLambda = new PythonFunction(this, 'NormalizeOrderTimestampsLambda', {
+        entry: 'resources/lambdas/migrations/normalize_order_timestamps',
+        runtime: this.runtime,
+        handler: 'lambda_handler',
+        logRetention: RetentionDays.THREE_MONTHS,
+        environment: {
+          TABLE_NAME: table.tableName,
+        },
+        layers: [helpersLayer],
+        timeout: Duration.minutes(15)
+    });
+    table.grantReadWriteData(normalizeOrderTimestampsLambda);
+
+    // python lambda function to call migrations/rebuild_sales_rollups/index.py
+    const rebuildSalesRollupsLambda = new PythonFunction(this, 'RebuildSalesRollupsLambda', {
+        entry: 'resources/lambdas/migrations/rebuild_sales_rollups',
+        runtime: this.runtime,
+        handler: 'lambda_handler',
+        logRetention: RetentionDays.THREE_MONTHS,
+        environment: {
+          TABLE_NAME: table.tableName,
+        },
+        layers: [helpersLayer],
+        timeout: Duration.minutes(15)
+    });
+    table.grantReadWriteData(rebuildSalesRollupsLambda);
+
+    // python lambda function to call migrations/reshard_shop/index.py
+    // Invoke it with an event like {"shopId": "0001", "shards": 4}
+    const reshardShopLambda = new PythonFunction(this, 'ReshardShopLambda', {
+        entry: 'resources/lambdas/migrations/reshard_shop',
+        runtime: this.runtime,
+        handler: 'lambda_handler',
+        logRetention: RetentionDays.THREE_MONTHS,
+        environment: {
+          TABLE_NAME: table.tableName,
+        },
+        layers: [helpersLayer],
+        timeout: Duration.minutes(15)
+    });
+    table.grantReadWriteData(reshardShopLambda);
+
+    // python lambda function to export orders to gzip compressed NDJSON or CSV files
+    // Invoke it with an event like {"shopId": "0001", "format": "csv"}, and again with the
+    // returned exportId until its status is COMPLETE
+    const exportBucket = new Bucket(this, 'OrdersExportBucket', {
+      blockPublicAccess: BlockPublicAccess.BLOCK_ALL,
+      encryption: BucketEncryption.S3_MANAGED,
+      enforceSSL: true,
+      removalPolicy: this.removalPolicy,
+      autoDeleteObjects: this.removalPolicy === RemovalPolicy.DESTROY,
+    });
+    const exportOrdersLambda = new PythonFunction(this, 'ExportOrdersLambda', {
+        entry: 'resources/lambdas/export_orders',
+        runtime: this.runtime,
+        handler: 'lambda_handler',
+        logRetention: RetentionDays.THREE_MONTHS,
+        environment: {
+          TABLE_NAME: table.tableName,
+          EXPORT_BUCKET: exportBucket.bucketName,
+        },
+        layers: [helpersLayer],
+        timeout: Duration.minutes(15)
+    });
+    table.grantReadData(exportOrdersLambda);
+    exportBucket.grantReadWrite(exportOrdersLambda);
   }
 }
@@ -0,0 +1,47 @@
+import os
+import uuid
+from aws_lambda_powertools import Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from dynamodb_helpers import get_orders_table
+from export_helpers import OrdersExport, S3Store
+from log_helpers import CustomLogger
+
+logger = CustomLogger()
+tracer = Tracer()
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+EXPORT_BUCKET = os.environ.get("EXPORT_BUCKET")
+EXPORT_PREFIX = os.environ.get("EXPORT_PREFIX", "exports/")
+# Stop writing parts when less time is left, a part must be written before the time out
+STOP_REMAINING_MILLIS = int(os.environ.get("EXPORT_STOP_REMAINING_MILLIS", "120000"))
+
+
+@logger.inject_lambda_context(log_event=True)
+@tracer.capture_lambda_handler(capture_response=False)
+def lambda_handler(event: dict, context: LambdaContext):
+    """Expects an event like {"shopId": "0001", "format": "csv"}. Without shopId all the
+    orders are exported. The export stops before the function times out and returns the
+    manifest with the IN_PROGRESS status; invoke the function again with the returned
+    exportId to resume it until the status is COMPLETE.
+    """
+    orders_table = get_orders_table(TABLE_NAME, logger)
+    export = OrdersExport(
+        orders_table,
+        S3Store(EXPORT_BUCKET, prefix=EXPORT_PREFIX),
+        export_id=event.get("exportId") or str(uuid.uuid4()),
+        shop_id=event.get("shopId"),
+        export_format=event.get("format", "ndjson"),
+        part_rows=int(event.get("partRows", 100000)),
+    )
+    manifest = export.run(
+        should_stop=lambda: (
+            context.get_remaining_time_in_millis() < STOP_REMAINING_MILLIS
+        )
+    )
+    return {
+        "exportId": manifest["exportId"],
+        "status": manifest["status"],
+        "rows": manifest["rows"],
+        "parts": len(manifest["parts"]),
+        "manifestKey": EXPORT_PREFIX + export.manifest_key,
+    }
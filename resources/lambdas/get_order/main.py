@@ -1,45 +1,77 @@
 import os
-import boto3
 from aws_lambda_powertools import Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
-from api_helpers import LambdaEvent, validate_method, build_api_response
-from dynamodb_helpers import DynamodbTestOrdersData
+from client_helpers import prime
+from api_helpers import (
+    ORDER_FIELDS,
+    LambdaEvent,
+    validate_method,
+    build_api_response,
+    parse_fields_parameter,
+    select_fields,
+)
+from dynamodb_helpers import get_orders_table, prime_orders_table
 from cognito_helpers import AppUser
+from concurrency_helpers import submit
 from log_helpers import CustomLogger
 
 logger = CustomLogger()
 tracer = Tracer()
-ddb = boto3.resource("dynamodb")
 
 CORS_ORIGIN = os.environ.get("CORS_ORIGIN")
 TABLE_NAME = os.environ.get("TABLE_NAME")
 COGNITO_USER_POOL_ID = os.environ.get("COGNITO_USER_POOL_ID")
 
+# Build the AWS clients and the table handle during the init phase of the Lambda
+prime(clients=["cognito-idp"], resources=["dynamodb"])
+prime_orders_table(TABLE_NAME, logger)
+
 
 @logger.inject_lambda_context(log_event=True)
 @tracer.capture_lambda_handler(capture_response=False)
 @validate_method("GET", logger)
 def lambda_handler(event: dict, context: LambdaContext):
     lambda_event_object = LambdaEvent(event)
-    orders_table = DynamodbTestOrdersData(
-        TABLE_NAME, dynamodb_resource=ddb, logger=logger
-    )
+    orders_table = get_orders_table(TABLE_NAME, logger)
     response = api_get_order(lambda_event_object, orders_table)
     return response
 
 
 def api_get_order(lambda_event_object, orders_table):
     order_id = lambda_event_object.pathparameters.get("id")
-    user = AppUser(
+    try:
+        fields = parse_fields_parameter(
+            lambda_event_object.querystring, ORDER_FIELDS + ("items",)
+        )
+    except ValueError as e:
+        return build_api_response(400, {"message": str(e)}, CORS_ORIGIN)
+    # The order ID is known up front, so the user and the order are read concurrently
+    user_future = submit(
+        AppUser,
         request_identity=lambda_event_object.requestidentity,
         user_pool_id=COGNITO_USER_POOL_ID,
         logger=logger,
     )
-    order_data = orders_table.get_order_data(order_id)
+    # The order line items are returned by default, "includeItems=false" skips them
+    include_items = (
+        lambda_event_object.querystring.get("includeItems", "true").lower() != "false"
+    )
+    read_fields = None
+    if fields is not None:
+        include_items = include_items and "items" in fields
+        # The fields checked to authorize the user are always read
+        read_fields = [field for field in fields if field != "items"] + [
+            "customerId",
+            "shopId",
+        ]
+    order_data = orders_table.get_order_data(
+        order_id, include_items=include_items, fields=read_fields
+    )
+    user = user_future.result()
     logger.info({"data": {"order_data": order_data}})
     if user.id == order_data.get("customerId") or (
         user.is_shop_owner()
-        and user.attributes["custom:shopId"] == order_data["shopId"]
+        and user.attributes["custom:shopId"] == order_data.get("shopId")
     ):
-        return build_api_response(200, order_data, CORS_ORIGIN)
+        return build_api_response(200, select_fields(order_data, fields), CORS_ORIGIN)
     return build_api_response(401, {"message": "Unauthorized"}, CORS_ORIGIN)
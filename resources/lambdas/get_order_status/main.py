@@ -0,0 +1,51 @@
+import os
+from aws_lambda_powertools import Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from client_helpers import prime
+from api_helpers import LambdaEvent, validate_method, build_api_response
+from dynamodb_helpers import get_orders_table, prime_orders_table
+from cognito_helpers import AppUser
+from concurrency_helpers import submit
+from log_helpers import CustomLogger
+
+logger = CustomLogger()
+tracer = Tracer()
+
+CORS_ORIGIN = os.environ.get("CORS_ORIGIN")
+TABLE_NAME = os.environ.get("TABLE_NAME")
+COGNITO_USER_POOL_ID = os.environ.get("COGNITO_USER_POOL_ID")
+
+# Build the AWS clients and the table handle during the init phase of the Lambda
+prime(clients=["cognito-idp"], resources=["dynamodb"])
+prime_orders_table(TABLE_NAME, logger)
+
+
+@logger.inject_lambda_context(log_event=True)
+@tracer.capture_lambda_handler(capture_response=False)
+@validate_method("GET", logger)
+def lambda_handler(event: dict, context: LambdaContext):
+    lambda_event_object = LambdaEvent(event)
+    orders_table = get_orders_table(TABLE_NAME, logger)
+    return api_get_order_status(lambda_event_object, orders_table)
+
+
+def api_get_order_status(lambda_event_object, orders_table):
+    order_id = lambda_event_object.pathparameters.get("id")
+    user_future = submit(
+        AppUser,
+        request_identity=lambda_event_object.requestidentity,
+        user_pool_id=COGNITO_USER_POOL_ID,
+        logger=logger,
+    )
+    order_status = orders_table.get_order_status(order_id) or {}
+    user = user_future.result()
+    # Same authorization as api_get_order
+    if order_status and (
+        user.id == order_status.get("customerId")
+        or (
+            user.is_shop_owner()
+            and user.attributes["custom:shopId"] == order_status.get("shopId")
+        )
+    ):
+        return build_api_response(200, order_status, CORS_ORIGIN)
+    return build_api_response(401, {"message": "Unauthorized"}, CORS_ORIGIN)
@@ -0,0 +1,80 @@
+import os
+from aws_lambda_powertools import Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from client_helpers import prime
+from api_helpers import (
+    ORDER_FIELDS,
+    LambdaEvent,
+    validate_method,
+    build_api_response,
+    parse_fields_parameter,
+    parse_ids_parameter,
+    select_fields,
+)
+from dynamodb_helpers import get_orders_table, prime_orders_table
+from cognito_helpers import AppUser
+from concurrency_helpers import submit
+from log_helpers import CustomLogger
+
+logger = CustomLogger()
+tracer = Tracer()
+
+CORS_ORIGIN = os.environ.get("CORS_ORIGIN")
+TABLE_NAME = os.environ.get("TABLE_NAME")
+COGNITO_USER_POOL_ID = os.environ.get("COGNITO_USER_POOL_ID")
+
+# Build the AWS clients and the table handle during the init phase of the Lambda
+prime(clients=["cognito-idp"], resources=["dynamodb"])
+prime_orders_table(TABLE_NAME, logger)
+
+
+@logger.inject_lambda_context(log_event=True)
+@tracer.capture_lambda_handler(capture_response=False)
+@validate_method("GET", logger)
+def lambda_handler(event: dict, context: LambdaContext):
+    lambda_event_object = LambdaEvent(event)
+    orders_table = get_orders_table(TABLE_NAME, logger)
+    return api_get_orders(lambda_event_object, orders_table)
+
+
+def is_authorized(user: AppUser, order_data: dict) -> bool:
+    """Same authorization as api_get_order: the customer of the order or the shop owner"""
+    return user.id == order_data.get("customerId") or (
+        user.is_shop_owner()
+        and user.attributes.get("custom:shopId") == order_data.get("shopId")
+    )
+
+
+def api_get_orders(lambda_event_object, orders_table):
+    try:
+        order_ids = parse_ids_parameter(lambda_event_object.querystring)
+        fields = parse_fields_parameter(lambda_event_object.querystring, ORDER_FIELDS)
+    except ValueError as e:
+        return build_api_response(400, {"message": str(e)}, CORS_ORIGIN)
+    user_future = submit(
+        AppUser,
+        request_identity=lambda_event_object.requestidentity,
+        user_pool_id=COGNITO_USER_POOL_ID,
+        logger=logger,
+    )
+    # The fields checked to authorize the user are always read
+    orders_data = orders_table.get_orders_data(
+        order_ids,
+        fields=None if fields is None else fields + ["customerId", "shopId"],
+    )
+    user = user_future.result()
+    found_ids = [
+        order_id
+        for order_id in order_ids
+        if order_id in orders_data and is_authorized(user, orders_data[order_id])
+    ]
+    orders_list = [
+        select_fields(orders_data[order_id], fields) for order_id in found_ids
+    ]
+    # The orders the user may not read are reported like the missing ones, so that the
+    # response does not tell which order IDs exist
+    not_found = [order_id for order_id in order_ids if order_id not in set(found_ids)]
+    logger.info({"orders": len(orders_list), "notFound": not_found})
+    return build_api_response(
+        200, {"ordersList": orders_list, "notFound": not_found}, CORS_ORIGIN
+    )
@@ -1,56 +1,48 @@
 import os
-import boto3
-from boto3.dynamodb.conditions import Attr
-from collections import Counter
 from aws_lambda_powertools import Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
+from client_helpers import prime
 from api_helpers import LambdaEvent, validate_method, build_api_response
-from dynamodb_helpers import DynamodbTestOrdersData
+from dynamodb_helpers import get_orders_table, prime_orders_table
 from log_helpers import CustomLogger
+from profiling_helpers import profile_handler
 
 logger = CustomLogger()
 tracer = Tracer()
-ddb = boto3.resource("dynamodb")
 
 CORS_ORIGIN = os.environ.get("CORS_ORIGIN")
 TABLE_NAME = os.environ.get("TABLE_NAME")
 
+# Build the AWS clients and the table handle during the init phase of the Lambda
+prime(resources=["dynamodb"])
+prime_orders_table(TABLE_NAME, logger)
+
 
 @logger.inject_lambda_context(log_event=True)
 @tracer.capture_lambda_handler(capture_response=False)
+@profile_handler(logger)
 @validate_method("GET", logger)
 def lambda_handler(event: dict, context: LambdaContext):
     lambda_event_object = LambdaEvent(event)
-    orders_table = DynamodbTestOrdersData(
-        TABLE_NAME, dynamodb_resource=ddb, logger=logger
-    )
+    orders_table = get_orders_table(TABLE_NAME, logger)
     response = api_compute_statistics(lambda_event_object, orders_table)
     return response
 
 
 def api_compute_statistics(lambda_event_object, orders_table):
-    # Query the GSI 1 of the table and count the number of orders per PK
-    query_response = orders_table.table.scan(
-        IndexName="GSI1",
-        Select="SPECIFIC_ATTRIBUTES",
-        ProjectionExpression="#pk,#sk",
-        ExpressionAttributeNames={"#pk": "GSI1-PK", "#sk": "GSI1-SK"},
-        FilterExpression=Attr("entityType").eq("order"),
-    )
-    # Compute the average number of orders per shop
-    orders_count = Counter(item["GSI1-PK"] for item in query_response["Items"])
+    # Imported here so that NumPy (the helpers_layer "aggregation" extra, deployed in its
+    # own layer) is only loaded by this handler, e.g. not by the other routes of the router
+    from aggregation_helpers import OrderColumns
+
+    # Scan all the pages of the GSI 1 of the table into columns and count the number of
+    # orders per shop and per customer. The orders of sharded shops are counted with the
+    # shop they belong to, the orders without customer are not counted per customer.
+    orders = OrderColumns.from_table(orders_table)
+    orders_count = orders.count_by("shop")
     average_orders_per_shop = sum(orders_count.values()) / len(orders_count)
     logger.info(orders_count)
-    # Scan the GSI2 of the table to get the number of customers and orders per customer
-    query_response = orders_table.table.scan(
-        IndexName="GSI2",
-        Select="SPECIFIC_ATTRIBUTES",
-        ProjectionExpression="#pk,#sk",
-        ExpressionAttributeNames={"#pk": "GSI2-PK", "#sk": "GSI2-SK"},
-        FilterExpression=Attr("entityType").eq("order"),
-    )
     # Compute the average number of orders per customer
-    customers_count = Counter(item["GSI2-PK"] for item in query_response["Items"])
+    customers_count = orders.count_by("customer")
     average_orders_per_customer = sum(customers_count.values()) / len(customers_count)
     logger.info(customers_count)
     stats_response = {
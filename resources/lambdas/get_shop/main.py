@@ -1,35 +1,47 @@
 import os
-import boto3
 from aws_lambda_powertools import Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
-from api_helpers import LambdaEvent, validate_method, build_api_response
-from dynamodb_helpers import DynamodbTestOrdersData
+from client_helpers import prime
+from api_helpers import (
+    SHOP_FIELDS,
+    LambdaEvent,
+    validate_method,
+    build_api_response,
+    parse_fields_parameter,
+    select_fields,
+)
+from dynamodb_helpers import get_orders_table, prime_orders_table
 from log_helpers import CustomLogger
 
 logger = CustomLogger()
 tracer = Tracer()
-ddb = boto3.resource("dynamodb")
 
 CORS_ORIGIN = os.environ.get("CORS_ORIGIN")
 TABLE_NAME = os.environ.get("TABLE_NAME")
 COGNITO_USER_POOL_ID = os.environ.get("COGNITO_USER_POOL_ID")
 
+# Build the AWS clients and the table handle during the init phase of the Lambda
+prime(resources=["dynamodb"])
+prime_orders_table(TABLE_NAME, logger)
+
 
 @logger.inject_lambda_context(log_event=True)
 @tracer.capture_lambda_handler(capture_response=False)
 @validate_method("GET", logger)
 def lambda_handler(event: dict, context: LambdaContext):
     lambda_event_object = LambdaEvent(event)
-    orders_table = DynamodbTestOrdersData(
-        TABLE_NAME, dynamodb_resource=ddb, logger=logger
-    )
+    orders_table = get_orders_table(TABLE_NAME, logger)
     return api_get_shop(lambda_event_object, orders_table)
 
 
 def api_get_shop(lambda_event_object, orders_table):
     shop_id = lambda_event_object.pathparameters["id"]
-    shop_data = orders_table.get_shop_by_id(shop_id)
+    try:
+        fields = parse_fields_parameter(lambda_event_object.querystring, SHOP_FIELDS)
+    except ValueError as e:
+        return build_api_response(400, {"message": str(e)}, CORS_ORIGIN)
+    shop_data = orders_table.get_shop_by_id(shop_id, fields=fields)
     logger.info({"shop_data": shop_data})
     if shop_data is None:
         return build_api_response(404, {"message": "Not found"}, CORS_ORIGIN)
-    return build_api_response(200, shop_data, CORS_ORIGIN)
+    return build_api_response(200, select_fields(shop_data, fields), CORS_ORIGIN)
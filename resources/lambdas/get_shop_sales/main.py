@@ -1,35 +1,57 @@
 import os
-import boto3
 from aws_lambda_powertools import Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
+from client_helpers import prime
 from api_helpers import LambdaEvent, validate_method, build_api_response
-from dynamodb_helpers import DynamodbTestOrdersData
+from dynamodb_helpers import get_orders_table, prime_orders_table
 from log_helpers import CustomLogger
 
 logger = CustomLogger()
 tracer = Tracer()
-ddb = boto3.resource("dynamodb")
 
 CORS_ORIGIN = os.environ.get("CORS_ORIGIN")
 TABLE_NAME = os.environ.get("TABLE_NAME")
 COGNITO_USER_POOL_ID = os.environ.get("COGNITO_USER_POOL_ID")
 
+# Build the AWS clients and the table handle during the init phase of the Lambda
+prime(resources=["dynamodb"])
+prime_orders_table(TABLE_NAME, logger)
+
 
 @logger.inject_lambda_context(log_event=True)
 @tracer.capture_lambda_handler(capture_response=False)
 @validate_method("GET", logger)
 def lambda_handler(event: dict, context: LambdaContext):
     lambda_event_object = LambdaEvent(event)
-    orders_table = DynamodbTestOrdersData(
-        TABLE_NAME, dynamodb_resource=ddb, logger=logger
-    )
+    orders_table = get_orders_table(TABLE_NAME, logger)
     response = api_get_shop_total_sales(lambda_event_object, orders_table)
     return response
 
 
 def api_get_shop_total_sales(lambda_event_object, orders_table):
     shop_id = lambda_event_object.pathparameters["id"]
-    total_amount = orders_table.get_total_amount_by_shop_id(shop_id)
+    date_from = lambda_event_object.querystring.get("from")
+    date_to = lambda_event_object.querystring.get("to")
+    try:
+        if is_day_range(date_from, date_to):
+            # Whole days can be answered from the daily and monthly sales rollups
+            total_amount = orders_table.get_sales_by_shop_id(
+                shop_id, date_from=date_from, date_to=date_to
+            )["totalAmount"]
+        else:
+            total_amount = orders_table.get_total_amount_by_shop_id(
+                shop_id, date_from=date_from, date_to=date_to
+            )
+    except ValueError as e:
+        return build_api_response(400, {"message": str(e)}, CORS_ORIGIN)
     response_object = {"shopId": shop_id, "totalAmount": total_amount}
     logger.info(response_object)
     return build_api_response(200, response_object, CORS_ORIGIN)
+
+
+def is_day_range(date_from: str | None, date_to: str | None) -> bool:
+    """Returns True if the range bounds are either not set or days without time (e.g. 2024-01-31)"""
+    return all(
+        bound is None or len(bound) == len("YYYY-MM-DD")
+        for bound in [date_from, date_to]
+    )
@@ -0,0 +1,72 @@
+import os
+from aws_lambda_powertools import Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from client_helpers import prime
+from api_helpers import (
+    SHOP_FIELDS,
+    LambdaEvent,
+    validate_method,
+    build_api_response,
+    parse_fields_parameter,
+    parse_ids_parameter,
+    select_fields,
+)
+from dynamodb_helpers import get_orders_table, prime_orders_table
+from cognito_helpers import AppUser
+from log_helpers import CustomLogger
+
+logger = CustomLogger()
+tracer = Tracer()
+
+CORS_ORIGIN = os.environ.get("CORS_ORIGIN")
+TABLE_NAME = os.environ.get("TABLE_NAME")
+COGNITO_USER_POOL_ID = os.environ.get("COGNITO_USER_POOL_ID")
+
+# Build the AWS clients and the table handle during the init phase of the Lambda
+prime(clients=["cognito-idp"], resources=["dynamodb"])
+prime_orders_table(TABLE_NAME, logger)
+
+
+@logger.inject_lambda_context(log_event=True)
+@tracer.capture_lambda_handler(capture_response=False)
+@validate_method("GET", logger)
+def lambda_handler(event: dict, context: LambdaContext):
+    lambda_event_object = LambdaEvent(event)
+    orders_table = get_orders_table(TABLE_NAME, logger)
+    return api_get_shops(lambda_event_object, orders_table)
+
+
+def is_authorized(user: AppUser, shop_id: str) -> bool:
+    """An admin can read all the shops, a shop owner only their own shop. For /shop/{id}
+    the same is enforced by the IAM policies of the API Gateway resource."""
+    return user.is_admin() or (
+        user.is_shop_owner() and user.attributes.get("custom:shopId") == shop_id
+    )
+
+
+def api_get_shops(lambda_event_object, orders_table):
+    try:
+        shop_ids = parse_ids_parameter(lambda_event_object.querystring)
+        fields = parse_fields_parameter(lambda_event_object.querystring, SHOP_FIELDS)
+    except ValueError as e:
+        return build_api_response(400, {"message": str(e)}, CORS_ORIGIN)
+    user = AppUser(
+        request_identity=lambda_event_object.requestidentity,
+        user_pool_id=COGNITO_USER_POOL_ID,
+        logger=logger,
+    )
+    # Only the shops the user may read are requested
+    allowed_ids = [shop_id for shop_id in shop_ids if is_authorized(user, shop_id)]
+    shops_data = (
+        orders_table.get_shops_by_ids(allowed_ids, fields=fields) if allowed_ids else {}
+    )
+    shops_list = [
+        select_fields(shops_data[shop_id], fields)
+        for shop_id in allowed_ids
+        if shop_id in shops_data
+    ]
+    not_found = [shop_id for shop_id in shop_ids if shop_id not in shops_data]
+    logger.info({"shops": len(shops_list), "notFound": not_found})
+    return build_api_response(
+        200, {"shopsList": shops_list, "notFound": not_found}, CORS_ORIGIN
+    )
@@ -0,0 +1,181 @@
+from array import array
+from collections.abc import Iterable
+from decimal import Decimal
+import numpy as np
+from boto3.dynamodb.conditions import Attr
+
+# The keys the orders can be grouped by
+GROUP_KEYS = ("shop", "customer", "day", "month")
+# The code of the orders without value for a group key (e.g. without customer)
+NO_GROUP = -1
+# The attributes of the order items read to build the columns
+ORDER_COLUMNS_ATTRIBUTES = ["GSI1-PK", "GSI1-SK", "GSI2-PK", "amount"]
+
+
+class OrderColumns:
+    """
+    The orders in columnar arrays, to aggregate hundreds of thousands of orders with NumPy
+    instead of one item at a time:
+    - the amounts as fixed-point integers (e.g. 12.50 is 125000 with 4 decimal digits), so
+      that the sums are exact like the sums of the Decimal amounts
+    - for each group key, the codes of the orders in a dictionary of the values (e.g. the
+      shop IDs), NO_GROUP for the orders without value
+
+    The results are the same as with the Decimal amounts: sums, counts and means are
+    Decimals and ints, the quantiles are floats.
+
+    Args:
+        amounts (np.ndarray): The fixed-point amounts (int64)
+        codes (dict): The codes (int32 array) of the orders by group key
+        labels (dict): The values of the codes by group key
+        amount_digits (int): The decimal digits of the fixed-point amounts
+    """
+
+    def __init__(
+        self,
+        amounts: np.ndarray,
+        codes: dict[str, np.ndarray],
+        labels: dict[str, list[str]],
+        amount_digits: int = 4,
+    ):
+        self.amounts = amounts
+        self.codes = codes
+        self.labels = labels
+        self.amount_digits = amount_digits
+        self._groups = {}
+
+    @classmethod
+    def from_items(
+        cls, items: Iterable[dict], amount_digits: int = 4
+    ) -> "OrderColumns":
+        """
+        Builds the columns from order items of the table (with the attributes
+        ORDER_COLUMNS_ATTRIBUTES), e.g. the pages of a scan of GSI1. The items are read
+        one at a time and only their columns are kept.
+        Raises a ValueError if an amount has more than amount_digits decimal digits.
+        """
+        scale = 10**amount_digits
+        amounts = array("q")
+        codes = {key: array("i") for key in GROUP_KEYS}
+        dictionaries = {key: {} for key in GROUP_KEYS}
+        shops, customers = dictionaries["shop"], dictionaries["customer"]
+        days, months = dictionaries["day"], dictionaries["month"]
+        shop_codes, customer_codes = codes["shop"], codes["customer"]
+        day_codes, month_codes = codes["day"], codes["month"]
+        for item in items:
+            scaled_amount = item["amount"] * scale
+            fixed_amount = int(scaled_amount)
+            if fixed_amount != scaled_amount:
+                raise ValueError(
+                    f"The amount {item['amount']} has more than {amount_digits} decimal digits"
+                )
+            amounts.append(fixed_amount)
+            # The orders of sharded shops are grouped with the shop they belong to
+            shop_id = item["GSI1-PK"].split("#")[1]
+            shop_codes.append(shops.setdefault(shop_id, len(shops)))
+            if "GSI2-PK" in item:
+                customer_key = item["GSI2-PK"]
+                customer_codes.append(
+                    customers.setdefault(customer_key, len(customers))
+                )
+            else:
+                # Orders imported without customer
+                customer_codes.append(NO_GROUP)
+            order_timestamp = item["GSI1-SK"]
+            day_codes.append(days.setdefault(order_timestamp[:10], len(days)))
+            month_codes.append(months.setdefault(order_timestamp[:7], len(months)))
+        return cls(
+            np.frombuffer(amounts, dtype=np.int64),
+            {key: np.frombuffer(codes[key], dtype=np.int32) for key in GROUP_KEYS},
+            {key: list(dictionaries[key]) for key in GROUP_KEYS},
+            amount_digits,
+        )
+
+    @classmethod
+    def from_table(
+        cls, orders_table, page_size: int = None, amount_digits: int = 4
+    ) -> "OrderColumns":
+        """Builds the columns of all the orders of the table from a scan of GSI1"""
+        return cls.from_items(
+            orders_table.iter_scan(
+                page_size,
+                IndexName="GSI1",
+                ProjectionExpression=", ".join(
+                    f"#a{number}" for number in range(len(ORDER_COLUMNS_ATTRIBUTES))
+                ),
+                ExpressionAttributeNames={
+                    f"#a{number}": attribute
+                    for number, attribute in enumerate(ORDER_COLUMNS_ATTRIBUTES)
+                },
+                FilterExpression=Attr("entityType").eq("order"),
+            ),
+            amount_digits,
+        )
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def _to_decimal(self, fixed_amount) -> Decimal:
+        return Decimal(int(fixed_amount)).scaleb(-self.amount_digits)
+
+    def _group(self, key: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the order of the orders sorted by group code, the start of each group in
+        that order and the codes of the groups. The orders without group are left out."""
+        if key not in GROUP_KEYS:
+            raise ValueError(f"Unknown group key {key}, use one of {GROUP_KEYS}")
+        if key not in self._groups:
+            codes = self.codes[key]
+            order = np.argsort(codes, kind="stable")
+            order = order[codes[order] != NO_GROUP]
+            sorted_codes = codes[order]
+            starts = np.flatnonzero(np.diff(sorted_codes, prepend=-2))
+            self._groups[key] = (order, starts, sorted_codes[starts])
+        return self._groups[key]
+
+    def total_amount(self) -> Decimal:
+        return self._to_decimal(self.amounts.sum())
+
+    def count_by(self, key: str) -> dict[str, int]:
+        """Returns the number of orders by value of the group key (e.g. by shop ID)"""
+        order, starts, group_codes = self._group(key)
+        counts = np.diff(starts, append=len(order))
+        labels = self.labels[key]
+        return {
+            labels[code]: int(count)
+            for code, count in zip(group_codes.tolist(), counts.tolist())
+        }
+
+    def sum_by(self, key: str) -> dict[str, Decimal]:
+        """Returns the total amount of the orders by value of the group key"""
+        order, starts, group_codes = self._group(key)
+        if not len(order):
+            return {}
+        # Integer sums, exact unlike the float weights of np.bincount
+        sums = np.add.reduceat(self.amounts[order], starts)
+        labels = self.labels[key]
+        return {
+            labels[code]: self._to_decimal(total)
+            for code, total in zip(group_codes.tolist(), sums.tolist())
+        }
+
+    def mean_by(self, key: str) -> dict[str, Decimal]:
+        """Returns the average amount of the orders by value of the group key"""
+        counts = self.count_by(key)
+        return {
+            label: total / counts[label] for label, total in self.sum_by(key).items()
+        }
+
+    def quantiles_by(self, key: str, quantiles: list[float]) -> dict[str, list[float]]:
+        """Returns the quantiles (e.g. [0.5, 0.9, 0.99]) of the amounts of the orders by
+        value of the group key, linearly interpolated between the closest amounts"""
+        order, starts, group_codes = self._group(key)
+        labels = self.labels[key]
+        ends = np.append(starts[1:], len(order))
+        scale = 10**self.amount_digits
+        results = {}
+        for code, start, end in zip(group_codes.tolist(), starts, ends):
+            group_amounts = self.amounts[order[start:end]]
+            results[labels[code]] = (
+                np.quantile(group_amounts, quantiles) / scale
+            ).tolist()
+        return results
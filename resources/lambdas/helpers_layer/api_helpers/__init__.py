@@ -1,6 +1,8 @@
 import json
 import decimal
+import os
 from functools import wraps
+from timing_helpers import time_invocation, timed_phase
 
 
 class LambdaEvent:
@@ -11,6 +13,7 @@ class LambdaEvent:
         event (dict): The lambda event
     """
 
+    @timed_phase("parse")
     def __init__(self, event: dict):
         self.body: str = event["body"]
         self.method: str = event["httpMethod"]
@@ -73,6 +76,16 @@ class LambdaEvent:
         """
         return self.authorizerclaims.get("token_use") == "id"
 
+    def get_header(self, name: str, default: str = None) -> str:
+        """
+        Returns the value of a header, the header names are case insensitive
+        """
+        name = name.lower()
+        for header, value in self.headers.items():
+            if header.lower() == name:
+                return value
+        return default
+
     def is_proper_order(self) -> bool:
         """
         Checks if the event is a proper order
@@ -93,6 +106,10 @@ class DecimalEncoder(json.JSONEncoder):
                 return float(value)
             else:
                 return int(value)
+        # The records of dynamodb_helpers (e.g. Product) are serialized as their API data
+        to_api = getattr(value, "to_api", None)
+        if to_api is not None:
+            return to_api()
         return super(DecimalEncoder, self).default(value)
 
 
@@ -100,14 +117,20 @@ def validate_method(allowed_methods: str | list[str], logger, cors_origin="*"):
     """
     Relies on the arguments of a lambda handler being (event, context).
     If the method is not allowed, returns a 400 error response.
+    The phases of the handler are timed if it is enabled (see timing_helpers).
     """
 
     if isinstance(allowed_methods, str):
         allowed_methods = [allowed_methods]
 
     def decorator(lambda_handler_func):
+        handler_name = _handler_name(lambda_handler_func)
+
         @wraps(lambda_handler_func)
         def wrapper(event, context):
+            return time_invocation(handler_name, validated_handler, event, context)
+
+        def validated_handler(event, context):
             lambda_event_object = LambdaEvent(event)
             if lambda_event_object.method not in allowed_methods:
                 error_message = f"{lambda_event_object.method} method is not implemented here. Allowed methods: {allowed_methods}"
@@ -122,6 +145,69 @@ def validate_method(allowed_methods: str | list[str], logger, cors_origin="*"):
     return decorator
 
 
+def _handler_name(lambda_handler_func) -> str:
+    """Returns the name of the function folder of a handler (e.g. place_order for the
+    module place_order.main), or the Lambda function name if the module is top level"""
+    package = lambda_handler_func.__module__.rpartition(".")[0]
+    if package:
+        return package.rpartition(".")[2]
+    return os.environ.get("AWS_LAMBDA_FUNCTION_NAME", lambda_handler_func.__module__)
+
+
+def parse_ids_parameter(querystring: dict, max_ids: int = 100) -> list[str]:
+    """Returns the IDs of the comma separated "ids" query string parameter, without duplicates.
+    Raises a ValueError if there is no ID or more than max_ids IDs.
+    """
+    ids = [id.strip() for id in querystring.get("ids", "").split(",") if id.strip()]
+    ids = list(dict.fromkeys(ids))
+    if not 0 < len(ids) <= max_ids:
+        raise ValueError(f"The ids parameter must have 1 to {max_ids} IDs")
+    return ids
+
+
+# Fields of the orders and the shops which can be selected with the "fields" query string
+# parameter. They are the enum of the fields parameters in the OpenAPI definition.
+ORDER_FIELDS = (
+    "orderId",
+    "shopId",
+    "customerId",
+    "date",
+    "name",
+    "phoneNumber",
+    "amount",
+    "status",
+)
+SHOP_FIELDS = ("shopId", "name", "phoneNumber", "address", "shopToken")
+
+
+def parse_fields_parameter(querystring: dict, allowed_fields) -> list[str] | None:
+    """Returns the fields of the comma separated "fields" query string parameter, without
+    duplicates, or None if it is not set (all the fields are returned).
+    Raises a ValueError if a field is not one of the allowed_fields.
+    """
+    if "fields" not in querystring:
+        return None
+    fields = [
+        field.strip() for field in querystring["fields"].split(",") if field.strip()
+    ]
+    fields = list(dict.fromkeys(fields))
+    if not fields:
+        raise ValueError("The fields parameter must have at least one field")
+    unknown_fields = [field for field in fields if field not in allowed_fields]
+    if unknown_fields:
+        raise ValueError(
+            f"Unknown fields: {', '.join(unknown_fields)}. Allowed fields: {', '.join(allowed_fields)}"
+        )
+    return fields
+
+
+def select_fields(data: dict, fields: list[str] | None) -> dict:
+    """Returns the data with only the given fields, or all the data if fields is None"""
+    if fields is None:
+        return data
+    return {key: value for key, value in data.items() if key in fields}
+
+
 def build_api_response(code: int, body: dict, cors_origin="*") -> dict:
     """Builds a standardized response and returns it
 
@@ -137,11 +223,12 @@ def build_api_response(code: int, body: dict, cors_origin="*") -> dict:
         "headers": {
             "Content-Type": "application/json",
             "Cache-Control": "no-cache, no-store",
-            "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
+            "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token,Idempotency-Key",
             "Access-Control-Allow-Methods": "GET,OPTIONS,POST,PUT",
             "Access-Control-Allow-Origin": cors_origin,
         },
-        "body": json.dumps(body, cls=DecimalEncoder, sort_keys=True),
     }
+    with timed_phase("serialize"):
+        response["body"] = json.dumps(body, cls=DecimalEncoder, sort_keys=True)
 
     return response
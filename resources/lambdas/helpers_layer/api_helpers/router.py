@@ -0,0 +1,117 @@
+import importlib
+import os
+import time
+from api_helpers import LambdaEvent, build_api_response
+from log_helpers import ensure_logger
+from timing_helpers import time_invocation
+
+
+class Router:
+    """
+    Dispatches the API Gateway events of all the routes to their api_* function, so that a
+    single Lambda function (and its warm containers, clients and caches) serves the whole API.
+
+    The routes are given as {resource: {method: "module:function"}}, e.g.
+    {"/order/{id}": {"GET": "get_order.main:api_get_order"}}. The module of a route is only
+    imported when the route is first called. The api_* functions are called with
+    (lambda_event_object, orders_table), like in their own Lambda handler.
+
+    For each call, the Invocations, ClientErrors, ServerErrors and Latency metrics are
+    published with a "route" dimension, as a replacement of the per function metrics.
+
+    Args:
+        routes (dict): The api_* function of each resource and method
+        get_orders_table (callable): Returns the orders table passed to the api_* functions
+        package (str): The package containing the route modules, if any (e.g. "lambdas")
+        logger: The logger
+        cors_origin (str): The CORS origin of the error responses
+        metrics_namespace (str): The CloudWatch namespace of the route metrics.
+            Defaults to the POWERTOOLS_METRICS_NAMESPACE environment variable
+    """
+
+    def __init__(
+        self,
+        routes: dict[str, dict[str, str]],
+        get_orders_table,
+        package: str = "",
+        logger=None,
+        cors_origin="*",
+        metrics_namespace: str = None,
+    ):
+        self.routes = routes
+        self.get_orders_table = get_orders_table
+        self.package = package
+        self.logger = ensure_logger(logger)
+        self.cors_origin = cors_origin
+        self.metrics_namespace = metrics_namespace or os.environ.get(
+            "POWERTOOLS_METRICS_NAMESPACE", "ApiSecurityDemo"
+        )
+        self._functions = {}
+
+    def _get_function(self, target: str):
+        function = self._functions.get(target)
+        if function is None:
+            module_name, function_name = target.split(":")
+            if self.package:
+                module_name = f"{self.package}.{module_name}"
+            function = getattr(importlib.import_module(module_name), function_name)
+            self._functions[target] = function
+        return function
+
+    def dispatch(self, event: dict) -> dict:
+        """Calls the api_* function of the event resource and method and returns its response.
+        The phases of the call are timed if it is enabled (see timing_helpers), with the
+        route (e.g. "GET /order/{id}") as handler."""
+        route = f"{event.get('httpMethod')} {event.get('resource')}"
+        return time_invocation(route, self._dispatch, event, route)
+
+    def _dispatch(self, event: dict, route: str) -> dict:
+        start = time.perf_counter()
+        lambda_event_object = LambdaEvent(event)
+        methods = self.routes.get(lambda_event_object.resource)
+        if methods is None:
+            error_message = f"{lambda_event_object.resource} is not a known resource"
+            self.logger.error({"type": "error", "data": error_message})
+            response = build_api_response(
+                404, {"message": "ERROR : " + error_message}, self.cors_origin
+            )
+        elif lambda_event_object.method not in methods:
+            # Same response as the validate_method decorator of the per function handlers
+            error_message = f"{lambda_event_object.method} method is not implemented here. Allowed methods: {list(methods)}"
+            self.logger.error({"type": "error", "data": error_message})
+            response = build_api_response(
+                400, {"message": "ERROR : " + error_message}, self.cors_origin
+            )
+        else:
+            function = self._get_function(methods[lambda_event_object.method])
+            try:
+                response = function(lambda_event_object, self.get_orders_table())
+            except Exception:
+                self._publish_metrics(route, 500, start)
+                raise
+        self._publish_metrics(route, response["statusCode"], start)
+        return response
+
+    def _publish_metrics(self, route: str, status_code: int, start: float) -> None:
+        # Imported here so that the metrics utility is not loaded by the per function handlers
+        from aws_lambda_powertools.metrics import EphemeralMetrics, MetricUnit
+
+        # Unlike Metrics, EphemeralMetrics do not share their state between the instances,
+        # the routes can be dispatched by concurrent threads (see api_helpers.server)
+        metrics = EphemeralMetrics(namespace=self.metrics_namespace)
+        metrics.add_dimension(name="route", value=route)
+        metrics.add_metric(name="Invocations", unit=MetricUnit.Count, value=1)
+        metrics.add_metric(
+            name="ClientErrors",
+            unit=MetricUnit.Count,
+            value=int(400 <= status_code < 500),
+        )
+        metrics.add_metric(
+            name="ServerErrors", unit=MetricUnit.Count, value=int(status_code >= 500)
+        )
+        metrics.add_metric(
+            name="Latency",
+            unit=MetricUnit.Milliseconds,
+            value=(time.perf_counter() - start) * 1000,
+        )
+        metrics.flush_metrics()
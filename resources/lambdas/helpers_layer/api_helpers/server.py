@@ -0,0 +1,303 @@
+import asyncio
+import json
+import os
+import re
+import socket
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qsl
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+from api_helpers.router import Router
+from log_helpers import ensure_logger
+
+# Headers carrying the caller identity when the server runs behind a trusted proxy that
+# authenticates the callers (or locally). They replace the requestContext.identity that
+# API Gateway adds to the Lambda events.
+IDENTITY_HEADERS = {
+    "x-cognito-identity-id": "cognitoIdentityId",
+    "x-cognito-identity-pool-id": "cognitoIdentityPoolId",
+    "x-cognito-authentication-type": "cognitoAuthenticationType",
+    "x-cognito-authentication-provider": "cognitoAuthenticationProvider",
+}
+
+
+class ResourceMatcher:
+    """
+    Finds the API Gateway resource (e.g. "/shop/{id}/orders") of a request path and its path
+    parameters (e.g. {"id": "0001"})
+
+    Args:
+        resources (list[str]): The API Gateway resources
+    """
+
+    def __init__(self, resources: list[str]):
+        self.patterns = []
+        for resource in resources:
+            pattern = re.sub(r"\\{(\w+)\\}", r"(?P<\1>[^/]+)", re.escape(resource))
+            self.patterns.append((resource, re.compile(f"^{pattern}/?$")))
+
+    def match(self, path: str) -> tuple[str | None, dict]:
+        for resource, pattern in self.patterns:
+            match = pattern.match(path)
+            if match:
+                return resource, match.groupdict()
+        return None, {}
+
+
+def build_lambda_event(
+    matcher: ResourceMatcher,
+    method: str,
+    path: str,
+    query_string: str,
+    headers: dict,
+    body: str | None,
+    trust_identity_headers: bool = False,
+) -> dict:
+    """Builds the API Gateway proxy event of an HTTP request, as read by LambdaEvent"""
+    headers = {name.lower(): value for name, value in headers.items()}
+    resource, path_parameters = matcher.match(path)
+    query_parameters = dict(parse_qsl(query_string, keep_blank_values=True))
+    identity = {"sourceIp": headers.get("x-forwarded-for")}
+    if trust_identity_headers:
+        identity.update(
+            {
+                key: headers[header]
+                for header, key in IDENTITY_HEADERS.items()
+                if header in headers
+            }
+        )
+    return {
+        "body": body or None,
+        "httpMethod": method.upper(),
+        "path": path,
+        # The path itself is not a resource and is answered with a 404 by the router
+        "resource": resource or path,
+        "headers": headers,
+        "queryStringParameters": query_parameters or None,
+        "pathParameters": path_parameters or None,
+        "requestContext": {"identity": identity},
+    }
+
+
+def _status_line(status_code: int) -> str:
+    try:
+        return f"{status_code} {HTTPStatus(status_code).phrase}"
+    except ValueError:
+        return str(status_code)
+
+
+def _response_headers(response: dict) -> list[tuple[str, str]]:
+    # API Gateway drops the headers without value (e.g. an unset CORS origin)
+    return [
+        (name, str(value))
+        for name, value in response.get("headers", {}).items()
+        if value is not None
+    ]
+
+
+class WsgiApp:
+    """
+    WSGI application serving the routes of a Router, so that the api_* functions can run
+    in a long lived service instead of Lambda functions
+
+    Args:
+        router (Router): The router of the API routes
+        trust_identity_headers (bool): Read the caller identity from the IDENTITY_HEADERS.
+            Only enable it behind a proxy authenticating the callers or for local tests
+    """
+
+    def __init__(self, router: Router, trust_identity_headers: bool = False):
+        self.router = router
+        self.matcher = ResourceMatcher(list(router.routes))
+        self.trust_identity_headers = trust_identity_headers
+
+    def handle(
+        self, method: str, path: str, query_string: str, headers: dict, body: str
+    ) -> dict:
+        """Returns the API Gateway proxy response of an HTTP request"""
+        event = build_lambda_event(
+            self.matcher,
+            method,
+            path,
+            query_string,
+            headers,
+            body,
+            self.trust_identity_headers,
+        )
+        return self.router.dispatch(event)
+
+    def __call__(self, environ: dict, start_response):
+        headers = {
+            key[5:].replace("_", "-"): value
+            for key, value in environ.items()
+            if key.startswith("HTTP_")
+        }
+        if environ.get("CONTENT_TYPE"):
+            headers["content-type"] = environ["CONTENT_TYPE"]
+        content_length = int(environ.get("CONTENT_LENGTH") or 0)
+        body = environ["wsgi.input"].read(content_length).decode("utf-8")
+        response = self.handle(
+            environ["REQUEST_METHOD"],
+            environ.get("PATH_INFO", "/"),
+            environ.get("QUERY_STRING", ""),
+            headers,
+            body,
+        )
+        response_body = response.get("body", "").encode("utf-8")
+        response_headers = _response_headers(response)
+        response_headers.append(("Content-Length", str(len(response_body))))
+        start_response(_status_line(response["statusCode"]), response_headers)
+        return [response_body]
+
+
+class AsgiApp:
+    """
+    ASGI application serving the routes of a Router (e.g. with uvicorn). The api_* functions
+    are blocking, they run in a thread pool of the given number of workers.
+
+    Args:
+        wsgi_app (WsgiApp): The application handling the requests
+        workers (int): The number of threads running the api_* functions
+    """
+
+    def __init__(self, wsgi_app: WsgiApp, workers: int = 8):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="api-worker"
+        )
+
+    async def __call__(self, scope: dict, receive, send):
+        if scope["type"] != "http":
+            return
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+        headers = {
+            name.decode("latin-1"): value.decode("latin-1")
+            for name, value in scope["headers"]
+        }
+        response = await asyncio.get_running_loop().run_in_executor(
+            self.executor,
+            self.wsgi_app.handle,
+            scope["method"],
+            scope["path"],
+            scope["query_string"].decode("latin-1"),
+            headers,
+            body.decode("utf-8"),
+        )
+        response_body = response.get("body", "").encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": response["statusCode"],
+                "headers": [
+                    (name.lower().encode("latin-1"), value.encode("latin-1"))
+                    for name, value in _response_headers(response)
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": response_body})
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Request handler without the access log on stderr"""
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadPoolWSGIServer(WSGIServer):
+    """WSGI server handling the requests with a fixed pool of worker threads"""
+
+    # Restarting the server must not wait for the old connections to time out
+    allow_reuse_address = True
+
+    def __init__(self, *args, workers: int = 8, **kwargs):
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="api-worker"
+        )
+        super().__init__(*args, **kwargs)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
+
+
+def make_wsgi_server(
+    app, host: str = "127.0.0.1", port: int = 8080, workers: int = 8, quiet=False
+) -> ThreadPoolWSGIServer:
+    """Returns a server of the WSGI app, handling the requests with a pool of worker threads"""
+    return make_server(
+        host,
+        port,
+        app,
+        server_class=lambda *args, **kwargs: ThreadPoolWSGIServer(
+            *args, workers=workers, **kwargs
+        ),
+        handler_class=QuietRequestHandler if quiet else WSGIRequestHandler,
+    )
+
+
+def serve(
+    server: socketserver.BaseServer, processes: int = 1, after_fork=None, logger=None
+) -> None:
+    """
+    Serves the requests until interrupted. With more than one process, the server socket is
+    shared by forked worker processes (POSIX only), each with its own pool of threads.
+
+    Args:
+        server: The server, e.g. from make_wsgi_server
+        processes (int): The number of processes serving the requests
+        after_fork (callable): Called in the forked processes, e.g. to rebuild the AWS
+            clients which must not share their connections with the parent process
+        logger: The logger
+    """
+    logger = ensure_logger(logger)
+    children = []
+    if processes > 1:
+        for _ in range(processes - 1):
+            pid = os.fork()
+            if pid == 0:
+                children = []
+                if after_fork is not None:
+                    after_fork()
+                break
+            children.append(pid)
+    host, port = server.server_address[:2]
+    logger.info(
+        json.dumps({"type": "server", "pid": os.getpid(), "host": host, "port": port})
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for pid in children:
+            try:
+                os.kill(pid, 15)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+
+
+def free_port(host: str = "127.0.0.1") -> int:
+    """Returns a free TCP port of the host"""
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
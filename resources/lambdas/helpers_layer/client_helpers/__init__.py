@@ -0,0 +1,95 @@
+import os
+import threading
+import boto3
+from botocore.config import Config
+
+# The AWS clients and resources are built once per Lambda container and reused by all
+# the invocations, so that the warm invocations reuse the connection pool, the TLS
+# connections and the resolved credentials.
+# The connection pool must be large enough for the concurrent calls of the helpers thread pool.
+CLIENT_CONFIG = Config(
+    max_pool_connections=int(os.environ.get("AWS_CLIENT_MAX_POOL_CONNECTIONS", "20")),
+    tcp_keepalive=True,
+    connect_timeout=float(os.environ.get("AWS_CLIENT_CONNECT_TIMEOUT", "2")),
+    read_timeout=float(os.environ.get("AWS_CLIENT_READ_TIMEOUT", "5")),
+    retries={
+        "mode": os.environ.get("AWS_CLIENT_RETRY_MODE", "standard"),
+        "max_attempts": int(os.environ.get("AWS_CLIENT_MAX_ATTEMPTS", "3")),
+    },
+)
+
+_lock = threading.Lock()
+_session = None
+_clients = {}
+_resources = {}
+
+
+def _get_session() -> boto3.session.Session:
+    global _session
+    if _session is None:
+        _session = boto3.session.Session()
+    return _session
+
+
+def get_client(service_name: str):
+    """Returns the shared client of an AWS service (e.g. "cognito-idp")"""
+    client = _clients.get(service_name)
+    if client is None:
+        # boto3 sessions are not thread safe, clients are built one at a time
+        with _lock:
+            client = _clients.get(service_name)
+            if client is None:
+                client = _get_session().client(service_name, config=CLIENT_CONFIG)
+                _clients[service_name] = client
+    return client
+
+
+def get_resource(service_name: str):
+    """Returns the shared resource of an AWS service (e.g. "dynamodb")"""
+    resource = _resources.get(service_name)
+    if resource is None:
+        with _lock:
+            resource = _resources.get(service_name)
+            if resource is None:
+                resource = _get_session().resource(service_name, config=CLIENT_CONFIG)
+                _resources[service_name] = resource
+    return resource
+
+
+def set_client(service_name: str, client) -> None:
+    """Inject the client to use for an AWS service (e.g. a test client)"""
+    with _lock:
+        _clients[service_name] = client
+
+
+def set_resource(service_name: str, resource) -> None:
+    """Inject the resource to use for an AWS service (e.g. a test resource)"""
+    with _lock:
+        _resources[service_name] = resource
+
+
+def reset_clients() -> None:
+    """Forget all the shared clients and resources, they are rebuilt on their next use"""
+    global _session
+    with _lock:
+        _session = None
+        _clients.clear()
+        _resources.clear()
+
+
+def prime(clients: list[str] = (), resources: list[str] = ()) -> None:
+    """
+    Build the clients and resources during the Lambda init phase, so that the first
+    request does not pay for it. Meant to be called at the module level of a handler.
+    In Lambda the AWS credentials are resolved as well.
+
+    Args:
+        clients (list[str]): The names of the services to build a client for (e.g. "cognito-idp")
+        resources (list[str]): The names of the services to build a resource for (e.g. "dynamodb")
+    """
+    for service_name in clients:
+        get_client(service_name)
+    for service_name in resources:
+        get_resource(service_name)
+    if os.environ.get("AWS_LAMBDA_FUNCTION_NAME"):
+        _get_session().get_credentials()
@@ -1,5 +1,5 @@
-import boto3
 from log_helpers import ensure_logger
+from timing_helpers import timed_phase
 
 
 class AppUser:
@@ -23,9 +23,18 @@ class AppUser:
     Args:
         request_identity (dict): The requestContext.identity object from the lambda event
         user_pool_id (str): The Cognito User Pool ID
+        attributes (dict): The user attributes if they have already been fetched (e.g. with
+            cognito_helpers.aio.get_app_user). If None they are fetched from the User Pool
     """
 
-    def __init__(self, request_identity: dict, user_pool_id: str = None, logger=None):
+    def __init__(
+        self,
+        request_identity: dict,
+        user_pool_id: str = None,
+        logger=None,
+        attributes: dict = None,
+    ):
+        self.logger = ensure_logger(logger)
         self.user_pool_id = user_pool_id
         self.identity_pool_id = request_identity.get("cognitoIdentityPoolId")
         self.identity_id = request_identity.get("cognitoIdentityId")
@@ -44,8 +53,9 @@ class AppUser:
             if self.authenticated_type == "authenticated"
             else "visitor"
         )
-        self.attributes = self._get_user_attributes()
-        self.logger = ensure_logger(logger)
+        if attributes is None:
+            attributes = self._get_user_attributes()
+        self.attributes = attributes
 
     def _cognito_attributes_as_dict(self, attribute_list: list[dict]) -> dict:
         """
@@ -53,6 +63,7 @@ class AppUser:
         """
         return {attribute["Name"]: attribute["Value"] for attribute in attribute_list}
 
+    @timed_phase("cognito")
     def _get_user_attributes(self) -> dict:
         """Get the user data from the cognito pool and returns it as a dict"""
         if not self.sub:
@@ -61,8 +72,11 @@ class AppUser:
         if not self.user_pool_id:
             # The user is an authenticated user but the user_pool_id is not set
             raise ValueError("user_pool_id is not set")
+        # Imported here so that importing AppUser does not load boto3
+        from client_helpers import get_client
+
         try:
-            cognito_idp_client = boto3.client("cognito-idp")
+            cognito_idp_client = get_client("cognito-idp")
             cognito_user = cognito_idp_client.admin_get_user(
                 UserPoolId=self.user_pool_id, Username=self.sub
             )
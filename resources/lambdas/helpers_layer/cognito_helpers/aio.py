@@ -0,0 +1,48 @@
+from contextlib import AsyncExitStack
+from cognito_helpers import AppUser
+from log_helpers import ensure_logger
+
+
+async def get_app_user(
+    request_identity: dict,
+    user_pool_id: str = None,
+    logger=None,
+    cognito_idp_client=None,
+) -> AppUser:
+    """
+    Async counterpart of AppUser(request_identity, user_pool_id, logger). The attributes of
+    an authenticated user are fetched with an async Cognito client so that the call can be
+    awaited concurrently with other lookups.
+
+    Args:
+        request_identity (dict): The requestContext.identity object from the lambda event
+        user_pool_id (str): The Cognito User Pool ID
+        cognito_idp_client: An aioboto3 cognito-idp client. If None a client is created
+            for the call (requires the aioboto3 package)
+    """
+    logger = ensure_logger(logger)
+    user = AppUser(request_identity, user_pool_id, logger=logger, attributes={})
+    if not user.sub:
+        # The user is not an authenticated user
+        return user
+    if not user_pool_id:
+        # The user is an authenticated user but the user_pool_id is not set
+        raise ValueError("user_pool_id is not set")
+    try:
+        async with AsyncExitStack() as stack:
+            if cognito_idp_client is None:
+                import aioboto3
+
+                cognito_idp_client = await stack.enter_async_context(
+                    aioboto3.Session().client("cognito-idp")
+                )
+            cognito_user = await cognito_idp_client.admin_get_user(
+                UserPoolId=user_pool_id, Username=user.sub
+            )
+    except Exception as e:
+        logger.exception(f"Failed to get user data for user {user.sub} from cognito", e)
+        raise e
+    user.attributes = user._cognito_attributes_as_dict(
+        cognito_user.get("UserAttributes")
+    )
+    return user
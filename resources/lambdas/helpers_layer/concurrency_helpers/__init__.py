@@ -0,0 +1,27 @@
+import contextvars
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Small thread pool shared by all the invocations of a Lambda container, used to run
+# independent I/O calls (DynamoDB, Cognito) of a request concurrently
+THREAD_POOL_SIZE = int(os.environ.get("HELPERS_THREAD_POOL_SIZE", "8"))
+
+_executor = ThreadPoolExecutor(
+    max_workers=THREAD_POOL_SIZE, thread_name_prefix="helpers-io"
+)
+
+
+def submit(fn, *args, **kwargs) -> Future:
+    """Run fn(*args, **kwargs) on the shared thread pool and return its Future.
+    fn runs in a copy of the context of the caller (e.g. with the phase timer of the
+    invocation, see timing_helpers)."""
+    return _executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def discard(*futures: Future) -> None:
+    """Discard work which is not needed anymore (e.g. the request has been rejected).
+    The calls which have not started yet are cancelled, the results of the running ones
+    are ignored. None values (work which was not submitted) are skipped."""
+    for future in futures:
+        if future is not None:
+            future.cancel()
@@ -1,27 +1,322 @@
-import boto3
+import base64
+import binascii
+import heapq
+import json
+import os
 import random
 import string
+import threading
+import time
 import uuid
-from datetime import datetime, timedelta, timezone
+import zlib
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
 from decimal import Decimal
 from boto3.dynamodb.conditions import Key, Attr
 from botocore.exceptions import ClientError
+from client_helpers import get_resource
 from log_helpers import ensure_logger
+from timing_helpers import timed_phase
+from dynamodb_helpers.records import Order, OrderItem, Product, Shop  # noqa: F401
+from dynamodb_helpers.storage import DynamodbStorage, InMemoryStorage, Storage
+
+
+# Single timestamp format used for the order dates and the GSI sort keys.
+# All timestamps are in UTC with a fixed width so that they sort lexicographically.
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+# Sort key prefixes of the per-day and per-month sales rollup items stored in the shop partition
+SALES_DAY_PREFIX = "sales#d#"
+SALES_MONTH_PREFIX = "sales#m#"
+
+# Table attributes of the API fields which are not stored under their own name
+ORDER_FIELD_ATTRIBUTES = {"orderId": "PK", "shopId": "GSI1-PK", "customerId": "GSI2-PK"}
+ORDER_LINE_ITEM_ATTRIBUTES = ["SK", "entityType", "name", "price", "quantity"]
+SHOP_FIELD_ATTRIBUTES = {"shopId": "PK"}
+# Key and index attributes of the table, they are not returned by the API
+TABLE_SCHEMA_ATTRIBUTES = frozenset(
+    ["PK", "SK", "GSI1-PK", "GSI1-SK", "GSI2-PK", "GSI2-SK", "entityType"]
+)
 
 
 class ShopDoesNotExist(Exception):
     pass
 
 
+def format_timestamp(timestamp: datetime) -> str:
+    """Format a datetime as a sortable UTC timestamp (e.g. 2024-01-31T13:45:00Z)"""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc)
+    return timestamp.strftime(TIMESTAMP_FORMAT)
+
+
+def normalize_timestamp(value: str, end_of_day: bool = False) -> str:
+    """Normalize an ISO 8601 date or timestamp string to the sortable timestamp format.
+    Timestamps without timezone are considered to be in UTC.
+    A date without time (e.g. 2024-01-31) is the start of the day, or its last second
+    if end_of_day is True, so that it can be used as an inclusive upper bound.
+    Raises a ValueError if the value is not a valid ISO 8601 date or timestamp.
+    """
+    try:
+        timestamp = datetime.fromisoformat(value)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid timestamp: {value}") from e
+    if end_of_day and len(value) == len("YYYY-MM-DD"):
+        timestamp = timestamp.replace(hour=23, minute=59, second=59)
+    return format_timestamp(timestamp)
+
+
+def sort_key_range_condition(key_name: str, date_from: str = None, date_to: str = None):
+    """Build the key condition restricting a timestamp sort key to the given range.
+    Returns None if neither bound is set.
+    """
+    if date_from:
+        date_from = normalize_timestamp(date_from)
+    if date_to:
+        date_to = normalize_timestamp(date_to, end_of_day=True)
+    if date_from and date_to:
+        return Key(key_name).between(date_from, date_to)
+    if date_from:
+        return Key(key_name).gte(date_from)
+    if date_to:
+        return Key(key_name).lte(date_to)
+    return None
+
+
+def sales_rollup_keys(order_timestamp: str) -> tuple[str, str]:
+    """Returns the sort keys of the day and month sales rollup items an order
+    placed at order_timestamp (in the sortable timestamp format) is counted in"""
+    day = order_timestamp[: len("YYYY-MM-DD")]
+    return f"{SALES_DAY_PREFIX}{day}", f"{SALES_MONTH_PREFIX}{day[:7]}"
+
+
+def shop_gsi1_pk(shop_id: str, order_id: str, shards: int = 1) -> str:
+    """Returns the GSI1-PK of an order of a shop.
+    Orders of unsharded shops (shards <= 1) are all in the s#{shop_id} partition.
+    Orders of shops flagged as hot are spread over the s#{shop_id}#{shard} partitions,
+    the shard being derived from the order ID.
+    """
+    if shards <= 1:
+        return f"s#{shop_id}"
+    return f"s#{shop_id}#{zlib.crc32(order_id.encode()) % shards}"
+
+
+def shop_gsi1_pks(shop_id: str, shards: int = 1, resharding: bool = False) -> list[str]:
+    """Returns all the GSI1-PK partitions which may hold orders of a shop with the given
+    number of shards. An unsharded shop has the single s#{shop_id} partition. The
+    s#{shop_id} partition of a sharded shop is only included while it is being resharded,
+    for the orders written before it was sharded which have not been moved yet."""
+    if shards <= 1:
+        return [f"s#{shop_id}"]
+    shard_pks = [f"s#{shop_id}#{shard}" for shard in range(shards)]
+    return [f"s#{shop_id}"] + shard_pks if resharding else shard_pks
+
+
+def gsi1_shards(shop_data: dict) -> tuple[int, int]:
+    """Returns the number of GSI1 shards new orders of a shop are written to and the
+    number of shards which must be read (larger while the shop is being resharded), from
+    its gsi1Shards and gsi1ReshardFrom attributes"""
+    write_shards = int(shop_data.get("gsi1Shards", 1))
+    read_shards = max(write_shards, int(shop_data.get("gsi1ReshardFrom", 1)))
+    return write_shards, read_shards
+
+
+def gsi1_shop_key(gsi1_pk: str) -> str:
+    """Returns the shop key (e.g. s#1234) of a, possibly sharded, GSI1-PK"""
+    return "#".join(gsi1_pk.split("#")[:2])
+
+
+def sales_rollup_key_ranges(
+    date_from: str = None, date_to: str = None
+) -> list[tuple[str, str]]:
+    """Returns the (first_key, last_key) sort key ranges of the sales rollup items covering
+    the days date_from and date_to (e.g. 2024-01-31) included. Open bounds are unlimited.
+
+    The full months of the range are read from the month rollups and only the days at
+    the start and the end of the range from the day rollups. So any range covers at most
+    one item per month plus about 60 day items.
+    Raises a ValueError if date_from or date_to are not valid dates.
+    """
+    try:
+        first_day = date.fromisoformat(date_from) if date_from else None
+        last_day = date.fromisoformat(date_to) if date_to else None
+    except ValueError as e:
+        raise ValueError(f"Invalid date: {e}") from e
+    if first_day is not None and last_day is not None and first_day > last_day:
+        raise ValueError(f"Invalid date range: {date_from} is after {date_to}")
+    # First day of the first full month of the range and first day of the month
+    # following its last full month
+    first_full_month = first_day
+    if first_day is not None and first_day.day != 1:
+        first_full_month = (first_day.replace(day=28) + timedelta(days=4)).replace(
+            day=1
+        )
+    after_full_months = last_day
+    if last_day is not None:
+        after_full_months = last_day.replace(day=1)
+        if (last_day + timedelta(days=1)).day == 1:
+            after_full_months = last_day + timedelta(days=1)
+
+    ranges = []
+    if (
+        first_full_month is not None
+        and after_full_months is not None
+        and first_full_month >= after_full_months
+    ):
+        # No full month in the range: only read the day rollups
+        ranges.append((SALES_DAY_PREFIX, first_day, last_day))
+    else:
+        if first_day is not None and first_day != first_full_month:
+            ranges.append(
+                (
+                    SALES_DAY_PREFIX,
+                    first_day,
+                    first_full_month - timedelta(days=1),
+                )
+            )
+        last_full_month = (
+            after_full_months - timedelta(days=1)
+            if after_full_months is not None
+            else None
+        )
+        ranges.append((SALES_MONTH_PREFIX, first_full_month, last_full_month))
+        if last_day is not None and last_day != last_full_month:
+            ranges.append((SALES_DAY_PREFIX, after_full_months, last_day))
+    key_ranges = []
+    for prefix, range_start, range_end in ranges:
+        key_length = len("YYYY-MM-DD") if prefix == SALES_DAY_PREFIX else len("YYYY-MM")
+        first_key = prefix + (
+            range_start.isoformat()[:key_length] if range_start else ""
+        )
+        # "~" sorts after all the digits, so that the open range includes all the keys
+        last_key = prefix + (range_end.isoformat()[:key_length] if range_end else "~")
+        key_ranges.append((first_key, last_key))
+    return key_ranges
+
+
+def iter_merge_gsi1_partitions(partitions: list[Iterable]) -> Iterator[dict]:
+    """Lazily merge the orders of the GSI1 partitions of a sharded shop by GSI1 sort key.
+    The partitions can be lists or iterators of orders sorted by GSI1 sort key."""
+    # While a shop is resharded an order may briefly show up in two partitions. Both
+    # copies have the same sort key, so only the orders of the current one are remembered
+    current_sort_key = None
+    seen_orders = set()
+    for item in heapq.merge(*partitions, key=lambda item: item["GSI1-SK"]):
+        if item["GSI1-SK"] != current_sort_key:
+            current_sort_key = item["GSI1-SK"]
+            seen_orders.clear()
+        if item["PK"] not in seen_orders:
+            seen_orders.add(item["PK"])
+            yield item
+
+
+def merge_gsi1_partitions(partitions: list[list]) -> list:
+    """Merge the orders read from the GSI1 partitions of a sharded shop by GSI1 sort key"""
+    return list(iter_merge_gsi1_partitions(partitions))
+
+
+def chunked(items: Iterable, size: int) -> Iterator[list]:
+    """Yields the items in lists of up to size items, e.g. to process the items of an
+    iter_* method in batches"""
+    if size < 1:
+        raise ValueError("The chunk size must be at least 1")
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def backoff_delay(attempt: int, base: float = 0.05, cap: float = 2.0) -> float:
+    """Returns the delay before the retry following the given attempt (0 for the first
+    one): a random delay up to an exponentially growing bound ("full jitter"), so that
+    concurrent writers which were throttled together do not retry together"""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def projection_kwargs(
+    fields: list[str], field_attributes: dict, required_attributes: list[str] = ()
+) -> dict:
+    """Returns the ProjectionExpression and ExpressionAttributeNames arguments of a read
+    returning only the attributes of the given API fields (e.g. ["orderId", "amount"]) and
+    the required_attributes. Returns no arguments (whole items) if fields is None.
+    All the attributes are aliased, some are reserved words (e.g. name, status) or are
+    not valid in an expression (e.g. GSI1-PK).
+    """
+    if fields is None:
+        return {}
+    attributes = dict.fromkeys(
+        [
+            *required_attributes,
+            *(field_attributes.get(field, field) for field in fields),
+        ]
+    )
+    names = {f"#a{index}": attribute for index, attribute in enumerate(attributes)}
+    return {
+        "ProjectionExpression": ", ".join(names),
+        "ExpressionAttributeNames": names,
+    }
+
+
+def encode_cursor(last_evaluated_key: dict | None) -> str | None:
+    """Encode a DynamoDB LastEvaluatedKey into an opaque pagination cursor"""
+    if not last_evaluated_key:
+        return None
+    return base64.urlsafe_b64encode(
+        json.dumps(last_evaluated_key, sort_keys=True).encode()
+    ).decode()
+
+
+def decode_cursor(cursor: str | None) -> dict | None:
+    """Decode a pagination cursor back into a DynamoDB ExclusiveStartKey.
+    Raises a ValueError if the cursor is not a valid cursor.
+    """
+    if not cursor:
+        return None
+    try:
+        start_key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(start_key, dict):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return start_key
+
+
 class DynamodbTestOrdersData:
-    def __init__(self, table_name: str, dynamodb_resource=None, logger=None):
+    """
+    The data access methods of the orders table.
+
+    Args:
+        table_name (str): The DynamoDB table name
+        dynamodb_resource: The boto3 DynamoDB resource, the shared one by default
+        logger: The logger
+        storage (Storage): The storage of the items (see dynamodb_helpers.storage), by
+            default the DynamoDB table, which is created if it does not exist. E.g. an
+            InMemoryStorage for the tests and the local development.
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        dynamodb_resource=None,
+        logger=None,
+        storage: Storage = None,
+    ):
         self.table_name = table_name
+        self.logger = ensure_logger(logger)
+        if storage is not None:
+            self.ddb = None
+            self.table = storage
+            return
         if dynamodb_resource is not None:
             self.ddb = dynamodb_resource
         else:
-            self.ddb = boto3.resource("dynamodb")
-        self.logger = ensure_logger(logger)
-        self.table = self._create_table()
+            self.ddb = get_resource("dynamodb")
+        self.table = DynamodbStorage(self._create_table(), self.ddb)
 
     def _create_table(self):
         # Check if the table already exists
@@ -70,7 +365,7 @@ class DynamodbTestOrdersData:
             )
             self.logger.info(f"Table {self.table_name} is being created")
             # Wait for the table to be created
-            waiter = boto3.client("dynamodb").get_waiter("table_exists")
+            waiter = self.ddb.meta.client.get_waiter("table_exists")
             waiter.wait(TableName=self.table_name)
             self.logger.info(f"Table {self.table_name} has been created")
             return table
@@ -83,7 +378,7 @@ class DynamodbTestOrdersData:
             "entityType": "shop",
             "name": f"Shop {shop_id}",
             "phoneNumber": "077" + "".join(random.choices(string.digits, k=7)),
-            "address": f'{{"street": {{"S": "Dammweg {random.randint(1,10)}"}}, "city": {{"S": "Bern"}}, "postalCode": {{"N": "3013"}}',
+            "address": f'{{"street": {{"S": "Dammweg {random.randint(1, 10)}"}}, "city": {{"S": "Bern"}}, "postalCode": {{"N": "3013"}}',
         }
 
     def prefill_table_with_testdata(self, test_customers: list[dict] = None) -> None:
@@ -163,7 +458,7 @@ class DynamodbTestOrdersData:
                 shop_id = order_nb
                 # Generate the order date as the current date minus the order_id days
                 order_date = datetime.now(timezone.utc) - timedelta(days=order_id)
-                order_date_str = order_date.strftime("%Y-%m-%dT%H:%M:%SZ")
+                order_date_str = format_timestamp(order_date)
                 total_amount = 0
                 # Generate the order product data. Each order has 1 product ordered
                 # The first customer orders the first product of every shop, the second customer the second product of every shop...
@@ -208,6 +503,11 @@ class DynamodbTestOrdersData:
             self.logger.error(f"Error while writing the orders data to the table: {e}")
             raise e
         self.logger.info("Test order items data have been written to the table")
+        for item in order_data:
+            if item["entityType"] == "order":
+                self._add_orders_to_sales_rollups(
+                    gsi1_shop_key(item["GSI1-PK"]), [(item["GSI1-SK"], item["amount"])]
+                )
 
     def get_product_data_by_number(self, shop_nb: int, product_nb: int) -> dict:
         """Get the product data by the shop and product numbers (e.g. shop 1 and product 1)"""
@@ -221,6 +521,111 @@ class DynamodbTestOrdersData:
             )
         return product_data
 
+    def iter_query(self, page_size: int = None, **query_kwargs) -> Iterator[dict]:
+        """Lazily page through a Query and yield its items one at a time, so that only one
+        page of items is held in memory. page_size is the Limit of each page request."""
+        return self._iter_pages(self.table.query, page_size, query_kwargs)
+
+    def iter_scan(self, page_size: int = None, **scan_kwargs) -> Iterator[dict]:
+        """Lazily page through a Scan and yield its items one at a time, so that only one
+        page of items is held in memory. page_size is the Limit of each page request."""
+        return self._iter_pages(self.table.scan, page_size, scan_kwargs)
+
+    @staticmethod
+    def _iter_pages(operation, page_size: int, kwargs: dict) -> Iterator[dict]:
+        kwargs = dict(kwargs)
+        if page_size is not None:
+            kwargs["Limit"] = page_size
+        while True:
+            response = operation(**kwargs)
+            yield from response.get("Items", [])
+            if "LastEvaluatedKey" not in response:
+                return
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    def _batch_get_items(
+        self, keys: list[dict], max_attempts: int = 5, **keys_and_attributes
+    ) -> list[dict]:
+        """Read items by key with BatchGetItem, 100 keys per call. The keys DynamoDB could
+        not process are retried with a jittered exponential back off. keys_and_attributes are
+        added to the request of the table (e.g. ProjectionExpression).
+        Returns the items which exist, in no particular order.
+        """
+        items = []
+        # BatchGetItem reads at most 100 items per call
+        for i in range(0, len(keys), 100):
+            request_items = {
+                self.table_name: {"Keys": keys[i : i + 100], **keys_and_attributes}
+            }
+            for attempt in range(max_attempts):
+                batch_response = self.table.batch_get_item(RequestItems=request_items)
+                items.extend(batch_response["Responses"].get(self.table_name, []))
+                request_items = batch_response.get("UnprocessedKeys")
+                if not request_items:
+                    break
+                # Back off before retrying the keys DynamoDB could not process
+                time.sleep(backoff_delay(attempt))
+            else:
+                raise RuntimeError(
+                    f"Failed to read {len(keys)} items after {max_attempts} attempts"
+                )
+        return items
+
+    def _batch_write_items(
+        self, items: list[dict], max_attempts: int = 5
+    ) -> list[dict]:
+        """Put items with BatchWriteItem, 25 items per call. The items DynamoDB could not
+        process are retried with a jittered exponential back off.
+        Returns the items which could still not be written after max_attempts.
+        """
+        failed_items = []
+        # BatchWriteItem writes at most 25 items per call
+        for i in range(0, len(items), 25):
+            request_items = {
+                self.table_name: [
+                    {"PutRequest": {"Item": item}} for item in items[i : i + 25]
+                ]
+            }
+            for attempt in range(max_attempts):
+                batch_response = self.table.batch_write_item(RequestItems=request_items)
+                request_items = batch_response.get("UnprocessedItems")
+                if not request_items:
+                    break
+                time.sleep(backoff_delay(attempt))
+            else:
+                failed_items.extend(
+                    request["PutRequest"]["Item"]
+                    for request in request_items[self.table_name]
+                )
+        return failed_items
+
+    @timed_phase("product_pricing")
+    def get_products_data_by_keys(
+        self, shop_key: str, product_keys: list[str], max_attempts: int = 5
+    ) -> dict:
+        """Get the data of several products of a shop (e.g. shop s#0001 and products
+        [p#0011, p#0012]) with batched reads. Duplicated keys are read once.
+        Returns a dict of the product data by product key, products which do not exist are missing.
+        """
+        unique_product_keys = list(dict.fromkeys(product_keys))
+        products_data = {
+            product_data["SK"]: product_data
+            for product_data in self._batch_get_items(
+                [
+                    {"PK": shop_key, "SK": product_key}
+                    for product_key in unique_product_keys
+                ],
+                max_attempts=max_attempts,
+            )
+        }
+        for product_key in unique_product_keys:
+            if product_key not in products_data:
+                self.logger.warning(
+                    f"Product data not found for shop {shop_key} and product {product_key}"
+                )
+        return products_data
+
+    @timed_phase("product_pricing")
     def get_product_data_by_key(self, shop_key: str, product_key: str) -> dict:
         """Get the product data by the shop and product Key (e.g. shop s#0001 and product p#0011)"""
         get_response = self.table.get_item(Key={"PK": shop_key, "SK": product_key})
@@ -231,6 +636,7 @@ class DynamodbTestOrdersData:
             )
         return product_data
 
+    @timed_phase("shop_write")
     def regenerate_shop_token(self, shop_id: str) -> str:
         # Generate random token: 3 uppercase letters + 3 digits
         letters = "".join(random.choices(string.ascii_uppercase, k=3))
@@ -254,6 +660,7 @@ class DynamodbTestOrdersData:
                 # Re-raise other unexpected exceptions
                 raise
 
+    @timed_phase("order_write")
     def put_new_order(
         self,
         shop_id: int,
@@ -261,21 +668,569 @@ class DynamodbTestOrdersData:
         phone_number: str,
         customer_name: str,
         items: list[dict],
+        gsi1_shards: int = None,
+        products_data: dict = None,
+        order_id: str = None,
     ) -> str:
         """Put a new order in the databasewith the given data.
         The order is composed of the shop ID, the phone number of the customer and the list of product items.
         Items must be a list of dictionaries with the following keys: productId, quantity
+        gsi1_shards is the number of GSI1 shards of the shop (the gsi1Shards shop attribute).
+        If it is not given it is read from the shop.
+        products_data are the products data by product key (see get_products_data_by_keys)
+        if they have already been read, otherwise each product is read.
+        order_id is the ID reserved for the order (see reserve_idempotent_order_id), a new
+        one is generated if it is not given. If the order is already placed, e.g. by an
+        earlier attempt of the same request, it is not written again.
         """
+        if order_id is None:
+            order_id = self._generate_unique_request_id()
+        elif self.get_order_status(order_id) is not None:
+            self.logger.info(f"Order o#{order_id} is already placed")
+            return order_id
+        order_timestamp = format_timestamp(datetime.now(timezone.utc))
+        shop_key = f"s#{shop_id}"
+        if gsi1_shards is None:
+            gsi1_shards = self._get_shop_shards(shop_id)[0]
+        if products_data is None:
+            products_data = {}
+            for item in items:
+                product_key = f"p#{item['productId']}"
+                products_data[product_key] = self.get_product_data_by_key(
+                    shop_key, product_key
+                )
+        order_data, total_amount = self._build_order_items(
+            order_id,
+            shop_id,
+            customer_key,
+            phone_number,
+            customer_name,
+            items,
+            order_timestamp,
+            int(gsi1_shards),
+            products_data,
+        )
+        self.logger.info(f"Writing all items to the table for new order o#{order_id}")
+        try:
+            # The order item is put last, the order is only visible with all its items
+            with self.table.batch_writer() as batch:
+                for item in order_data[:-1]:
+                    batch.put_item(Item=item)
+            placed = self._put_order_item(order_data[-1])
+        except Exception as e:
+            self.logger.error(f"Error while writing the orders data to the table: {e}")
+            raise e
+        if not placed:
+            # The order exists, e.g. placed by a concurrent attempt of the same request
+            return order_id
+        self.logger.info(f"Items have been written to the table for order o#{order_id}")
+        try:
+            self._add_orders_to_sales_rollups(
+                shop_key, [(order_timestamp, total_amount)]
+            )
+        except Exception as e:
+            # The order is stored, the rollups can be rebuilt from the orders by the
+            # rebuild_sales_rollups migration, so we do not fail the order for that
+            self.logger.error(f"Error while updating the sales rollups: {e}")
+        return order_id
+
+    @timed_phase("order_write")
+    def put_new_orders(
+        self,
+        shop_id: str,
+        orders: list[dict],
+        customer_key: str = None,
+        gsi1_shards: int = None,
+        max_attempts: int = 5,
+    ) -> list[dict]:
+        """Put several new orders of a shop in the database in bulk.
+        Each order is a dict with the keys phoneNumber, name and items (see put_new_order),
+        any other key is ignored: every order gets a new order ID, the customer_key and
+        the current date.
+        The products of all the orders are read once with batched reads, the order IDs are
+        checked with batched reads and all the order items are written with batched writes.
+        Returns the result of each order, in the same order: {"orderId": ...} if the order
+        is stored or {"error": ...} if it is not. Orders which could not be written are
+        flagged with "retryable": True.
+        """
+        order_ids = self._generate_unique_request_ids(len(orders))
+        now = format_timestamp(datetime.now(timezone.utc))
+        return self._put_orders(
+            shop_id,
+            [
+                {
+                    **{
+                        key: order[key]
+                        for key in ("phoneNumber", "name", "items")
+                        if key in order
+                    },
+                    "orderId": order_id,
+                    "customerKey": customer_key,
+                    "date": now,
+                }
+                for order_id, order in zip(order_ids, orders)
+            ],
+            gsi1_shards,
+            max_attempts,
+        )
+
+    @timed_phase("order_write")
+    def put_queued_orders(
+        self,
+        shop_id: str,
+        orders: list[dict],
+        gsi1_shards: int = None,
+        max_attempts: int = 5,
+    ) -> list[dict]:
+        """Place several queued orders of a shop in bulk, only for the queue consumer.
+        Each order is a dict with the keys of put_new_orders and:
+        * orderId: the order ID reserved with reserve_order_request
+        * customerKey: the customer of the order, None if it has none
+        * date (optional): the timestamp of the order instead of now
+        An order which has already been placed (the queue delivers a message at least
+        once) is not written nor added to the sales rollups again.
+        Returns the result of each order, see put_new_orders.
+        """
+        now = format_timestamp(datetime.now(timezone.utc))
+        return self._put_orders(
+            shop_id,
+            [
+                {
+                    **order,
+                    "customerKey": order.get("customerKey"),
+                    "date": order.get("date", now),
+                }
+                for order in orders
+            ],
+            gsi1_shards,
+            max_attempts,
+            queued=True,
+        )
+
+    def _put_orders(
+        self,
+        shop_id: str,
+        orders: list[dict],
+        gsi1_shards: int,
+        max_attempts: int,
+        queued: bool = False,
+    ) -> list[dict]:
+        """Put orders with their orderId, customerKey and date set, see put_new_orders.
+        The line items of the orders are written first. The order item of each order is
+        then put on its own, only if all its line items were written and the order has
+        not been placed yet (see _put_order_item), so that an order is never visible
+        without its line items and an order delivered twice by the queue is only added
+        to the sales rollups once."""
+        shop_key = f"s#{shop_id}"
+        if gsi1_shards is None:
+            gsi1_shards = self._get_shop_shards(shop_id)[0]
+        products_data = self.get_products_data_by_keys(
+            shop_key,
+            [f"p#{item['productId']}" for order in orders for item in order["items"]],
+            max_attempts=max_attempts,
+        )
+
+        results = []
+        orders_data = {}
+        for order in orders:
+            order_id = order["orderId"]
+            order_timestamp = order["date"]
+            try:
+                order_data, total_amount = self._build_order_items(
+                    order_id,
+                    shop_id,
+                    order["customerKey"],
+                    order["phoneNumber"],
+                    order["name"],
+                    order["items"],
+                    order_timestamp,
+                    int(gsi1_shards),
+                    products_data,
+                )
+                orders_data[order_id] = (order_data, order_timestamp, total_amount)
+                results.append({"orderId": order_id})
+            except (KeyError, TypeError, ValueError) as e:
+                results.append({"error": f"Invalid order: {e}"})
+
+        self.logger.info(
+            f"Writing the items of {len(orders_data)} new orders to the table"
+        )
+        # The order item is the last item of each order, the order is only visible in the
+        # shop and customer listings once it is put after all its line items
+        failed_items = self._batch_write_items(
+            [
+                item
+                for order_data, _, _ in orders_data.values()
+                for item in order_data[:-1]
+            ],
+            max_attempts=max_attempts,
+        )
+        # The orders whose line items must be deleted, they are not visible without
+        # their order item
+        unplaced_order_keys = {item["PK"] for item in failed_items}
+        failed_order_keys = set(unplaced_order_keys)
+        placed_order_keys = set()
+        for order_data, _, _ in orders_data.values():
+            order_item = order_data[-1]
+            if order_item["PK"] in failed_order_keys:
+                continue
+            try:
+                if self._put_order_item(order_item, queued):
+                    placed_order_keys.add(order_item["PK"])
+                elif not queued:
+                    # Only possible if the unique order ID was taken in the meantime,
+                    # the line items now belong to the existing order
+                    self.logger.error(f"Order {order_item['PK']} already exists")
+                    failed_order_keys.add(order_item["PK"])
+            except Exception as e:
+                self.logger.error(f"Error while writing the order item: {e}")
+                unplaced_order_keys.add(order_item["PK"])
+                failed_order_keys.add(order_item["PK"])
+        if failed_order_keys:
+            self.logger.error(f"Failed to write the orders {sorted(failed_order_keys)}")
+        if queued and unplaced_order_keys:
+            # Unless the order was placed by another delivery of the same message in the
+            # meantime, the line items are then the ones of the placed order
+            order_requests = self.get_order_requests(
+                [order_key.split("#")[-1] for order_key in unplaced_order_keys]
+            )
+            unplaced_order_keys = {
+                order_key
+                for order_key in unplaced_order_keys
+                if order_requests.get(order_key.split("#")[-1], {}).get("entityType")
+                != "order"
+            }
+        if unplaced_order_keys:
+            self._delete_order_line_items(
+                [
+                    order_data[:-1]
+                    for order_data, _, _ in orders_data.values()
+                    if order_data[-1]["PK"] in unplaced_order_keys
+                ]
+            )
+        for result in results:
+            if f"o#{result.get('orderId')}" in failed_order_keys:
+                result["error"] = "Failed to store the order"
+                result["retryable"] = True
+                del result["orderId"]
+
+        try:
+            self._add_orders_to_sales_rollups(
+                shop_key,
+                [
+                    (order_timestamp, total_amount)
+                    for order_id, (
+                        _,
+                        order_timestamp,
+                        total_amount,
+                    ) in orders_data.items()
+                    if f"o#{order_id}" in placed_order_keys - failed_order_keys
+                ],
+            )
+        except Exception as e:
+            self.logger.error(f"Error while updating the sales rollups: {e}")
+        return results
+
+    def _put_order_item(self, order_item: dict, queued: bool = False) -> bool:
+        """Put the order item of an order, unless the order already exists. The order item
+        of a queued order replaces its order request, unless the order has already been
+        placed (e.g. by another delivery of the same message).
+        Returns True if the order item was put, False if the order was already placed."""
+        condition_kwargs = {"ConditionExpression": "attribute_not_exists(PK)"}
+        if queued:
+            condition_kwargs = {
+                "ConditionExpression": "attribute_not_exists(PK) OR (entityType = :request AND #status = :queued)",
+                "ExpressionAttributeNames": {"#status": "status"},
+                "ExpressionAttributeValues": {
+                    ":request": "orderRequest",
+                    ":queued": "QUEUED",
+                },
+            }
+        try:
+            self.table.put_item(Item=order_item, **condition_kwargs)
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise e
+            self.logger.info(f"Order {order_item['PK']} is already placed")
+            return False
+        return True
+
+    def _delete_order_line_items(self, orders_line_items: list[list[dict]]) -> None:
+        """Delete the line items of orders whose order item could not be put, so that no
+        line items are left without their order. The line items which were not written
+        are deleted too, deleting a missing item is a no-op."""
+        try:
+            with self.table.batch_writer() as batch:
+                for line_items in orders_line_items:
+                    for line_item in line_items:
+                        batch.delete_item(
+                            Key={"PK": line_item["PK"], "SK": line_item["SK"]}
+                        )
+        except Exception as e:
+            self.logger.error(f"Error while deleting the order line items: {e}")
+
+    @timed_phase("order_write")
+    def reserve_order_request(
+        self,
+        shop_id: str,
+        customer_key: str | None,
+        max_attempts: int = 10,
+        order_id: str = None,
+    ) -> str:
+        """Reserve a new order ID for an order which is queued to be placed later
+        (see put_queued_orders). An order request item is written at the key of the order,
+        it is replaced by the order once it is placed.
+        order_id is the ID reserved for the order (see reserve_idempotent_order_id). If an
+        earlier attempt of the same request already wrote its order request, it is kept:
+        the order is only placed once however many times it is queued.
+        Raises a RuntimeError if no unique ID could be reserved in max_attempts.
+        """
+        order_request = {
+            "entityType": "orderRequest",
+            "status": "QUEUED",
+            "shopId": shop_id,
+            "date": format_timestamp(datetime.now(timezone.utc)),
+        }
+        if customer_key is not None:
+            order_request["customerKey"] = customer_key
+        reserved_order_id = order_id
+        for _ in range(1 if reserved_order_id else max_attempts):
+            order_id = reserved_order_id or "".join(random.choices(string.digits, k=4))
+            try:
+                # The condition reserves the ID, no other order or request can use it
+                self.table.put_item(
+                    Item={
+                        "PK": f"o#{order_id}",
+                        "SK": f"o#{order_id}",
+                        **order_request,
+                    },
+                    ConditionExpression="attribute_not_exists(PK)",
+                )
+                return order_id
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise e
+                if reserved_order_id:
+                    self.logger.info(f"Order o#{order_id} is already reserved")
+                    return order_id
+        raise RuntimeError("Failed to reserve a unique order ID")
+
+    def fail_order_request(self, order_id: str, error: str) -> None:
+        """Mark a queued order request as failed, it will not be placed"""
+        try:
+            self.table.update_item(
+                Key={"PK": f"o#{order_id}", "SK": f"o#{order_id}"},
+                UpdateExpression="SET #status = :failed, #error = :error",
+                ConditionExpression="entityType = :request",
+                ExpressionAttributeNames={"#status": "status", "#error": "error"},
+                ExpressionAttributeValues={
+                    ":failed": "FAILED",
+                    ":error": error,
+                    ":request": "orderRequest",
+                },
+            )
+        except ClientError as e:
+            # The order has been placed in the meantime
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise e
+
+    def get_order_requests(self, order_ids: list[str]) -> dict:
+        """Get the order request or order items of several order IDs by order ID, without
+        their details. Order IDs without item are missing."""
+        items = self._batch_get_items(
+            [
+                {"PK": f"o#{order_id}", "SK": f"o#{order_id}"}
+                for order_id in dict.fromkeys(order_ids)
+            ],
+            ProjectionExpression="PK, entityType, #status",
+            ExpressionAttributeNames={"#status": "status"},
+        )
+        return {item["PK"].split("#")[-1]: item for item in items}
+
+    @timed_phase("order_read")
+    def get_order_status(self, order_id: str) -> dict | None:
+        """Get the placement status of an order (e.g. 1234):
+        * QUEUED: the order is queued to be placed (see reserve_order_request)
+        * FAILED: the order could not be placed, the reason is in "error"
+        * COMMITTED: the order is placed
+        Returns None if there is no such order.
+        """
+        item = self.table.get_item(
+            Key={"PK": f"o#{order_id}", "SK": f"o#{order_id}"}
+        ).get("Item")
+        if item is None:
+            return None
+        if item.get("entityType") == "order":
+            order_data = self._abstract_order_item_schema(item)
+            return {
+                "orderId": order_id,
+                "status": "COMMITTED",
+                "shopId": order_data["shopId"],
+                "customerId": order_data["customerId"],
+            }
+        order_status = {
+            "orderId": order_id,
+            "status": item["status"],
+            "shopId": item["shopId"],
+            "customerId": item["customerKey"].split("#")[-1]
+            if "customerKey" in item
+            else None,
+        }
+        if "error" in item:
+            order_status["error"] = item["error"]
+        return order_status
+
+    @timed_phase("idempotency")
+    def start_idempotent_request(
+        self,
+        idempotency_key: str,
+        request_hash: str,
+        ttl_seconds: int = 86400,
+        lock_seconds: int = 30,
+    ) -> dict | None:
+        """Start a request made with an idempotency key (e.g. u#1234#<Idempotency-Key>).
+        An IN_PROGRESS record is written at the key if there is none yet, so that the
+        concurrent requests with the same key are held off until the first one completes.
+        The record expires after ttl_seconds (the table TTL attribute "expiresAt"), the
+        IN_PROGRESS marker of a request which never completed after lock_seconds.
+
+        Returns None if the request can proceed, otherwise the current record
+        {"status": "IN_PROGRESS" | "COMPLETED", "requestHash": ..., "response": ...}.
+        If the lock of an attempt of the same request which reserved an order ID (see
+        reserve_idempotent_order_id) has expired, the request proceeds with that order ID:
+        {"status": "RESUMED", "requestHash": ..., "orderId": ...} is returned.
+        """
+        key = {"PK": f"idem#{idempotency_key}", "SK": f"idem#{idempotency_key}"}
+        while True:
+            now = int(time.time())
+            try:
+                put_response = self.table.put_item(
+                    Item={
+                        **key,
+                        "entityType": "idempotencyKey",
+                        "status": "IN_PROGRESS",
+                        "requestHash": request_hash,
+                        "lockExpiresAt": now + lock_seconds,
+                        "expiresAt": now + ttl_seconds,
+                    },
+                    # The TTL deletion of the expired records can take a while
+                    ConditionExpression="attribute_not_exists(PK) OR expiresAt < :now OR (#status = :in_progress AND lockExpiresAt < :now)",
+                    ExpressionAttributeNames={"#status": "status"},
+                    ExpressionAttributeValues={
+                        ":now": now,
+                        ":in_progress": "IN_PROGRESS",
+                    },
+                    ReturnValues="ALL_OLD",
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise e
+            else:
+                old_item = put_response.get("Attributes")
+                if (
+                    old_item is None
+                    or old_item["status"] != "IN_PROGRESS"
+                    or old_item["expiresAt"] < now
+                    or old_item["requestHash"] != request_hash
+                    or "orderId" not in old_item
+                ):
+                    return None
+                # The lock of an attempt of the same request expired after it reserved
+                # its order ID, the order may have been placed
+                self.table.update_item(
+                    Key=key,
+                    UpdateExpression="SET orderId = :order_id",
+                    ExpressionAttributeValues={":order_id": old_item["orderId"]},
+                )
+                return {
+                    "status": "RESUMED",
+                    "requestHash": request_hash,
+                    "orderId": old_item["orderId"],
+                }
+            item = self.table.get_item(Key=key, ConsistentRead=True).get("Item")
+            # Otherwise the record has been released in the meantime, try again
+            if item is not None:
+                record = {"status": item["status"], "requestHash": item["requestHash"]}
+                if "response" in item:
+                    record["response"] = json.loads(item["response"])
+                return record
+
+    @timed_phase("idempotency")
+    def reserve_idempotent_order_id(self, idempotency_key: str) -> str:
+        """Generate the order ID of a request started with start_idempotent_request and
+        store it in its record before the order is placed, so that a retry of the request
+        places the same order (see put_new_order) instead of a second one"""
         order_id = self._generate_unique_request_id()
+        self.table.update_item(
+            Key={"PK": f"idem#{idempotency_key}", "SK": f"idem#{idempotency_key}"},
+            UpdateExpression="SET orderId = :order_id",
+            ConditionExpression="#status = :in_progress",
+            ExpressionAttributeNames={"#status": "status"},
+            ExpressionAttributeValues={
+                ":order_id": order_id,
+                ":in_progress": "IN_PROGRESS",
+            },
+        )
+        return order_id
+
+    @timed_phase("idempotency")
+    def complete_idempotent_request(
+        self, idempotency_key: str, response: dict, ttl_seconds: int = 86400
+    ) -> None:
+        """Store the response of a request started with start_idempotent_request, it is
+        returned for the requests with the same key until the record expires"""
+        self.table.update_item(
+            Key={"PK": f"idem#{idempotency_key}", "SK": f"idem#{idempotency_key}"},
+            UpdateExpression="SET #status = :completed, #response = :response, expiresAt = :expires_at REMOVE lockExpiresAt",
+            ExpressionAttributeNames={"#status": "status", "#response": "response"},
+            ExpressionAttributeValues={
+                ":completed": "COMPLETED",
+                ":response": json.dumps(response),
+                ":expires_at": int(time.time()) + ttl_seconds,
+            },
+        )
+
+    @timed_phase("idempotency")
+    def release_idempotent_request(self, idempotency_key: str) -> None:
+        """Delete the IN_PROGRESS record of a request which did not complete, so that it
+        can be retried with the same key"""
+        try:
+            self.table.delete_item(
+                Key={"PK": f"idem#{idempotency_key}", "SK": f"idem#{idempotency_key}"},
+                ConditionExpression="#status = :in_progress",
+                ExpressionAttributeNames={"#status": "status"},
+                ExpressionAttributeValues={":in_progress": "IN_PROGRESS"},
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise e
+
+    @staticmethod
+    def _build_order_items(
+        order_id: str,
+        shop_id: str,
+        customer_key: str | None,
+        phone_number: str,
+        customer_name: str,
+        items: list[dict],
+        order_timestamp: str,
+        gsi1_shards: int,
+        products_data: dict,
+    ) -> tuple[list[dict], Decimal]:
+        """Build the order line items and the order item of a new order and compute its amount.
+        Orders without customer_key (e.g. imported from a point of sale) are not added to GSI2.
+        Shared with the async data layer (see aio.AsyncDynamodbTestOrdersData.put_new_order).
+        Raises a ValueError if a product does not exist.
+        """
         order_key = f"o#{order_id}"
-        order_timestamp = datetime.now(timezone.utc).isoformat()
-        shop_key = f"s#{shop_id}"
         # Get the products data and compute the order amount
         total_amount = 0
         order_data = []
         for item in items:
             product_key = f"p#{item['productId']}"
-            product_data = self.get_product_data_by_key(shop_key, product_key)
+            product_data = products_data.get(product_key)
+            if not product_data:
+                raise ValueError(f"Unknown product {item['productId']}")
             order_data.append(
                 {
                     "PK": order_key,
@@ -287,143 +1242,667 @@ class DynamodbTestOrdersData:
                 }
             )
             total_amount += product_data["price"] * item["quantity"]
-        order_data.append(
-            {
-                "PK": order_key,
-                "SK": order_key,
-                "entityType": "order",
-                "GSI1-PK": shop_key,
-                "GSI1-SK": order_timestamp,
-                "GSI2-PK": customer_key,
-                "GSI2-SK": order_timestamp,
-                "phoneNumber": phone_number,
-                "name": customer_name,
-                "date": order_timestamp,
-                "status": "PENDING",
-                "amount": total_amount,
-            }
-        )
-        self.logger.info(f"Writing all items to the table for new order {order_key}")
-        try:
-            with self.table.batch_writer() as batch:
-                for item in order_data:
-                    batch.put_item(Item=item)
-        except Exception as e:
-            self.logger.error(f"Error while writing the orders data to the table: {e}")
-            raise e
-        self.logger.info(f"Items have been written to the table for order {order_key}")
-        return order_id
+        order_item = {
+            "PK": order_key,
+            "SK": order_key,
+            "entityType": "order",
+            "GSI1-PK": shop_gsi1_pk(shop_id, order_id, gsi1_shards),
+            "GSI1-SK": order_timestamp,
+            "phoneNumber": phone_number,
+            "name": customer_name,
+            "date": order_timestamp,
+            "status": "PENDING",
+            "amount": total_amount,
+        }
+        if customer_key is not None:
+            order_item["GSI2-PK"] = customer_key
+            order_item["GSI2-SK"] = order_timestamp
+        order_data.append(order_item)
+        return order_data, total_amount
+
+    def _add_orders_to_sales_rollups(
+        self, shop_key: str, orders: list[tuple[str, Decimal]]
+    ) -> None:
+        """Atomically add orders, given as (order_timestamp, amount), to the day and month
+        sales rollup items of their shop. Each rollup item is updated once."""
+        rollups = {}
+        for order_timestamp, amount in orders:
+            day_key, month_key = sales_rollup_keys(order_timestamp)
+            for rollup_key, entity_type in [
+                (day_key, "salesDay"),
+                (month_key, "salesMonth"),
+            ]:
+                rollup = rollups.setdefault(rollup_key, [entity_type, 0, 0])
+                rollup[1] += amount
+                rollup[2] += 1
+        for rollup_key, (entity_type, amount, orders_count) in rollups.items():
+            self.table.update_item(
+                Key={"PK": shop_key, "SK": rollup_key},
+                UpdateExpression="SET entityType = :type ADD totalAmount :amount, ordersCount :count",
+                ExpressionAttributeValues={
+                    ":type": entity_type,
+                    ":amount": amount,
+                    ":count": orders_count,
+                },
+            )
+
+    def _sum_sales_rollups(self, shop_id: str, first_key: str, last_key: str) -> dict:
+        """Sum the sales rollup items of a shop with a sort key between first_key and last_key"""
+        sales = {"totalAmount": Decimal(0), "ordersCount": 0}
+        query_kwargs = {
+            "KeyConditionExpression": Key("PK").eq(f"s#{shop_id}")
+            & Key("SK").between(first_key, last_key),
+        }
+        while True:
+            query_response = self.table.query(**query_kwargs)
+            for rollup in query_response.get("Items", []):
+                sales["totalAmount"] += rollup["totalAmount"]
+                sales["ordersCount"] += int(rollup["ordersCount"])
+            if "LastEvaluatedKey" not in query_response:
+                break
+            query_kwargs["ExclusiveStartKey"] = query_response["LastEvaluatedKey"]
+        return sales
+
+    @timed_phase("sales_query")
+    def get_sales_by_shop_id(
+        self, shop_id: str, date_from: str = None, date_to: str = None
+    ) -> dict:
+        """Get the sales total amount and number of orders of a shop (e.g. 1234) from the
+        sales rollup items, optionally between the days date_from and date_to (e.g. 2024-01-31)
+        included. See sales_rollup_key_ranges for the rollup items which are read.
+        Raises a ValueError if date_from or date_to are not valid dates.
+        """
+        sales = {"totalAmount": Decimal(0), "ordersCount": 0}
+        for first_key, last_key in sales_rollup_key_ranges(date_from, date_to):
+            range_sales = self._sum_sales_rollups(shop_id, first_key, last_key)
+            sales["totalAmount"] += range_sales["totalAmount"]
+            sales["ordersCount"] += range_sales["ordersCount"]
+        return sales
 
     @staticmethod
-    def _abstract_order_item_schema(order: dict) -> dict:
-        """Abstract the order item schema to the expected schema"""
+    def _abstract_order_item_schema(order: dict, fields: list[str] = None) -> dict:
+        """Abstract the order item schema to the expected schema. The item may only have
+        the attributes of the given fields (see projection_kwargs)"""
         # To abstract the table schema
         # Rename the PK to orderId and drop the SK
         # Rename the GSI2-PK key to customerId and drop the GSI2-SK
         # Remove the entityType since we know we are returning orders here
-        # Rename the GSI1-PK key to shopId and drop the GSI1-SK
-        return {
-            "orderId": order["PK"].split("#")[-1],
-            "shopId": order["GSI1-PK"].split("#")[-1],
-            "customerId": order["GSI2-PK"].split("#")[-1],
-            **{
-                k: v
-                for k, v in order.items()
-                if k
-                not in {
-                    "PK",
-                    "SK",
-                    "GSI1-PK",
-                    "GSI1-SK",
-                    "GSI2-PK",
-                    "GSI2-SK",
-                    "entityType",
-                }
-            },
-        }
-
-    def get_order_data(self, order_id: str) -> dict:
-        """Get the order data from the database by the order ID (e.g. 1234)"""
-        get_response = self.table.get_item(
-            Key={"PK": f"o#{order_id}", "SK": f"o#{order_id}"}
-        )
-        order_data = get_response.get("Item", {})
-        # Abstract the table schema
-        order_data = self._abstract_order_item_schema(order=order_data)
-        if not order_data:
-            self.logger.warning(f"Order data not found for order {order_id}")
+        # Rename the GSI1-PK key (without its shard suffix) to shopId and drop the GSI1-SK
+        order_data = {}
+        if "PK" in order:
+            order_data["orderId"] = order["PK"].split("#")[-1]
+        if "GSI1-PK" in order:
+            order_data["shopId"] = order["GSI1-PK"].split("#")[1]
+        if "GSI2-PK" in order:
+            order_data["customerId"] = order["GSI2-PK"].split("#")[-1]
+        elif fields is None or "customerId" in fields:
+            # Orders imported without customer (see put_new_orders) are not in GSI2
+            order_data["customerId"] = None
+        for key, value in order.items():
+            if key not in TABLE_SCHEMA_ATTRIBUTES:
+                order_data[key] = value
         return order_data
 
-    def list_products_by_shop_id(self, shop_id: str) -> list:
-        """Get the products from the database by the shop ID (e.g. 1234)"""
-        get_response = self.table.query(
-            KeyConditionExpression=Key("PK").eq(f"s#{shop_id}")
-            & Key("SK").begins_with("p#")
-        )
-        products_list = get_response.get("Items", [])
+    @staticmethod
+    def _abstract_order_line_item_schema(order_item: dict) -> dict:
+        """Abstract the order line item schema to the expected schema"""
+        # To abstract the table schema
+        # Rename the SK key to productId and drop the PK (it is the order key)
+        # Remove the entityType since we know we are returning order items here
+        order_item_data = {"productId": order_item["SK"].split("#")[-1]}
+        for key, value in order_item.items():
+            if key not in TABLE_SCHEMA_ATTRIBUTES:
+                order_item_data[key] = value
+        return order_item_data
+
+    @staticmethod
+    def _abstract_product_item_schema(product: dict) -> dict:
+        """Abstract the product item schema to the expected schema, in place"""
         # To abstract the table schema
         # Rename the PK key of shopId
         # Rename the SK key to productId
         # Remove the entityType since we know we are returning products here
-        for product in products_list:
-            product["shopId"] = product.pop("PK").split("#")[-1]
-            product["productId"] = product.pop("SK").split("#")[-1]
-            product.pop("entityType", None)
+        product["shopId"] = product.pop("PK").split("#")[-1]
+        product["productId"] = product.pop("SK").split("#")[-1]
+        product.pop("entityType", None)
+        return product
+
+    @timed_phase("order_read")
+    def get_order_data(
+        self, order_id: str, include_items: bool = True, fields: list[str] = None
+    ) -> dict:
+        """Get the order data from the database by the order ID (e.g. 1234)
+
+        The order header and its line items share the same partition key o#{order_id},
+        so they are all read with a single Query on the order partition. The line items
+        are returned in the "items" list of the order.
+        If include_items is False, only the order header is read.
+        If fields is set (e.g. ["orderId", "amount"]), only the attributes of these order
+        fields are read, the line items are read whole.
+        """
+        order_key = f"o#{order_id}"
+        if include_items:
+            key_condition = Key("PK").eq(order_key)
+        else:
+            key_condition = Key("PK").eq(order_key) & Key("SK").eq(order_key)
+        query_kwargs = {
+            "KeyConditionExpression": key_condition,
+            **projection_kwargs(
+                fields,
+                ORDER_FIELD_ATTRIBUTES,
+                ["PK", "entityType"]
+                + (ORDER_LINE_ITEM_ATTRIBUTES if include_items else []),
+            ),
+        }
+        order_header = {}
+        order_items = []
+        while True:
+            query_response = self.table.query(**query_kwargs)
+            for item in query_response.get("Items", []):
+                if item.get("entityType") == "order":
+                    order_header = item
+                elif item.get("entityType") == "orderItem":
+                    order_items.append(item)
+            if "LastEvaluatedKey" not in query_response:
+                break
+            query_kwargs["ExclusiveStartKey"] = query_response["LastEvaluatedKey"]
+        if not order_header:
+            self.logger.warning(f"Order data not found for order {order_id}")
+            return {}
+        # Abstract the table schema
+        order_data = self._abstract_order_item_schema(order=order_header, fields=fields)
+        if include_items:
+            order_data["items"] = [
+                self._abstract_order_line_item_schema(order_item)
+                for order_item in order_items
+            ]
+        return order_data
+
+    @timed_phase("order_read")
+    def get_orders_data(self, order_ids: list[str], fields: list[str] = None) -> dict:
+        """Get the order data (without line items) of several orders by ID (e.g. [1234, 5678])
+        with batched reads, optionally only the given fields.
+        Returns a dict of the order data by order ID, orders which do not exist are missing.
+        """
+        unique_order_ids = list(dict.fromkeys(order_ids))
+        orders = self._batch_get_items(
+            [
+                {"PK": f"o#{order_id}", "SK": f"o#{order_id}"}
+                for order_id in unique_order_ids
+            ],
+            **projection_kwargs(fields, ORDER_FIELD_ATTRIBUTES, ["PK"]),
+        )
+        return {
+            order_data["orderId"]: order_data
+            for order_data in (
+                self._abstract_order_item_schema(order, fields) for order in orders
+            )
+        }
+
+    @timed_phase("product_query")
+    def list_products_by_shop_id(self, shop_id: str) -> list:
+        """Get the products from the database by the shop ID (e.g. 1234)"""
+        products_list = list(self.iter_products_by_shop_id(shop_id))
         if not products_list:
             self.logger.warning(f"Products not found for shop {shop_id}")
         return products_list
 
-    def list_orders_by_shop_id(self, shop_id: str) -> list:
-        """Get the orders from the database by the shop ID (e.g. 1234)"""
-        query_response = self.table.query(
-            IndexName="GSI1", KeyConditionExpression=Key("GSI1-PK").eq(f"s#{shop_id}")
+    def iter_products_by_shop_id(
+        self, shop_id: str, page_size: int = None
+    ) -> Iterator[dict]:
+        """Lazily iterate over the products of a shop (e.g. 1234), see list_products_by_shop_id"""
+        for product in self._iter_product_items(shop_id, page_size):
+            yield self._abstract_product_item_schema(product)
+
+    def iter_product_records(
+        self, shop_id: str, page_size: int = None
+    ) -> Iterator[Product]:
+        """Lazily iterate over the products of a shop (e.g. 1234) as Product records, which
+        use less memory than the product dicts for large listings"""
+        for product in self._iter_product_items(shop_id, page_size):
+            yield Product.from_item(product)
+
+    def _iter_product_items(
+        self, shop_id: str, page_size: int = None
+    ) -> Iterator[dict]:
+        """Lazily iterate over the product items of a shop (e.g. 1234)"""
+        return self.iter_query(
+            page_size,
+            KeyConditionExpression=Key("PK").eq(f"s#{shop_id}")
+            & Key("SK").begins_with("p#"),
+        )
+
+    def _query_shop_orders(
+        self, shop_id: str, date_from: str = None, date_to: str = None, **query_kwargs
+    ) -> list:
+        """Query all the order items of a shop from the GSI1 index, optionally restricted
+        to a date range which is pushed down to the GSI1 sort key.
+
+        If the shop is sharded, all its GSI1 partitions are queried in parallel and the
+        results are merged by GSI1 sort key.
+        """
+        range_condition = sort_key_range_condition("GSI1-SK", date_from, date_to)
+        gsi1_pks = self._get_shop_gsi1_pks(shop_id)
+        if len(gsi1_pks) == 1:
+            return self._query_gsi1_partition(
+                gsi1_pks[0], range_condition, query_kwargs
+            )
+        # Query actions only use the thread-safe low-level client of the shared resource
+        with ThreadPoolExecutor(max_workers=len(gsi1_pks)) as executor:
+            partitions = list(
+                executor.map(
+                    lambda gsi1_pk: self._query_gsi1_partition(
+                        gsi1_pk, range_condition, query_kwargs
+                    ),
+                    gsi1_pks,
+                )
+            )
+        return merge_gsi1_partitions(partitions)
+
+    def _query_gsi1_partition(
+        self, gsi1_pk: str, range_condition, query_kwargs: dict
+    ) -> list:
+        """Query all the items of one GSI1 partition"""
+        return list(self._iter_gsi1_partition(gsi1_pk, range_condition, query_kwargs))
+
+    def _iter_gsi1_partition(
+        self,
+        gsi1_pk: str,
+        range_condition,
+        query_kwargs: dict,
+        page_size: int = None,
+    ) -> Iterator[dict]:
+        """Lazily iterate over the items of one GSI1 partition"""
+        key_condition = Key("GSI1-PK").eq(gsi1_pk)
+        if range_condition is not None:
+            key_condition = key_condition & range_condition
+        return self.iter_query(
+            page_size,
+            **query_kwargs,
+            IndexName="GSI1",
+            KeyConditionExpression=key_condition,
+        )
+
+    def _get_shop_sharding(self, shop_id: str) -> dict:
+        """Returns the gsi1Shards and gsi1ReshardFrom attributes of a shop, see gsi1_shards"""
+        get_item_response = self.table.get_item(
+            Key={"PK": f"s#{shop_id}", "SK": f"s#{shop_id}"},
+            ProjectionExpression="gsi1Shards, gsi1ReshardFrom",
+        )
+        return get_item_response.get("Item", {})
+
+    def _get_shop_shards(self, shop_id: str) -> tuple[int, int]:
+        """Returns the number of GSI1 shards new orders of the shop are written to and the
+        number of shards which must be read (larger while the shop is being resharded)"""
+        return gsi1_shards(self._get_shop_sharding(shop_id))
+
+    def _get_shop_gsi1_pks(self, shop_id: str) -> list[str]:
+        """Returns the GSI1 partitions which may hold orders of a shop"""
+        shop_data = self._get_shop_sharding(shop_id)
+        return shop_gsi1_pks(
+            shop_id,
+            gsi1_shards(shop_data)[1],
+            resharding="gsi1ReshardFrom" in shop_data,
+        )
+
+    def start_shop_resharding(self, shop_id: str, shards: int) -> int:
+        """Set the number of GSI1 shards of a shop. New orders are written to the new shards
+        right away while the reads keep including the previous shards until
+        finish_shop_resharding is called.
+        Returns the number of shards the existing orders of the shop may be in.
+        """
+        if shards < 1:
+            raise ValueError("The number of shards must be at least 1")
+        previous_shards = max(self._get_shop_shards(shop_id))
+        try:
+            self.table.update_item(
+                Key={"PK": f"s#{shop_id}", "SK": f"s#{shop_id}"},
+                UpdateExpression="SET gsi1Shards = :shards, gsi1ReshardFrom = :previous",
+                ConditionExpression="attribute_exists(PK)",
+                ExpressionAttributeValues={
+                    ":shards": shards,
+                    ":previous": previous_shards,
+                },
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                raise ShopDoesNotExist(f"Shop with ID {shop_id} does not exist.")
+            raise
+        return previous_shards
+
+    def finish_shop_resharding(self, shop_id: str) -> None:
+        """Stop reading the previous GSI1 shards of a shop once its orders have been moved"""
+        self.table.update_item(
+            Key={"PK": f"s#{shop_id}", "SK": f"s#{shop_id}"},
+            UpdateExpression="REMOVE gsi1ReshardFrom",
+        )
+
+    @timed_phase("order_query")
+    def list_orders_by_shop_id(
+        self,
+        shop_id: str,
+        date_from: str = None,
+        date_to: str = None,
+        fields: list[str] = None,
+    ) -> list:
+        """Get the orders from the database by the shop ID (e.g. 1234),
+        optionally only the ones placed between date_from and date_to and only the given
+        fields"""
+        orders_list = self._query_shop_orders(
+            shop_id,
+            date_from,
+            date_to,
+            # The keys merging the orders of the shards are always read
+            **projection_kwargs(fields, ORDER_FIELD_ATTRIBUTES, ["PK", "GSI1-SK"]),
         )
-        orders_list = query_response.get("Items", [])
         # Abstract the table schema
-        orders_list = [self._abstract_order_item_schema(order) for order in orders_list]
+        orders_list = [
+            self._abstract_order_item_schema(order, fields) for order in orders_list
+        ]
         if not orders_list:
             self.logger.warning(f"Orders not found for shop {shop_id}")
         return orders_list
 
-    def get_total_amount_by_shop_id(self, shop_id: str) -> Decimal:
-        """Get the total amount from the database by the shop ID (e.g. 1234)"""
-        query_response = self.table.query(
-            IndexName="GSI1", KeyConditionExpression=Key("GSI1-PK").eq(f"s#{shop_id}")
+    def iter_orders_by_shop_id(
+        self,
+        shop_id: str,
+        date_from: str = None,
+        date_to: str = None,
+        fields: list[str] = None,
+        page_size: int = None,
+    ) -> Iterator[dict]:
+        """Lazily iterate over the orders of a shop (e.g. 1234) by date, see
+        list_orders_by_shop_id. The partitions of a sharded shop are read one page at a time
+        and merged on the fly, instead of being read concurrently as a whole."""
+        orders = self._iter_order_items_by_shop_id(
+            shop_id, date_from, date_to, fields, page_size
+        )
+        # Not a generator function, so that the invalid dates are raised right away
+        return (self._abstract_order_item_schema(order, fields) for order in orders)
+
+    def iter_order_records_by_shop_id(
+        self,
+        shop_id: str,
+        date_from: str = None,
+        date_to: str = None,
+        fields: list[str] = None,
+        page_size: int = None,
+    ) -> Iterator[Order]:
+        """Lazily iterate over the orders of a shop (e.g. 1234) by date as Order records,
+        see iter_orders_by_shop_id"""
+        orders = self._iter_order_items_by_shop_id(
+            shop_id, date_from, date_to, fields, page_size
+        )
+        return (Order.from_item(order, fields) for order in orders)
+
+    def _iter_order_items_by_shop_id(
+        self,
+        shop_id: str,
+        date_from: str = None,
+        date_to: str = None,
+        fields: list[str] = None,
+        page_size: int = None,
+    ) -> Iterator[dict]:
+        """Lazily iterate over the order items of a shop (e.g. 1234) by date, see
+        iter_orders_by_shop_id"""
+        range_condition = sort_key_range_condition("GSI1-SK", date_from, date_to)
+        query_kwargs = projection_kwargs(
+            fields, ORDER_FIELD_ATTRIBUTES, ["PK", "GSI1-SK"]
+        )
+        partitions = [
+            self._iter_gsi1_partition(gsi1_pk, range_condition, query_kwargs, page_size)
+            for gsi1_pk in self._get_shop_gsi1_pks(shop_id)
+        ]
+        return (
+            partitions[0]
+            if len(partitions) == 1
+            else iter_merge_gsi1_partitions(partitions)
+        )
+
+    def iter_orders_with_positions(
+        self, shop_id: str = None, position: dict = None, page_size: int = None
+    ) -> Iterator[tuple[dict, dict]]:
+        """Lazily iterate over the orders (without line items) of a shop (e.g. 1234), or of
+        all the shops if shop_id is None, in no particular order.
+
+        Each order is yielded with the position right after it, the iteration can be
+        resumed from there (e.g. after an interruption) with position=last_position.
+        The positions are JSON serializable. The orders moved by a resharding of the shop
+        during the iteration may be missed or repeated.
+        Raises a ValueError if the position is not one of this iteration.
+        """
+        if shop_id is None:
+            partitions = {
+                "GSI1": (
+                    self.iter_scan,
+                    {
+                        "IndexName": "GSI1",
+                        "FilterExpression": Attr("entityType").eq("order"),
+                    },
+                )
+            }
+        else:
+            partitions = {
+                gsi1_pk: (
+                    self.iter_query,
+                    {
+                        "IndexName": "GSI1",
+                        "KeyConditionExpression": Key("GSI1-PK").eq(gsi1_pk),
+                    },
+                )
+                for gsi1_pk in self._get_shop_gsi1_pks(shop_id)
+            }
+        partition_names = list(partitions)
+        first_partition = 0
+        if position is not None:
+            if position.get("partition") not in partitions:
+                raise ValueError(f"Invalid position: {position}")
+            first_partition = partition_names.index(position["partition"])
+        for partition_name in partition_names[first_partition:]:
+            iterate, kwargs = partitions[partition_name]
+            if position is not None and partition_name == position["partition"]:
+                kwargs = {**kwargs, "ExclusiveStartKey": position["startKey"]}
+            for item in iterate(page_size, **kwargs):
+                yield (
+                    self._abstract_order_item_schema(item),
+                    {
+                        "partition": partition_name,
+                        # The key of the table and of GSI1, where the next page starts
+                        "startKey": {
+                            key: item[key] for key in ("PK", "SK", "GSI1-PK", "GSI1-SK")
+                        },
+                    },
+                )
+
+    @timed_phase("order_query")
+    def list_orders_by_customer(
+        self,
+        customer_key: str,
+        limit: int = 20,
+        cursor: str = None,
+        date_from: str = None,
+        date_to: str = None,
+        fields: list[str] = None,
+    ) -> tuple[list, str | None]:
+        """Get one page of the orders of a customer, newest first, by the customer key
+        (e.g. c#1234 or v#1234) from the GSI2 index.
+
+        The orders can be restricted to a date range with date_from and/or date_to which are
+        applied on the GSI2 sort key (the order timestamp).
+        The cursor is the value returned by the previous call to get the next page.
+        If fields is set, only the attributes of these fields are read.
+
+        :return: tuple[orders_list, next_cursor]: next_cursor is None on the last page
+        """
+        key_condition = Key("GSI2-PK").eq(customer_key)
+        range_condition = sort_key_range_condition("GSI2-SK", date_from, date_to)
+        if range_condition is not None:
+            key_condition = key_condition & range_condition
+        query_kwargs = {
+            "IndexName": "GSI2",
+            "KeyConditionExpression": key_condition,
+            "ScanIndexForward": False,
+            "Limit": limit,
+            **projection_kwargs(fields, ORDER_FIELD_ATTRIBUTES, ["PK"]),
+        }
+        start_key = decode_cursor(cursor)
+        if start_key is not None:
+            # Do not let a cursor page through the orders of another customer
+            if start_key.get("GSI2-PK") != customer_key:
+                raise ValueError(f"Invalid cursor: {cursor}")
+            query_kwargs["ExclusiveStartKey"] = start_key
+        query_response = self.table.query(**query_kwargs)
+        orders_list = [
+            self._abstract_order_item_schema(order, fields)
+            for order in query_response.get("Items", [])
+        ]
+        return orders_list, encode_cursor(query_response.get("LastEvaluatedKey"))
+
+    def iter_orders_by_customer(
+        self,
+        customer_key: str,
+        date_from: str = None,
+        date_to: str = None,
+        fields: list[str] = None,
+        page_size: int = None,
+    ) -> Iterator[dict]:
+        """Lazily iterate over all the orders of a customer (e.g. c#1234), newest first,
+        see list_orders_by_customer"""
+        key_condition = Key("GSI2-PK").eq(customer_key)
+        range_condition = sort_key_range_condition("GSI2-SK", date_from, date_to)
+        if range_condition is not None:
+            key_condition = key_condition & range_condition
+        orders = self.iter_query(
+            page_size,
+            IndexName="GSI2",
+            KeyConditionExpression=key_condition,
+            ScanIndexForward=False,
+            **projection_kwargs(fields, ORDER_FIELD_ATTRIBUTES, ["PK"]),
+        )
+        return (self._abstract_order_item_schema(order, fields) for order in orders)
+
+    @timed_phase("sales_query")
+    def get_total_amount_by_shop_id(
+        self, shop_id: str, date_from: str = None, date_to: str = None
+    ) -> Decimal:
+        """Get the total amount from the database by the shop ID (e.g. 1234),
+        optionally only for the orders placed between date_from and date_to"""
+        orders = self._query_shop_orders(
+            shop_id,
+            date_from,
+            date_to,
+            ProjectionExpression="PK, #sk, #amount",
+            ExpressionAttributeNames={"#sk": "GSI1-SK", "#amount": "amount"},
         )
         total_amount = Decimal(0)
-        for item in query_response["Items"]:
+        for item in orders:
             total_amount = total_amount + item["amount"]
         return total_amount
 
+    @timed_phase("shop_query")
     def list_shops(self) -> list[dict]:
         """Get the list of shops from the database"""
-        shops = []
-        scan_kwargs = {"FilterExpression": Attr("entityType").eq("shop")}
-        while True:
-            scan_response = self.table.scan(**scan_kwargs)
-            shops.extend(scan_response.get("Items", []))
-            if "LastEvaluatedKey" not in scan_response:
-                break
-            scan_kwargs["ExclusiveStartKey"] = scan_response["LastEvaluatedKey"]
-        for shop in shops:
-            shop["shopId"] = shop.pop("PK").split("#")[-1]
-            shop.pop("SK", None)
-        return shops
+        return list(self.iter_shops())
+
+    def iter_shops(self, page_size: int = None) -> Iterator[dict]:
+        """Lazily iterate over the shops, see list_shops. page_size is the number of items
+        scanned per request, most of them are not shops and are filtered out."""
+        for shop in self._iter_shop_items(page_size):
+            yield self._abstract_shop_item_schema(shop)
+
+    def iter_shop_records(self, page_size: int = None) -> Iterator[Shop]:
+        """Lazily iterate over the shops as Shop records, see iter_shops"""
+        for shop in self._iter_shop_items(page_size):
+            yield Shop.from_item(shop)
 
-    def get_shop_by_id(self, shop_id: str) -> dict:
+    def _iter_shop_items(self, page_size: int = None) -> Iterator[dict]:
+        """Lazily iterate over the shop items, see iter_shops"""
+        return self.iter_scan(page_size, FilterExpression=Attr("entityType").eq("shop"))
+
+    @timed_phase("shop_lookup")
+    def get_shop_by_id(self, shop_id: str, fields: list[str] = None) -> dict:
+        """Get a shop by ID (e.g. 1234), optionally only the given fields.
+        Returns None if the shop does not exist."""
         get_item_response = self.table.get_item(
-            Key={"PK": f"s#{shop_id}", "SK": f"s#{shop_id}"}
+            Key={"PK": f"s#{shop_id}", "SK": f"s#{shop_id}"},
+            **projection_kwargs(fields, SHOP_FIELD_ATTRIBUTES, ["PK"]),
         )
         shop_data = get_item_response.get("Item")
         if shop_data:
-            # To abstract the table schema
-            # Rename the PK key of shopId and remove the SK
-            # Remove the entityType since we know we are returning products here
-            shop_data["shopId"] = shop_data.pop("PK").split("#")[-1]
-            for key in ["SK", "entityType"]:
-                shop_data.pop(key, None)
+            shop_data = self._abstract_shop_item_schema(shop_data)
         return shop_data
 
+    @timed_phase("shop_lookup")
+    def get_shop_record(self, shop_id: str) -> Shop | None:
+        """Get a shop by ID (e.g. 1234) as a Shop record, with its attributes which are
+        not returned by the API (e.g. gsi1Shards) in its extra attributes.
+        Returns None if the shop does not exist."""
+        get_item_response = self.table.get_item(
+            Key={"PK": f"s#{shop_id}", "SK": f"s#{shop_id}"}
+        )
+        shop_data = get_item_response.get("Item")
+        return Shop.from_item(shop_data) if shop_data else None
+
+    @staticmethod
+    def _abstract_shop_item_schema(shop_data: dict) -> dict:
+        """Abstract the shop item schema to the expected schema, in place"""
+        # To abstract the table schema
+        # Rename the PK key of shopId and remove the SK
+        # Remove the entityType since we know we are returning shops here
+        # Remove the GSI1 sharding attributes, they are internal to the orders data
+        shop_data["shopId"] = shop_data.pop("PK").split("#")[-1]
+        for key in ["SK", "entityType", "gsi1Shards", "gsi1ReshardFrom"]:
+            shop_data.pop(key, None)
+        return shop_data
+
+    @timed_phase("shop_lookup")
+    def get_shops_by_ids(self, shop_ids: list[str], fields: list[str] = None) -> dict:
+        """Get several shops by ID (e.g. [1234, 5678]) with batched reads, optionally only
+        the given fields.
+        Returns a dict of the shop data by shop ID, shops which do not exist are missing.
+        """
+        unique_shop_ids = list(dict.fromkeys(shop_ids))
+        shops = self._batch_get_items(
+            [
+                {"PK": f"s#{shop_id}", "SK": f"s#{shop_id}"}
+                for shop_id in unique_shop_ids
+            ],
+            **projection_kwargs(fields, SHOP_FIELD_ATTRIBUTES, ["PK"]),
+        )
+        return {
+            shop_data["shopId"]: shop_data
+            for shop_data in map(self._abstract_shop_item_schema, shops)
+        }
+
+    def _generate_unique_request_ids(
+        self, count: int, id_length: int = 4, max_attempts: int = 10
+    ) -> list[str]:
+        """Generate count distinct order IDs which are not used yet, checking the
+        candidates with batched reads instead of one read per ID.
+        Raises a RuntimeError if not enough unique IDs could be generated in max_attempts.
+        """
+        order_ids = []
+        for _ in range(max_attempts):
+            missing = count - len(order_ids)
+            if missing == 0:
+                break
+            candidates = set()
+            while len(candidates) < missing:
+                candidate = "".join(random.choices(string.digits, k=id_length))
+                if candidate not in order_ids:
+                    candidates.add(candidate)
+            used_keys = {
+                item["PK"]
+                for item in self._batch_get_items(
+                    [{"PK": f"o#{c}", "SK": f"o#{c}"} for c in candidates],
+                    ProjectionExpression="PK",
+                )
+            }
+            order_ids.extend(c for c in candidates if f"o#{c}" not in used_keys)
+        if len(order_ids) < count:
+            raise RuntimeError(f"Failed to generate {count} unique order IDs")
+        return order_ids
+
     def _generate_unique_request_id(
         self, id_length: int = 4, max_attempts: int = 10
     ) -> string:
@@ -446,3 +1925,60 @@ class DynamodbTestOrdersData:
             if "Item" not in get_item_response:
                 return new_request_id
         return "ERROR"
+
+
+# The table handles are built once per Lambda container (or server process) and reused
+# by the warm invocations
+_orders_tables = {}
+_orders_tables_lock = threading.Lock()
+
+
+def get_orders_table(table_name: str, logger=None) -> DynamodbTestOrdersData:
+    """Returns the DynamodbTestOrdersData of the table, on the shared DynamoDB resource.
+    With the environment variable ORDERS_TABLE_STORAGE=memory (e.g. for the local server
+    and the load tests), the items are stored in an empty InMemoryStorage instead."""
+    orders_table = _orders_tables.get(table_name)
+    if orders_table is None:
+        with _orders_tables_lock:
+            orders_table = _orders_tables.get(table_name)
+            if orders_table is None:
+                orders_table = _build_orders_table(table_name, logger)
+                _orders_tables[table_name] = orders_table
+    return orders_table
+
+
+def _build_orders_table(table_name: str, logger=None) -> DynamodbTestOrdersData:
+    storage_type = os.environ.get("ORDERS_TABLE_STORAGE", "dynamodb")
+    if storage_type == "memory":
+        return DynamodbTestOrdersData(
+            table_name, logger=logger, storage=InMemoryStorage(table_name)
+        )
+    if storage_type != "dynamodb":
+        raise ValueError(
+            f"Unknown ORDERS_TABLE_STORAGE {storage_type}, use dynamodb or memory"
+        )
+    return DynamodbTestOrdersData(
+        table_name, dynamodb_resource=get_resource("dynamodb"), logger=logger
+    )
+
+
+def reset_orders_tables() -> None:
+    """Forget the table handles, they are rebuilt on their next use"""
+    with _orders_tables_lock:
+        _orders_tables.clear()
+
+
+def prime_orders_table(table_name: str, logger=None) -> DynamodbTestOrdersData | None:
+    """
+    Builds the table handle during the Lambda init phase, so that the first request does
+    not pay for the DescribeTable call. Outside of Lambda (e.g. when the handler is
+    imported by the tests) nothing is done. A failure is only logged, the table handle is
+    then built by the first request.
+    """
+    if not os.environ.get("AWS_LAMBDA_FUNCTION_NAME"):
+        return None
+    try:
+        return get_orders_table(table_name, logger)
+    except Exception as e:
+        ensure_logger(logger).warning(f"Failed to prime the table {table_name}: {e}")
+        return None
@@ -0,0 +1,414 @@
+import asyncio
+import random
+import string
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from decimal import Decimal
+from boto3.dynamodb.conditions import Key, Attr
+from botocore.exceptions import ClientError
+from dynamodb_helpers import (
+    DynamodbTestOrdersData,
+    ShopDoesNotExist,
+    decode_cursor,
+    encode_cursor,
+    format_timestamp,
+    gsi1_shards,
+    merge_gsi1_partitions,
+    sales_rollup_key_ranges,
+    sales_rollup_keys,
+    shop_gsi1_pks,
+    sort_key_range_condition,
+)
+from log_helpers import ensure_logger
+
+
+class AsyncDynamodbTestOrdersData:
+    """
+    Async counterpart of DynamodbTestOrdersData with the same data access methods, built on
+    an aioboto3 DynamoDB resource. Independent lookups can be awaited concurrently, e.g.
+    with asyncio.gather.
+
+    The table must already exist: creating the table, prefilling it with test data and
+    resharding shops are only done by DynamodbTestOrdersData.
+
+    Args:
+        table_name (str): The DynamoDB table name
+        dynamodb_resource: An entered aioboto3 DynamoDB resource (see connect)
+    """
+
+    def __init__(self, table_name: str, dynamodb_resource, logger=None):
+        self.table_name = table_name
+        self.ddb = dynamodb_resource
+        self.logger = ensure_logger(logger)
+        self._table = None
+
+    @classmethod
+    @asynccontextmanager
+    async def connect(cls, table_name: str, logger=None, **resource_kwargs):
+        """Create an aioboto3 DynamoDB resource for the lifetime of the context.
+        Requires the aioboto3 package (helpers_layer "async" extra).
+
+            async with AsyncDynamodbTestOrdersData.connect(TABLE_NAME) as orders_table:
+                shop_data = await orders_table.get_shop_by_id("0001")
+        """
+        import aioboto3
+
+        async with aioboto3.Session().resource(
+            "dynamodb", **resource_kwargs
+        ) as dynamodb_resource:
+            yield cls(table_name, dynamodb_resource, logger)
+
+    async def get_table(self):
+        if self._table is None:
+            self._table = await self.ddb.Table(self.table_name)
+        return self._table
+
+    async def get_product_data_by_number(self, shop_nb: int, product_nb: int) -> dict:
+        """Get the product data by the shop and product numbers (e.g. shop 1 and product 1)"""
+        return await self.get_product_data_by_key(
+            f"s#000{shop_nb}", f"p#00{shop_nb}{product_nb}"
+        )
+
+    async def get_product_data_by_key(self, shop_key: str, product_key: str) -> dict:
+        """Get the product data by the shop and product Key (e.g. shop s#0001 and product p#0011)"""
+        table = await self.get_table()
+        get_response = await table.get_item(Key={"PK": shop_key, "SK": product_key})
+        product_data = get_response.get("Item", {})
+        if not product_data:
+            self.logger.warning(
+                f"Product data not found for shop {shop_key} and product {product_key}"
+            )
+        return product_data
+
+    async def regenerate_shop_token(self, shop_id: str) -> str:
+        # Generate random token: 3 uppercase letters + 3 digits
+        letters = "".join(random.choices(string.ascii_uppercase, k=3))
+        digits = "".join(random.choices(string.digits, k=3))
+        new_token = letters + digits
+        table = await self.get_table()
+        try:
+            await table.update_item(
+                Key={"PK": f"s#{shop_id}", "SK": f"s#{shop_id}"},
+                UpdateExpression="SET shopToken = :token",
+                ConditionExpression="attribute_exists(PK)",  # Ensure the PK exists
+                ExpressionAttributeValues={":token": new_token},
+                ReturnValues="UPDATED_NEW",
+            )
+            return new_token
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                raise ShopDoesNotExist(f"Shop with ID {shop_id} does not exist.")
+            raise
+
+    async def put_new_order(
+        self,
+        shop_id: int,
+        customer_key: str,
+        phone_number: str,
+        customer_name: str,
+        items: list[dict],
+        gsi1_shards: int = None,
+    ) -> str:
+        """Put a new order in the database with the given data.
+        See DynamodbTestOrdersData.put_new_order. The order ID, the products data and the
+        number of GSI1 shards of the shop are all read concurrently.
+        Raises a ValueError if a product does not exist.
+        """
+        shop_key = f"s#{shop_id}"
+        lookups = [self._generate_unique_request_id()] + [
+            self.get_product_data_by_key(shop_key, f"p#{item['productId']}")
+            for item in items
+        ]
+        if gsi1_shards is None:
+            lookups.append(self._get_shop_shards(shop_id))
+        results = await asyncio.gather(*lookups)
+        order_id = results[0]
+        products_data = {
+            f"p#{item['productId']}": product_data
+            for item, product_data in zip(items, results[1 : len(items) + 1])
+        }
+        if gsi1_shards is None:
+            gsi1_shards = results[-1][0]
+
+        order_key = f"o#{order_id}"
+        order_timestamp = format_timestamp(datetime.now(timezone.utc))
+        # The same items as the sync data layer
+        order_data, total_amount = DynamodbTestOrdersData._build_order_items(
+            order_id,
+            shop_id,
+            customer_key,
+            phone_number,
+            customer_name,
+            items,
+            order_timestamp,
+            int(gsi1_shards),
+            products_data,
+        )
+        self.logger.info(f"Writing all items to the table for new order {order_key}")
+        table = await self.get_table()
+        try:
+            async with table.batch_writer() as batch:
+                for item in order_data:
+                    await batch.put_item(Item=item)
+        except Exception as e:
+            self.logger.error(f"Error while writing the orders data to the table: {e}")
+            raise e
+        self.logger.info(f"Items have been written to the table for order {order_key}")
+        try:
+            await self._add_order_to_sales_rollups(
+                shop_key, order_timestamp, total_amount
+            )
+        except Exception as e:
+            # The rollups can be rebuilt by the rebuild_sales_rollups migration
+            self.logger.error(f"Error while updating the sales rollups: {e}")
+        return order_id
+
+    async def _add_order_to_sales_rollups(
+        self, shop_key: str, order_timestamp: str, amount
+    ) -> None:
+        """Atomically add an order to the day and month sales rollup items of its shop"""
+        table = await self.get_table()
+        day_key, month_key = sales_rollup_keys(order_timestamp)
+        await asyncio.gather(
+            *[
+                table.update_item(
+                    Key={"PK": shop_key, "SK": rollup_key},
+                    UpdateExpression="SET entityType = :type ADD totalAmount :amount, ordersCount :one",
+                    ExpressionAttributeValues={
+                        ":type": entity_type,
+                        ":amount": amount,
+                        ":one": 1,
+                    },
+                )
+                for rollup_key, entity_type in [
+                    (day_key, "salesDay"),
+                    (month_key, "salesMonth"),
+                ]
+            ]
+        )
+
+    async def _query_all(self, **query_kwargs) -> list:
+        """Query all the pages of a query"""
+        table = await self.get_table()
+        items = []
+        while True:
+            query_response = await table.query(**query_kwargs)
+            items.extend(query_response.get("Items", []))
+            if "LastEvaluatedKey" not in query_response:
+                break
+            query_kwargs["ExclusiveStartKey"] = query_response["LastEvaluatedKey"]
+        return items
+
+    async def get_sales_by_shop_id(
+        self, shop_id: str, date_from: str = None, date_to: str = None
+    ) -> dict:
+        """Get the sales total amount and number of orders of a shop from the sales rollup
+        items. See DynamodbTestOrdersData.get_sales_by_shop_id"""
+        key_ranges = sales_rollup_key_ranges(date_from, date_to)
+        ranges_rollups = await asyncio.gather(
+            *[
+                self._query_all(
+                    KeyConditionExpression=Key("PK").eq(f"s#{shop_id}")
+                    & Key("SK").between(first_key, last_key)
+                )
+                for first_key, last_key in key_ranges
+            ]
+        )
+        sales = {"totalAmount": Decimal(0), "ordersCount": 0}
+        for rollups in ranges_rollups:
+            for rollup in rollups:
+                sales["totalAmount"] += rollup["totalAmount"]
+                sales["ordersCount"] += int(rollup["ordersCount"])
+        return sales
+
+    async def get_order_data(self, order_id: str, include_items: bool = True) -> dict:
+        """Get the order data from the database by the order ID (e.g. 1234)
+        See DynamodbTestOrdersData.get_order_data"""
+        order_key = f"o#{order_id}"
+        key_condition = Key("PK").eq(order_key)
+        if not include_items:
+            key_condition = key_condition & Key("SK").eq(order_key)
+        order_header = {}
+        order_items = []
+        for item in await self._query_all(KeyConditionExpression=key_condition):
+            if item.get("entityType") == "order":
+                order_header = item
+            elif item.get("entityType") == "orderItem":
+                order_items.append(item)
+        if not order_header:
+            self.logger.warning(f"Order data not found for order {order_id}")
+            return {}
+        # Abstract the table schema
+        order_data = DynamodbTestOrdersData._abstract_order_item_schema(order_header)
+        if include_items:
+            order_data["items"] = [
+                DynamodbTestOrdersData._abstract_order_line_item_schema(order_item)
+                for order_item in order_items
+            ]
+        return order_data
+
+    async def list_products_by_shop_id(
+        self, shop_id: str, page_size: int = None
+    ) -> list:
+        """Get the products from the database by the shop ID (e.g. 1234), all the pages of
+        page_size products are read"""
+        query_kwargs = {
+            "KeyConditionExpression": Key("PK").eq(f"s#{shop_id}")
+            & Key("SK").begins_with("p#")
+        }
+        if page_size is not None:
+            query_kwargs["Limit"] = page_size
+        products_list = [
+            DynamodbTestOrdersData._abstract_product_item_schema(product)
+            for product in await self._query_all(**query_kwargs)
+        ]
+        if not products_list:
+            self.logger.warning(f"Products not found for shop {shop_id}")
+        return products_list
+
+    async def _query_shop_orders(
+        self, shop_id: str, date_from: str = None, date_to: str = None, **query_kwargs
+    ) -> list:
+        """Query all the order items of a shop from all its GSI1 partitions concurrently"""
+        range_condition = sort_key_range_condition("GSI1-SK", date_from, date_to)
+        shop_data = await self._get_shop_sharding(shop_id)
+        key_conditions = []
+        for gsi1_pk in shop_gsi1_pks(
+            shop_id, gsi1_shards(shop_data)[1], "gsi1ReshardFrom" in shop_data
+        ):
+            key_condition = Key("GSI1-PK").eq(gsi1_pk)
+            if range_condition is not None:
+                key_condition = key_condition & range_condition
+            key_conditions.append(key_condition)
+        partitions = await asyncio.gather(
+            *[
+                self._query_all(
+                    **query_kwargs,
+                    IndexName="GSI1",
+                    KeyConditionExpression=key_condition,
+                )
+                for key_condition in key_conditions
+            ]
+        )
+        if len(partitions) == 1:
+            return partitions[0]
+        return merge_gsi1_partitions(partitions)
+
+    async def _get_shop_sharding(self, shop_id: str) -> dict:
+        """Returns the gsi1Shards and gsi1ReshardFrom attributes of a shop"""
+        table = await self.get_table()
+        get_item_response = await table.get_item(
+            Key={"PK": f"s#{shop_id}", "SK": f"s#{shop_id}"},
+            ProjectionExpression="gsi1Shards, gsi1ReshardFrom",
+        )
+        return get_item_response.get("Item", {})
+
+    async def _get_shop_shards(self, shop_id: str) -> tuple[int, int]:
+        """Returns the number of GSI1 shards new orders of the shop are written to and the
+        number of shards which must be read"""
+        return gsi1_shards(await self._get_shop_sharding(shop_id))
+
+    async def list_orders_by_shop_id(
+        self, shop_id: str, date_from: str = None, date_to: str = None
+    ) -> list:
+        """Get the orders from the database by the shop ID (e.g. 1234),
+        optionally only the ones placed between date_from and date_to"""
+        orders_list = await self._query_shop_orders(shop_id, date_from, date_to)
+        orders_list = [
+            DynamodbTestOrdersData._abstract_order_item_schema(order)
+            for order in orders_list
+        ]
+        if not orders_list:
+            self.logger.warning(f"Orders not found for shop {shop_id}")
+        return orders_list
+
+    async def list_orders_by_customer(
+        self,
+        customer_key: str,
+        limit: int = 20,
+        cursor: str = None,
+        date_from: str = None,
+        date_to: str = None,
+    ) -> tuple[list, str | None]:
+        """Get one page of the orders of a customer, newest first.
+        See DynamodbTestOrdersData.list_orders_by_customer"""
+        key_condition = Key("GSI2-PK").eq(customer_key)
+        range_condition = sort_key_range_condition("GSI2-SK", date_from, date_to)
+        if range_condition is not None:
+            key_condition = key_condition & range_condition
+        query_kwargs = {
+            "IndexName": "GSI2",
+            "KeyConditionExpression": key_condition,
+            "ScanIndexForward": False,
+            "Limit": limit,
+        }
+        start_key = decode_cursor(cursor)
+        if start_key is not None:
+            # Do not let a cursor page through the orders of another customer
+            if start_key.get("GSI2-PK") != customer_key:
+                raise ValueError(f"Invalid cursor: {cursor}")
+            query_kwargs["ExclusiveStartKey"] = start_key
+        table = await self.get_table()
+        query_response = await table.query(**query_kwargs)
+        orders_list = [
+            DynamodbTestOrdersData._abstract_order_item_schema(order)
+            for order in query_response.get("Items", [])
+        ]
+        return orders_list, encode_cursor(query_response.get("LastEvaluatedKey"))
+
+    async def get_total_amount_by_shop_id(
+        self, shop_id: str, date_from: str = None, date_to: str = None
+    ) -> Decimal:
+        """Get the total amount from the database by the shop ID (e.g. 1234),
+        optionally only for the orders placed between date_from and date_to"""
+        orders = await self._query_shop_orders(
+            shop_id,
+            date_from,
+            date_to,
+            ProjectionExpression="PK, #sk, #amount",
+            ExpressionAttributeNames={"#sk": "GSI1-SK", "#amount": "amount"},
+        )
+        total_amount = Decimal(0)
+        for item in orders:
+            total_amount = total_amount + item["amount"]
+        return total_amount
+
+    async def list_shops(self) -> list[dict]:
+        """Get the list of shops from the database"""
+        table = await self.get_table()
+        shops = []
+        scan_kwargs = {"FilterExpression": Attr("entityType").eq("shop")}
+        while True:
+            scan_response = await table.scan(**scan_kwargs)
+            shops.extend(scan_response.get("Items", []))
+            if "LastEvaluatedKey" not in scan_response:
+                break
+            scan_kwargs["ExclusiveStartKey"] = scan_response["LastEvaluatedKey"]
+        return [
+            DynamodbTestOrdersData._abstract_shop_item_schema(shop) for shop in shops
+        ]
+
+    async def get_shop_by_id(self, shop_id: str) -> dict:
+        table = await self.get_table()
+        get_item_response = await table.get_item(
+            Key={"PK": f"s#{shop_id}", "SK": f"s#{shop_id}"}
+        )
+        shop_data = get_item_response.get("Item")
+        if shop_data:
+            shop_data = DynamodbTestOrdersData._abstract_shop_item_schema(shop_data)
+        return shop_data
+
+    async def _generate_unique_request_id(
+        self, id_length: int = 4, max_attempts: int = 10
+    ) -> str:
+        """Generate an order ID and check if it is already used or not.
+        See DynamodbTestOrdersData._generate_unique_request_id"""
+        table = await self.get_table()
+        for i in range(max_attempts):
+            new_request_id = "".join(random.choices(string.digits, k=id_length))
+            get_item_response = await table.get_item(
+                Key={"PK": f"o#{new_request_id}", "SK": f"o#{new_request_id}"}
+            )
+            if "Item" not in get_item_response:
+                return new_request_id
+        return "ERROR"
@@ -0,0 +1,244 @@
+import csv
+import gzip
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from dynamodb_helpers import DynamodbTestOrdersData, normalize_timestamp
+from log_helpers import ensure_logger
+
+IMPORT_FORMATS = ("ndjson", "csv")
+# Maximum number of rejected records listed in the import report
+MAX_REPORTED_ERRORS = 100
+
+
+def read_records(file, record_format: str):
+    """
+    Lazily reads the records of an NDJSON or CSV file, one at a time. The file can be a
+    path (gzip compressed if it ends with .gz) or a binary file object.
+    Yields (line_number, record). The numbers in the records are Decimals and the "items"
+    column of the CSV orders is a JSON list.
+    """
+    if record_format not in IMPORT_FORMATS:
+        raise ValueError(
+            f"Unknown import format {record_format}, use one of {IMPORT_FORMATS}"
+        )
+    if isinstance(file, str):
+        opener = gzip.open if file.endswith(".gz") else open
+        with opener(file, "rb") as binary_file:
+            yield from read_records(binary_file, record_format)
+        return
+    text_file = io.TextIOWrapper(file, encoding="utf-8", newline="")
+    try:
+        if record_format == "ndjson":
+            for line_number, line in enumerate(text_file, start=1):
+                if line.strip():
+                    yield line_number, json.loads(line, parse_float=Decimal)
+        else:
+            # Line 1 is the header
+            for line_number, row in enumerate(csv.DictReader(text_file), start=2):
+                record = {key: value for key, value in row.items() if value != ""}
+                if "items" in record:
+                    record["items"] = json.loads(record["items"], parse_float=Decimal)
+                yield line_number, record
+    finally:
+        # Do not close the file of the caller
+        text_file.detach()
+
+
+class BulkImporter:
+    """
+    Imports shops, products and orders records into the single table with several
+    parallel BatchWriteItem writers, so that large imports are limited by the table
+    capacity rather than by the latency of one client. The records are mapped to the
+    table key scheme:
+
+        {"type": "shop", "shopId", "name", "phoneNumber", "address", "shopToken"}
+        {"type": "product", "shopId", "productId", "name", "description", "price"}
+        {"type": "order", "orderId", "shopId", "customerKey", "date", "name",
+         "phoneNumber", "status", "items": [{"productId", "name", "price", "quantity"}]}
+
+    The customerKey (e.g. c#1234) of an order is optional, orders without customer are not
+    added to GSI2. Shops without shopToken get one from the ensure_shop_token migration.
+    The imported orders are not added to the sales rollups, run the rebuild_sales_rollups
+    migration after an import. Importing the same records again overwrites the items.
+
+    Args:
+        orders_table (DynamodbTestOrdersData): The orders table
+        writers (int): The number of parallel batch writers
+        max_attempts (int): The attempts to write the unprocessed items of a batch, with a
+            jittered exponential back off between the attempts
+        progress_seconds (float): How often the progress is logged
+        logger: The logger
+    """
+
+    def __init__(
+        self,
+        orders_table: DynamodbTestOrdersData,
+        writers: int = 8,
+        max_attempts: int = 10,
+        progress_seconds: float = 10,
+        logger=None,
+    ):
+        if writers < 1:
+            raise ValueError("writers must be at least 1")
+        self.orders_table = orders_table
+        self.writers = writers
+        self.max_attempts = max_attempts
+        self.progress_seconds = progress_seconds
+        self.logger = ensure_logger(logger)
+        self._shop_shards = {}
+
+    def record_to_items(self, record: dict) -> list[dict]:
+        """Returns the table items of a record.
+        Raises a ValueError (or KeyError for a missing field) if the record is invalid."""
+        record_type = record.get("type")
+        if record_type == "shop":
+            return [self._shop_item(record)]
+        if record_type == "product":
+            return [self._product_item(record)]
+        if record_type == "order":
+            return self._order_items(record)
+        raise ValueError(f"Unknown record type {record_type}")
+
+    @staticmethod
+    def _shop_item(record: dict) -> dict:
+        shop_key = f"s#{record['shopId']}"
+        item = {"PK": shop_key, "SK": shop_key, "entityType": "shop"}
+        for attribute in ("name", "phoneNumber", "address", "shopToken"):
+            if attribute in record:
+                item[attribute] = record[attribute]
+        return item
+
+    @staticmethod
+    def _product_item(record: dict) -> dict:
+        item = {
+            "PK": f"s#{record['shopId']}",
+            "SK": f"p#{record['productId']}",
+            "entityType": "product",
+            "name": record["name"],
+            "price": Decimal(str(record["price"])),
+        }
+        if "description" in record:
+            item["description"] = record["description"]
+        return item
+
+    def _order_items(self, record: dict) -> list[dict]:
+        items = record["items"]
+        if not items:
+            raise ValueError("An order must have items")
+        # The prices are the ones of the order, not the current prices of the products
+        products_data = {
+            f"p#{item['productId']}": {
+                "name": item["name"],
+                "price": Decimal(str(item["price"])),
+            }
+            for item in items
+        }
+        order_items, _ = self.orders_table._build_order_items(
+            order_id=record["orderId"],
+            shop_id=record["shopId"],
+            customer_key=record.get("customerKey"),
+            phone_number=record["phoneNumber"],
+            customer_name=record["name"],
+            items=[
+                {"productId": item["productId"], "quantity": int(item["quantity"])}
+                for item in items
+            ],
+            order_timestamp=normalize_timestamp(record["date"]),
+            gsi1_shards=self._get_shop_shards(record["shopId"]),
+            products_data=products_data,
+        )
+        if "status" in record:
+            # The order item is the last one
+            order_items[-1]["status"] = record["status"]
+        return order_items
+
+    def _get_shop_shards(self, shop_id: str) -> int:
+        # Only called from the reading thread
+        if shop_id not in self._shop_shards:
+            self._shop_shards[shop_id] = self.orders_table._get_shop_shards(shop_id)[0]
+        return self._shop_shards[shop_id]
+
+    def run(self, records) -> dict:
+        """
+        Imports the (line_number, record) of read_records and returns the import report:
+        the imported records and items, the rejected records with their error, the items
+        which could not be written and the records and items per second.
+        """
+        report = {
+            "records": 0,
+            "items": 0,
+            "rejectedRecords": 0,
+            "failedItems": 0,
+            "errors": [],
+        }
+        lock = threading.Lock()
+        # At most 2 batches per writer are waiting, the records are read as they are written
+        pending_batches = threading.BoundedSemaphore(self.writers * 2)
+        start = time.perf_counter()
+        next_progress = start + self.progress_seconds
+
+        def write_batch(batch: list[dict]) -> None:
+            try:
+                failed_items = self.orders_table._batch_write_items(
+                    batch, self.max_attempts
+                )
+            except Exception as e:
+                self.logger.error(f"Failed to write a batch of {len(batch)} items: {e}")
+                failed_items = batch
+            finally:
+                pending_batches.release()
+            with lock:
+                report["items"] += len(batch) - len(failed_items)
+                report["failedItems"] += len(failed_items)
+
+        # The items of a batch must have distinct keys, the last record of a key wins
+        batch = {}
+        with ThreadPoolExecutor(
+            max_workers=self.writers, thread_name_prefix="import-writer"
+        ) as executor:
+            for line_number, record in records:
+                try:
+                    items = self.record_to_items(record)
+                except (KeyError, ValueError, TypeError, ArithmeticError) as e:
+                    report["rejectedRecords"] += 1
+                    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                        report["errors"].append(
+                            {"line": line_number, "error": f"{type(e).__name__}: {e}"}
+                        )
+                    continue
+                report["records"] += 1
+                for item in items:
+                    batch[(item["PK"], item["SK"])] = item
+                    if len(batch) == 25:
+                        pending_batches.acquire()
+                        executor.submit(write_batch, list(batch.values()))
+                        batch = {}
+                if time.perf_counter() >= next_progress:
+                    next_progress += self.progress_seconds
+                    self._log_progress(report, start)
+            if batch:
+                pending_batches.acquire()
+                executor.submit(write_batch, list(batch.values()))
+        seconds = time.perf_counter() - start
+        report["seconds"] = round(seconds, 3)
+        report["recordsPerSecond"] = round(report["records"] / seconds, 1)
+        report["itemsPerSecond"] = round(report["items"] / seconds, 1)
+        self.logger.info(json.dumps({"type": "import", **report}))
+        return report
+
+    def _log_progress(self, report: dict, start: float) -> None:
+        seconds = time.perf_counter() - start
+        self.logger.info(
+            json.dumps(
+                {
+                    "type": "importProgress",
+                    "records": report["records"],
+                    "items": report["items"],
+                    "recordsPerSecond": round(report["records"] / seconds, 1),
+                }
+            )
+        )
@@ -0,0 +1,172 @@
+"""
+Compact records of the shops, products and orders read from the table.
+
+The records abstract the table schema: the keys are mapped once to the IDs of the API
+(e.g. the PK s#1234 of a shop to its shopId 1234) and the index and entity type attributes
+are dropped. They use __slots__, so that large listings use much less memory than the
+item dicts, and to_api() returns the API representation. The JSON encoder of the API
+responses (api_helpers.DecimalEncoder) serializes them directly.
+
+A record only has the attributes the item had, e.g. when only some fields were read with a
+ProjectionExpression. The attributes which are not a field of the record (e.g. the
+gsi1Shards of a shop) are kept in its extra dict, they are not returned by the API.
+"""
+
+
+def _key_id(key: str) -> str:
+    """Returns the ID of a key, e.g. 1234 for o#1234"""
+    return key.rpartition("#")[2]
+
+
+class Record:
+    """Base class of the records. FIELDS are the fields of the API, in their order, and
+    KEY_FIELDS the ones mapped from the keys of the item"""
+
+    __slots__ = ("extra",)
+    FIELDS: tuple[str, ...] = ()
+    KEY_FIELDS: tuple[str, ...] = ()
+    # The table attributes which are not kept in the extra attributes
+    DROPPED_ATTRIBUTES = frozenset(
+        ["PK", "SK", "GSI1-PK", "GSI1-SK", "GSI2-PK", "GSI2-SK", "entityType"]
+    )
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # The fields read from the attributes of the item, the key fields are mapped by
+        # from_item
+        cls._ATTRIBUTE_FIELDS = tuple(
+            name for name in cls.FIELDS if name not in cls.KEY_FIELDS
+        )
+        cls._KNOWN_ATTRIBUTES = cls.DROPPED_ATTRIBUTES | frozenset(cls.FIELDS)
+
+    def __init__(self, **fields):
+        self._set_attributes(fields)
+        for name in self.KEY_FIELDS:
+            if name in fields:
+                setattr(self, name, fields[name])
+
+    def _set_attributes(self, item: dict) -> None:
+        """Sets the fields and the extra attributes of the item which are not keys"""
+        for name in self._ATTRIBUTE_FIELDS:
+            if name in item:
+                setattr(self, name, item[name])
+        if item.keys() <= self._KNOWN_ATTRIBUTES:
+            self.extra = None
+        else:
+            self.extra = {
+                name: value
+                for name, value in item.items()
+                if name not in self._KNOWN_ATTRIBUTES
+            }
+
+    def to_api(self) -> dict:
+        """Returns the API representation of the record, its fields which are set"""
+        data = {}
+        for name in self.FIELDS:
+            # A field which was not read from the table is an unset slot
+            try:
+                data[name] = getattr(self, name)
+            except AttributeError:
+                pass
+        return data
+
+    def __eq__(self, other) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.to_api() == other.to_api()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_api()!r})"
+
+
+class Shop(Record):
+    __slots__ = ("shopId", "name", "phoneNumber", "address", "shopToken")
+    FIELDS = __slots__
+    KEY_FIELDS = ("shopId",)
+
+    @classmethod
+    def from_item(cls, item: dict) -> "Shop":
+        """Maps a shop item (PK s#1234) to a Shop"""
+        shop = cls.__new__(cls)
+        shop._set_attributes(item)
+        if "PK" in item:
+            shop.shopId = _key_id(item["PK"])
+        return shop
+
+    def gsi1_shards(self) -> int:
+        """Returns the number of GSI1 shards new orders of the shop are written to"""
+        return int((self.extra or {}).get("gsi1Shards", 1))
+
+
+class Product(Record):
+    __slots__ = ("shopId", "productId", "name", "description", "price")
+    FIELDS = __slots__
+    KEY_FIELDS = ("shopId", "productId")
+
+    @classmethod
+    def from_item(cls, item: dict) -> "Product":
+        """Maps a product item (PK s#1234, SK p#5678) to a Product"""
+        product = cls.__new__(cls)
+        product._set_attributes(item)
+        product.shopId = _key_id(item["PK"])
+        product.productId = _key_id(item["SK"])
+        return product
+
+
+class OrderItem(Record):
+    __slots__ = ("productId", "name", "price", "quantity")
+    FIELDS = __slots__
+    KEY_FIELDS = ("productId",)
+
+    @classmethod
+    def from_item(cls, item: dict) -> "OrderItem":
+        """Maps an order line item (PK o#1234, SK p#5678) to an OrderItem"""
+        order_item = cls.__new__(cls)
+        order_item._set_attributes(item)
+        order_item.productId = _key_id(item["SK"])
+        return order_item
+
+
+class Order(Record):
+    FIELDS = (
+        "orderId",
+        "shopId",
+        "customerId",
+        "date",
+        "name",
+        "phoneNumber",
+        "amount",
+        "status",
+    )
+    KEY_FIELDS = ("orderId", "shopId", "customerId")
+    # The line items (OrderItem records) of the order, None if they were not read
+    __slots__ = (*FIELDS, "items")
+
+    def __init__(self, items: list[OrderItem] = None, **fields):
+        super().__init__(**fields)
+        self.items = items
+
+    @classmethod
+    def from_item(cls, item: dict, fields: list[str] = None) -> "Order":
+        """Maps an order item (PK o#1234) to an Order. The item may only have the
+        attributes of the given fields (see projection_kwargs)"""
+        order = cls.__new__(cls)
+        order._set_attributes(item)
+        order.items = None
+        if "PK" in item:
+            order.orderId = _key_id(item["PK"])
+        if "GSI1-PK" in item:
+            # Without the shard suffix of a sharded shop (s#1234#3)
+            order.shopId = item["GSI1-PK"].split("#")[1]
+        if "GSI2-PK" in item:
+            order.customerId = _key_id(item["GSI2-PK"])
+        elif fields is None or "customerId" in fields:
+            # Orders imported without customer (see put_new_orders) are not in GSI2
+            order.customerId = None
+        return order
+
+    def to_api(self) -> dict:
+        data = super().to_api()
+        if self.items is not None:
+            data["items"] = [order_item.to_api() for order_item in self.items]
+        return data
@@ -0,0 +1,854 @@
+"""
+The storage backends of DynamodbTestOrdersData.
+
+A storage has the methods of a boto3 DynamoDB Table used by the data layer (get_item,
+put_item, update_item, delete_item, query, scan and batch_writer) and the batch_get_item
+and batch_write_item methods of the DynamoDB resource, with the same arguments and
+responses:
+- DynamodbStorage stores the items in a DynamoDB table
+- InMemoryStorage stores the items in memory, for the tests, the benchmarks and the local
+  development. It is indexed like the table (the base table, GSI1 and GSI2) and has the
+  same behavior for the expressions used by the data layer, but no capacity or item size
+  limits.
+"""
+
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from copy import deepcopy
+from decimal import Decimal
+from typing import Protocol
+from boto3.dynamodb.conditions import Attr, AttributeBase, ConditionBase
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+# The key attributes of the base table and of its global secondary indexes
+TABLE_KEYS = ("PK", "SK")
+INDEX_KEYS = {"GSI1": ("GSI1-PK", "GSI1-SK"), "GSI2": ("GSI2-PK", "GSI2-SK")}
+MAX_BATCH_GET_KEYS = 100
+MAX_BATCH_WRITE_ITEMS = 25
+
+
+class Storage(Protocol):
+    """The storage interface, see the boto3 Table and DynamoDB resource methods"""
+
+    table_name: str
+
+    def get_item(self, **kwargs) -> dict: ...
+
+    def put_item(self, **kwargs) -> dict: ...
+
+    def update_item(self, **kwargs) -> dict: ...
+
+    def delete_item(self, **kwargs) -> dict: ...
+
+    def query(self, **kwargs) -> dict: ...
+
+    def scan(self, **kwargs) -> dict: ...
+
+    def batch_writer(self): ...
+
+    def batch_get_item(self, **kwargs) -> dict: ...
+
+    def batch_write_item(self, **kwargs) -> dict: ...
+
+
+class DynamodbStorage:
+    """
+    Stores the items in a DynamoDB table
+
+    Args:
+        table: The boto3 Table
+        dynamodb_resource: The boto3 DynamoDB resource of the table
+    """
+
+    def __init__(self, table, dynamodb_resource):
+        self.table = table
+        self.ddb = dynamodb_resource
+        self.table_name = table.name
+
+    def get_item(self, **kwargs) -> dict:
+        return self.table.get_item(**kwargs)
+
+    def put_item(self, **kwargs) -> dict:
+        return self.table.put_item(**kwargs)
+
+    def update_item(self, **kwargs) -> dict:
+        return self.table.update_item(**kwargs)
+
+    def delete_item(self, **kwargs) -> dict:
+        return self.table.delete_item(**kwargs)
+
+    def query(self, **kwargs) -> dict:
+        return self.table.query(**kwargs)
+
+    def scan(self, **kwargs) -> dict:
+        return self.table.scan(**kwargs)
+
+    def batch_writer(self):
+        return self.table.batch_writer()
+
+    def batch_get_item(self, **kwargs) -> dict:
+        return self.ddb.batch_get_item(**kwargs)
+
+    def batch_write_item(self, **kwargs) -> dict:
+        return self.ddb.batch_write_item(**kwargs)
+
+
+def _client_error(code: str, message: str, operation: str) -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": message}}, operation)
+
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+_IMMUTABLE_TYPES = (str, Decimal, bool, bytes, type(None))
+
+
+def _normalize_value(value):
+    """Returns the value as DynamoDB returns it, e.g. the ints as Decimals.
+    Raises a TypeError for the types DynamoDB does not support (e.g. floats)."""
+    if isinstance(value, (str, Decimal, bool)):
+        return value
+    if isinstance(value, int):
+        return Decimal(value)
+    return _deserializer.deserialize(_serializer.serialize(value))
+
+
+def _copy_item(item: dict) -> dict:
+    return {
+        name: value if isinstance(value, _IMMUTABLE_TYPES) else deepcopy(value)
+        for name, value in item.items()
+    }
+
+
+_TOKEN_PATTERN = re.compile(
+    r"\s*(?:(?P<operator><>|<=|>=|=|<|>|\(|\)|,|\+|-)"
+    r"|(?P<name>#[A-Za-z0-9_]+)|(?P<value>:[A-Za-z0-9_]+)"
+    r"|(?P<word>[A-Za-z_][A-Za-z0-9_]*))"
+)
+_COMPARATORS = {
+    "=": "eq",
+    "<>": "ne",
+    "<": "lt",
+    "<=": "lte",
+    ">": "gt",
+    ">=": "gte",
+}
+
+
+class _ExpressionParser:
+    """
+    Parses the condition, projection and update expression strings into boto3 conditions,
+    attribute names and update actions. Only top level attributes are supported.
+    """
+
+    def __init__(self, expression: str, names: dict = None, values: dict = None):
+        self.expression = expression
+        self.names = names or {}
+        self.values = values or {}
+        self.tokens = []
+        position = 0
+        expression = expression.rstrip()
+        while position < len(expression):
+            match = _TOKEN_PATTERN.match(expression, position)
+            if match is None or match.end() == position:
+                raise ValueError(
+                    f"Unsupported expression {self.expression!r} at {expression[position:]!r}"
+                )
+            self.tokens.append((match.lastgroup, match.group(match.lastgroup)))
+            position = match.end()
+        self.position = 0
+
+    def _peek(self) -> tuple[str, str] | tuple[None, None]:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None, None
+
+    def _peek_word(self) -> str | None:
+        kind, token = self._peek()
+        return token.upper() if kind == "word" else None
+
+    def _next(self) -> tuple[str, str]:
+        token = self._peek()
+        if token[0] is None:
+            raise ValueError(f"Incomplete expression {self.expression!r}")
+        self.position += 1
+        return token
+
+    def _expect(self, expected: str) -> None:
+        _, token = self._next()
+        if token.upper() != expected:
+            raise ValueError(f"Expected {expected} in {self.expression!r}")
+
+    def _end(self) -> None:
+        if self.position != len(self.tokens):
+            raise ValueError(f"Unexpected {self._peek()[1]!r} in {self.expression!r}")
+
+    def _path(self) -> str:
+        kind, token = self._next()
+        if kind == "name":
+            try:
+                return self.names[token]
+            except KeyError:
+                raise ValueError(f"Missing ExpressionAttributeNames {token}") from None
+        if kind == "word":
+            return token
+        raise ValueError(f"Expected an attribute name in {self.expression!r}")
+
+    def _operand(self):
+        """Returns a value, or an Attr for an attribute"""
+        kind, token = self._peek()
+        if kind == "value":
+            self.position += 1
+            try:
+                return _normalize_value(self.values[token])
+            except KeyError:
+                raise ValueError(f"Missing ExpressionAttributeValues {token}") from None
+        return Attr(self._path())
+
+    def condition(self) -> ConditionBase:
+        condition = self._or()
+        self._end()
+        return condition
+
+    def _or(self) -> ConditionBase:
+        condition = self._and()
+        while self._peek_word() == "OR":
+            self.position += 1
+            condition = condition | self._and()
+        return condition
+
+    def _and(self) -> ConditionBase:
+        condition = self._not()
+        while self._peek_word() == "AND":
+            self.position += 1
+            condition = condition & self._not()
+        return condition
+
+    def _not(self) -> ConditionBase:
+        if self._peek_word() == "NOT":
+            self.position += 1
+            return ~self._not()
+        return self._primary()
+
+    def _primary(self) -> ConditionBase:
+        kind, token = self._peek()
+        if token == "(":
+            self.position += 1
+            condition = self._or()
+            self._expect(")")
+            return condition
+        function = token.lower() if kind == "word" else None
+        if function in ("attribute_exists", "attribute_not_exists"):
+            self.position += 1
+            self._expect("(")
+            attribute = Attr(self._path())
+            self._expect(")")
+            if function == "attribute_exists":
+                return attribute.exists()
+            return attribute.not_exists()
+        if function in ("begins_with", "contains"):
+            self.position += 1
+            self._expect("(")
+            attribute = Attr(self._path())
+            self._expect(",")
+            value = self._operand()
+            self._expect(")")
+            return getattr(attribute, function)(value)
+        attribute = Attr(self._path())
+        kind, token = self._next()
+        if token in _COMPARATORS:
+            return getattr(attribute, _COMPARATORS[token])(self._operand())
+        if token.upper() == "BETWEEN":
+            low = self._operand()
+            self._expect("AND")
+            return attribute.between(low, self._operand())
+        if token.upper() == "IN":
+            self._expect("(")
+            values = [self._operand()]
+            while self._peek()[1] == ",":
+                self.position += 1
+                values.append(self._operand())
+            self._expect(")")
+            return attribute.is_in(values)
+        raise ValueError(f"Unsupported condition {token!r} in {self.expression!r}")
+
+    def projection(self) -> list[str]:
+        attributes = [self._path()]
+        while self._peek()[1] == ",":
+            self.position += 1
+            attributes.append(self._path())
+        self._end()
+        return attributes
+
+    def update(self) -> list[tuple]:
+        """Returns the (action, attribute, value) of the SET, REMOVE, ADD and DELETE clauses"""
+        actions = []
+        while self._peek()[0] is not None:
+            clause = self._peek_word()
+            if clause not in ("SET", "REMOVE", "ADD", "DELETE"):
+                raise ValueError(f"Unsupported update expression {self.expression!r}")
+            self.position += 1
+            while True:
+                attribute = self._path()
+                if clause == "SET":
+                    self._expect("=")
+                    actions.append((clause, attribute, self._set_value()))
+                elif clause == "REMOVE":
+                    actions.append((clause, attribute, None))
+                else:
+                    actions.append((clause, attribute, self._operand()))
+                if self._peek()[1] != ",":
+                    break
+                self.position += 1
+        return actions
+
+    def _set_value(self):
+        """Returns the value of a SET action, as a function of the item"""
+        if self._peek_word() == "IF_NOT_EXISTS":
+            self.position += 1
+            self._expect("(")
+            attribute = self._path()
+            self._expect(",")
+            default = self._operand()
+            self._expect(")")
+
+            def value(item):
+                return item.get(attribute, _resolve(default, item))
+
+        else:
+            operand = self._operand()
+
+            def value(item):
+                return _resolve(operand, item)
+
+        operator = self._peek()[1]
+        if operator in ("+", "-"):
+            self.position += 1
+            left, right = value, self._operand()
+            sign = 1 if operator == "+" else -1
+            return lambda item: left(item) + sign * _resolve(right, item)
+        return value
+
+
+_MISSING = object()
+
+
+def _resolve(operand, item: dict):
+    if isinstance(operand, AttributeBase):
+        return item.get(operand.name, _MISSING)
+    return operand
+
+
+def _comparable(left, right) -> bool:
+    if isinstance(left, (int, Decimal)) and not isinstance(left, bool):
+        return isinstance(right, (int, Decimal)) and not isinstance(right, bool)
+    return type(left) is type(right) and isinstance(left, (str, bytes))
+
+
+def evaluate_condition(condition: ConditionBase, item: dict) -> bool:
+    """Evaluates a boto3 condition (e.g. Attr("status").eq("PENDING")) on an item"""
+    operator = condition.expression_operator
+    values = condition.get_expression()["values"]
+    if operator == "AND":
+        return all(evaluate_condition(value, item) for value in values)
+    if operator == "OR":
+        return any(evaluate_condition(value, item) for value in values)
+    if operator == "NOT":
+        return not evaluate_condition(values[0], item)
+    if operator == "attribute_exists":
+        return values[0].name in item
+    if operator == "attribute_not_exists":
+        return values[0].name not in item
+    left = _resolve(values[0], item)
+    operands = [_resolve(value, item) for value in values[1:]]
+    if operator == "<>":
+        return left is _MISSING or left != operands[0]
+    if left is _MISSING:
+        return False
+    if operator == "IN":
+        return left in operands[0]
+    if operator == "begins_with":
+        return _comparable(left, operands[0]) and left.startswith(operands[0])
+    if operator == "contains":
+        if isinstance(left, str):
+            return isinstance(operands[0], str) and operands[0] in left
+        return isinstance(left, (set, list)) and operands[0] in left
+    if not all(_comparable(left, operand) for operand in operands):
+        return False
+    if operator == "=":
+        return left == operands[0]
+    if operator == "<":
+        return left < operands[0]
+    if operator == "<=":
+        return left <= operands[0]
+    if operator == ">":
+        return left > operands[0]
+    if operator == ">=":
+        return left >= operands[0]
+    if operator == "BETWEEN":
+        return operands[0] <= left <= operands[1]
+    raise ValueError(f"Unsupported condition operator {operator}")
+
+
+class _Index:
+    """
+    The items of the base table or of a global secondary index: a dict of partitions, each
+    a list of (sort key, PK, SK) kept sorted, and the sorted list of the partition keys.
+    The items without the keys of a secondary index are not in it.
+    """
+
+    def __init__(self, partition_key: str, sort_key: str):
+        self.partition_key = partition_key
+        self.sort_key = sort_key
+        self.partitions = {}
+        self.partition_values = []
+
+    def _entry(self, item: dict) -> tuple | None:
+        partition = item.get(self.partition_key)
+        sort = item.get(self.sort_key)
+        if partition is None or sort is None:
+            return None
+        return partition, (sort, item["PK"], item["SK"])
+
+    def add(self, item: dict) -> None:
+        entry = self._entry(item)
+        if entry is None:
+            return
+        partition, position = entry
+        entries = self.partitions.get(partition)
+        if entries is None:
+            entries = self.partitions[partition] = []
+            self.partition_values.insert(
+                bisect_left(self.partition_values, partition), partition
+            )
+        entries.insert(bisect_left(entries, position), position)
+
+    def remove(self, item: dict) -> None:
+        entry = self._entry(item)
+        if entry is None:
+            return
+        partition, position = entry
+        entries = self.partitions[partition]
+        del entries[bisect_left(entries, position)]
+        if not entries:
+            del self.partitions[partition]
+            del self.partition_values[bisect_left(self.partition_values, partition)]
+
+    def last_evaluated_key(self, partition, position: tuple) -> dict:
+        key = {"PK": position[1], "SK": position[2]}
+        key[self.partition_key] = partition
+        key[self.sort_key] = position[0]
+        return key
+
+    def start_position(self, start_key: dict) -> tuple:
+        return start_key[self.sort_key], start_key["PK"], start_key["SK"]
+
+
+def _sort_key_range(entries: list, condition) -> tuple[int, int]:
+    """Returns the range of the sorted entries matching the sort key condition"""
+    if condition is None:
+        return 0, len(entries)
+    operator = condition.expression_operator
+    values = condition.get_expression()["values"][1:]
+
+    def sort_key(entry):
+        return entry[0]
+
+    if operator == "=":
+        return (
+            bisect_left(entries, values[0], key=sort_key),
+            bisect_right(entries, values[0], key=sort_key),
+        )
+    if operator == "<":
+        return 0, bisect_left(entries, values[0], key=sort_key)
+    if operator == "<=":
+        return 0, bisect_right(entries, values[0], key=sort_key)
+    if operator == ">":
+        return bisect_right(entries, values[0], key=sort_key), len(entries)
+    if operator == ">=":
+        return bisect_left(entries, values[0], key=sort_key), len(entries)
+    if operator == "BETWEEN":
+        return (
+            bisect_left(entries, values[0], key=sort_key),
+            bisect_right(entries, values[1], key=sort_key),
+        )
+    if operator == "begins_with":
+        prefix = values[0]
+        if not prefix:
+            return 0, len(entries)
+        # The first string after all the ones starting with the prefix
+        after_prefix = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return (
+            bisect_left(entries, prefix, key=sort_key),
+            bisect_left(entries, after_prefix, key=sort_key),
+        )
+    raise ValueError(f"Unsupported sort key condition {operator}")
+
+
+class InMemoryStorage:
+    """
+    Stores the items in memory, indexed like the orders table: the base table (PK, SK) and
+    the GSI1 (GSI1-PK, GSI1-SK) and GSI2 (GSI2-PK, GSI2-SK) indexes, with all the
+    attributes projected. Each partition is a sorted list, so that the queries on a sort
+    key range or prefix are binary searches. The storage is thread safe.
+
+    The items are stored as DynamoDB returns them (e.g. the numbers as Decimals) and copied
+    when they are read, the condition, filter, projection and update expressions are
+    evaluated like DynamoDB does for the top level attributes. Scans return the items in
+    the order of their keys.
+
+    Args:
+        table_name (str): The name of the table, used in the batch requests
+    """
+
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+        self._items = {}
+        self._indexes = {None: _Index(*TABLE_KEYS)}
+        for index_name, keys in INDEX_KEYS.items():
+            self._indexes[index_name] = _Index(*keys)
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @staticmethod
+    def _key(key: dict, operation: str) -> tuple:
+        try:
+            pk, sk = key["PK"], key["SK"]
+        except KeyError:
+            raise _client_error(
+                "ValidationException",
+                "The provided key element does not match the schema",
+                operation,
+            ) from None
+        if not isinstance(pk, str) or not isinstance(sk, str) or not pk or not sk:
+            raise _client_error(
+                "ValidationException",
+                "The key attributes must be non empty strings",
+                operation,
+            )
+        return pk, sk
+
+    @staticmethod
+    def _condition(kwargs: dict, name: str):
+        expression = kwargs.get(name)
+        if expression is None or isinstance(expression, ConditionBase):
+            return expression
+        return _ExpressionParser(
+            expression,
+            kwargs.get("ExpressionAttributeNames"),
+            kwargs.get("ExpressionAttributeValues"),
+        ).condition()
+
+    @staticmethod
+    def _projection(kwargs: dict) -> list[str] | None:
+        expression = kwargs.get("ProjectionExpression")
+        if expression is None:
+            return None
+        return _ExpressionParser(
+            expression, kwargs.get("ExpressionAttributeNames")
+        ).projection()
+
+    @staticmethod
+    def _project(item: dict, attributes: list[str] | None) -> dict:
+        if attributes is None:
+            return _copy_item(item)
+        return _copy_item({name: item[name] for name in attributes if name in item})
+
+    def _check_condition(self, item: dict | None, kwargs: dict, operation: str):
+        condition = self._condition(kwargs, "ConditionExpression")
+        if condition is not None and not evaluate_condition(condition, item or {}):
+            raise _client_error(
+                "ConditionalCheckFailedException",
+                "The conditional request failed",
+                operation,
+            )
+
+    def _store(self, key: tuple, item: dict | None) -> None:
+        """Replaces the item of the key, or deletes it if item is None"""
+        old_item = self._items.pop(key, None)
+        if old_item is not None:
+            for index in self._indexes.values():
+                index.remove(old_item)
+        if item is not None:
+            self._items[key] = item
+            for index in self._indexes.values():
+                index.add(item)
+
+    @staticmethod
+    def _old_attributes(item: dict | None, return_values: str) -> dict:
+        if item is not None and return_values == "ALL_OLD":
+            return {"Attributes": _copy_item(item)}
+        return {}
+
+    def get_item(self, **kwargs) -> dict:
+        key = self._key(kwargs["Key"], "GetItem")
+        attributes = self._projection(kwargs)
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return {}
+            return {"Item": self._project(item, attributes)}
+
+    def put_item(self, **kwargs) -> dict:
+        item = {name: _normalize_value(value) for name, value in kwargs["Item"].items()}
+        key = self._key(item, "PutItem")
+        with self._lock:
+            old_item = self._items.get(key)
+            self._check_condition(old_item, kwargs, "PutItem")
+            self._store(key, item)
+        return self._old_attributes(old_item, kwargs.get("ReturnValues", "NONE"))
+
+    def delete_item(self, **kwargs) -> dict:
+        key = self._key(kwargs["Key"], "DeleteItem")
+        with self._lock:
+            old_item = self._items.get(key)
+            self._check_condition(old_item, kwargs, "DeleteItem")
+            self._store(key, None)
+        return self._old_attributes(old_item, kwargs.get("ReturnValues", "NONE"))
+
+    def update_item(self, **kwargs) -> dict:
+        key = self._key(kwargs["Key"], "UpdateItem")
+        actions = []
+        if kwargs.get("UpdateExpression"):
+            actions = _ExpressionParser(
+                kwargs["UpdateExpression"],
+                kwargs.get("ExpressionAttributeNames"),
+                kwargs.get("ExpressionAttributeValues"),
+            ).update()
+        if any(attribute in TABLE_KEYS for _, attribute, _ in actions):
+            raise _client_error(
+                "ValidationException",
+                "Cannot update attribute PK or SK, they are part of the key",
+                "UpdateItem",
+            )
+        with self._lock:
+            old_item = self._items.get(key)
+            self._check_condition(old_item, kwargs, "UpdateItem")
+            item = dict(old_item or {"PK": key[0], "SK": key[1]})
+            for action, attribute, value in actions:
+                if action == "SET":
+                    new_value = value(old_item or {})
+                    if new_value is _MISSING:
+                        raise _client_error(
+                            "ValidationException",
+                            "The provided expression refers to an attribute that does not exist in the item",
+                            "UpdateItem",
+                        )
+                    item[attribute] = _normalize_value(new_value)
+                elif action == "REMOVE":
+                    item.pop(attribute, None)
+                elif action == "ADD":
+                    current = item.get(attribute)
+                    if isinstance(value, set):
+                        item[attribute] = (current or set()) | value
+                    else:
+                        item[attribute] = (current or Decimal(0)) + value
+                else:
+                    remaining = (item.get(attribute) or set()) - value
+                    if remaining:
+                        item[attribute] = remaining
+                    else:
+                        item.pop(attribute, None)
+            self._store(key, item)
+        return_values = kwargs.get("ReturnValues", "NONE")
+        if return_values in ("ALL_OLD", "UPDATED_OLD") and old_item is None:
+            return {}
+        source = item if return_values in ("ALL_NEW", "UPDATED_NEW") else old_item
+        if return_values in ("ALL_NEW", "ALL_OLD"):
+            return {"Attributes": _copy_item(source)}
+        if return_values in ("UPDATED_NEW", "UPDATED_OLD"):
+            updated = {attribute for _, attribute, _ in actions}
+            return {
+                "Attributes": _copy_item(
+                    {name: value for name, value in source.items() if name in updated}
+                )
+            }
+        return {}
+
+    def _key_condition(self, kwargs: dict, index: _Index) -> tuple:
+        """Returns the partition key value and the sort key condition of a query"""
+        condition = self._condition(kwargs, "KeyConditionExpression")
+        if condition is None:
+            raise ValueError("A query requires a KeyConditionExpression")
+        conditions = (
+            condition.get_expression()["values"]
+            if condition.expression_operator == "AND"
+            else (condition,)
+        )
+        partition = _MISSING
+        sort_condition = None
+        for key_condition in conditions:
+            attribute = key_condition.get_expression()["values"][0].name
+            if attribute == index.partition_key and (
+                key_condition.expression_operator == "="
+            ):
+                partition = key_condition.get_expression()["values"][1]
+            elif attribute == index.sort_key and sort_condition is None:
+                sort_condition = key_condition
+            else:
+                raise _client_error(
+                    "ValidationException",
+                    f"Invalid KeyConditionExpression on {attribute}",
+                    "Query",
+                )
+        if partition is _MISSING:
+            raise _client_error(
+                "ValidationException",
+                f"The KeyConditionExpression must have an equality on {index.partition_key}",
+                "Query",
+            )
+        return partition, sort_condition
+
+    def _index(self, kwargs: dict, operation: str) -> _Index:
+        index_name = kwargs.get("IndexName")
+        if index_name not in self._indexes:
+            raise _client_error(
+                "ValidationException",
+                f"The table does not have the specified index: {index_name}",
+                operation,
+            )
+        return self._indexes[index_name]
+
+    def _page(self, kwargs: dict, positions, index: _Index) -> dict:
+        """Reads the items at the (partition, position) of an iteration up to the Limit,
+        filters and projects them"""
+        limit = kwargs.get("Limit")
+        filter_condition = self._condition(kwargs, "FilterExpression")
+        attributes = self._projection(kwargs)
+        count_only = kwargs.get("Select") == "COUNT"
+        items = []
+        count = scanned_count = 0
+        last_evaluated = None
+        for partition, position in positions:
+            if limit is not None and scanned_count == limit:
+                last_evaluated = index.last_evaluated_key(*last_evaluated)
+                break
+            scanned_count += 1
+            last_evaluated = partition, position
+            item = self._items[position[1:]]
+            if filter_condition is not None and not evaluate_condition(
+                filter_condition, item
+            ):
+                continue
+            count += 1
+            if not count_only:
+                items.append(self._project(item, attributes))
+        else:
+            last_evaluated = None
+        response = {"Count": count, "ScannedCount": scanned_count}
+        if not count_only:
+            response["Items"] = items
+        if last_evaluated is not None:
+            response["LastEvaluatedKey"] = last_evaluated
+        return response
+
+    def query(self, **kwargs) -> dict:
+        index = self._index(kwargs, "Query")
+        with self._lock:
+            partition, sort_condition = self._key_condition(kwargs, index)
+            entries = index.partitions.get(partition, [])
+            first, last = _sort_key_range(entries, sort_condition)
+            forward = kwargs.get("ScanIndexForward", True)
+            start_key = kwargs.get("ExclusiveStartKey")
+            if start_key is not None:
+                start = index.start_position(start_key)
+                if forward:
+                    first = max(first, bisect_right(entries, start))
+                else:
+                    last = min(last, bisect_left(entries, start))
+            selected = entries[first:last]
+            if not forward:
+                selected.reverse()
+            return self._page(
+                kwargs, ((partition, position) for position in selected), index
+            )
+
+    def _scan_positions(self, index: _Index, start_key: dict | None):
+        first_partition = 0
+        start = None
+        if start_key is not None:
+            partition = start_key[index.partition_key]
+            first_partition = bisect_left(index.partition_values, partition)
+            start = index.start_position(start_key)
+        for partition in index.partition_values[first_partition:]:
+            entries = index.partitions[partition]
+            first = 0
+            if start is not None:
+                if partition == start_key[index.partition_key]:
+                    first = bisect_right(entries, start)
+                start = None
+            for position in entries[first:]:
+                yield partition, position
+
+    def scan(self, **kwargs) -> dict:
+        index = self._index(kwargs, "Scan")
+        with self._lock:
+            return self._page(
+                kwargs,
+                self._scan_positions(index, kwargs.get("ExclusiveStartKey")),
+                index,
+            )
+
+    def batch_get_item(self, **kwargs) -> dict:
+        request_items = kwargs["RequestItems"]
+        responses = {}
+        for table_name, request in request_items.items():
+            self._check_table_name(table_name, "BatchGetItem")
+            keys = request["Keys"]
+            if len(keys) > MAX_BATCH_GET_KEYS:
+                raise _client_error(
+                    "ValidationException",
+                    f"Too many keys, the maximum is {MAX_BATCH_GET_KEYS}",
+                    "BatchGetItem",
+                )
+            responses[table_name] = []
+            for key in keys:
+                item = self.get_item(Key=key, **request).get("Item")
+                if item is not None:
+                    responses[table_name].append(item)
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+    def batch_write_item(self, **kwargs) -> dict:
+        for table_name, requests in kwargs["RequestItems"].items():
+            self._check_table_name(table_name, "BatchWriteItem")
+            if len(requests) > MAX_BATCH_WRITE_ITEMS:
+                raise _client_error(
+                    "ValidationException",
+                    f"Too many items, the maximum is {MAX_BATCH_WRITE_ITEMS}",
+                    "BatchWriteItem",
+                )
+            for request in requests:
+                if "PutRequest" in request:
+                    self.put_item(Item=request["PutRequest"]["Item"])
+                else:
+                    self.delete_item(Key=request["DeleteRequest"]["Key"])
+        return {"UnprocessedItems": {}}
+
+    def _check_table_name(self, table_name: str, operation: str) -> None:
+        if table_name != self.table_name:
+            raise _client_error(
+                "ResourceNotFoundException",
+                f"Requested resource not found: {table_name}",
+                operation,
+            )
+
+    @contextmanager
+    def batch_writer(self):
+        """Writes the items right away, like a boto3 batch writer which is flushed at the
+        end of the with block"""
+        yield _InMemoryBatchWriter(self)
+
+
+class _InMemoryBatchWriter:
+    def __init__(self, storage: InMemoryStorage):
+        self.storage = storage
+
+    def put_item(self, Item: dict) -> None:
+        self.storage.put_item(Item=Item)
+
+    def delete_item(self, Key: dict) -> None:
+        self.storage.delete_item(Key=Key)
@@ -0,0 +1,273 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from api_helpers import ORDER_FIELDS, DecimalEncoder
+from log_helpers import ensure_logger
+
+EXPORT_FORMATS = ("ndjson", "csv")
+MANIFEST_NAME = "manifest.json"
+
+
+class LocalFileStore:
+    """
+    Stores the export files in a local folder. The files are written to a temporary file
+    and renamed once complete, so that a reader never sees a partial file.
+
+    Args:
+        root (str): The folder of the files
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    @contextmanager
+    def open_writer(self, key: str):
+        """Returns a binary file to write the object key to"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temporary_path, "wb") as file:
+                yield file
+            os.replace(temporary_path, path)
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def put_bytes(self, key: str, data: bytes) -> None:
+        with self.open_writer(key) as file:
+            file.write(data)
+
+    def get_bytes(self, key: str) -> bytes | None:
+        """Returns the object key, or None if it does not exist"""
+        try:
+            with open(self._path(key), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+
+class S3Store:
+    """
+    Stores the export files in an S3 bucket. A file is spooled to a temporary file while
+    it is written (on disk above 8 MB) and uploaded once complete.
+
+    Args:
+        bucket (str): The name of the bucket
+        prefix (str): The prefix of the object keys, e.g. "exports/"
+        s3_client: The S3 client, the shared one by default
+    """
+
+    def __init__(self, bucket: str, prefix: str = "", s3_client=None):
+        self.bucket = bucket
+        self.prefix = prefix
+        if s3_client is None:
+            from client_helpers import get_client
+
+            s3_client = get_client("s3")
+        self.s3_client = s3_client
+
+    @contextmanager
+    def open_writer(self, key: str):
+        """Returns a binary file to write the object key to"""
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as file:
+            yield file
+            file.seek(0)
+            self.s3_client.upload_fileobj(file, self.bucket, self.prefix + key)
+
+    def put_bytes(self, key: str, data: bytes) -> None:
+        self.s3_client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data)
+
+    def get_bytes(self, key: str) -> bytes | None:
+        """Returns the object key, or None if it does not exist"""
+        try:
+            response = self.s3_client.get_object(
+                Bucket=self.bucket, Key=self.prefix + key
+            )
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        return response["Body"].read()
+
+
+class OrdersExport:
+    """
+    Exports the orders of a shop, or of all the shops, to gzip compressed NDJSON or CSV
+    files in a store (LocalFileStore or S3Store). The orders are read page by page and
+    written to parts of up to part_rows orders, so that the memory used does not depend on
+    the number of orders:
+
+        <export_id>/part-00000.ndjson.gz
+        <export_id>/part-00001.ndjson.gz
+        <export_id>/manifest.json
+
+    The manifest lists the parts and is updated after each part with the position of the
+    last exported order. An interrupted export is resumed from there by running an export
+    with the same export_id again. Each CSV part has its own header line.
+
+    Args:
+        orders_table (DynamodbTestOrdersData): The orders table
+        store: Where the files are written
+        export_id (str): The ID of the export, the folder of its files
+        shop_id (str): The shop whose orders are exported, all the orders if None
+        export_format (str): "ndjson" or "csv"
+        part_rows (int): The maximum number of orders per part
+        page_size (int): The number of orders read per DynamoDB request
+        logger: The logger
+    """
+
+    def __init__(
+        self,
+        orders_table,
+        store,
+        export_id: str,
+        shop_id: str = None,
+        export_format: str = "ndjson",
+        part_rows: int = 100000,
+        page_size: int = None,
+        logger=None,
+    ):
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(
+                f"Unknown export format {export_format}, use one of {EXPORT_FORMATS}"
+            )
+        if part_rows < 1:
+            raise ValueError("part_rows must be at least 1")
+        self.orders_table = orders_table
+        self.store = store
+        self.export_id = export_id
+        self.shop_id = shop_id
+        self.export_format = export_format
+        self.part_rows = part_rows
+        self.page_size = page_size
+        self.logger = ensure_logger(logger)
+
+    @property
+    def manifest_key(self) -> str:
+        return f"{self.export_id}/{MANIFEST_NAME}"
+
+    def load_manifest(self) -> dict | None:
+        """Returns the manifest of the export, or None if it has not started"""
+        data = self.store.get_bytes(self.manifest_key)
+        return json.loads(data) if data is not None else None
+
+    def _new_manifest(self) -> dict:
+        return {
+            "exportId": self.export_id,
+            "shopId": self.shop_id,
+            "format": self.export_format,
+            "status": "IN_PROGRESS",
+            "startedAt": _now(),
+            "rows": 0,
+            "parts": [],
+            "position": None,
+        }
+
+    def _save_manifest(self, manifest: dict) -> None:
+        self.store.put_bytes(
+            self.manifest_key, json.dumps(manifest, indent=2).encode("utf-8")
+        )
+
+    def run(self, should_stop=None) -> dict:
+        """
+        Exports the orders, or the remaining ones of an interrupted export, and returns the
+        manifest. Its status is COMPLETE once all the orders are exported.
+
+        Args:
+            should_stop (callable): Called after each part, the export stops (with the
+                IN_PROGRESS status) if it returns True, e.g. when a Lambda function is about
+                to time out. The export can then be resumed by running it again.
+        """
+        manifest = self.load_manifest()
+        if manifest is None:
+            manifest = self._new_manifest()
+        elif (manifest["shopId"], manifest["format"]) != (
+            self.shop_id,
+            self.export_format,
+        ):
+            raise ValueError(
+                f"The export {self.export_id} is an export of another shop or format"
+            )
+        if manifest["status"] == "COMPLETE":
+            return manifest
+
+        orders = self.orders_table.iter_orders_with_positions(
+            self.shop_id, position=manifest["position"], page_size=self.page_size
+        )
+        while True:
+            part_key = f"{self.export_id}/part-{len(manifest['parts']):05d}.{self.export_format}.gz"
+            part = self._write_part(part_key, orders)
+            if part is None:
+                break
+            manifest["parts"].append(
+                {"key": part_key, "rows": part["rows"], "bytes": part["bytes"]}
+            )
+            manifest["rows"] += part["rows"]
+            manifest["position"] = part["position"]
+            self._save_manifest(manifest)
+            self.logger.info(
+                f"Export {self.export_id}: {part_key} written, {manifest['rows']} orders exported"
+            )
+            if part["rows"] < self.part_rows:
+                break
+            if should_stop is not None and should_stop():
+                return manifest
+        manifest["status"] = "COMPLETE"
+        manifest["completedAt"] = _now()
+        self._save_manifest(manifest)
+        return manifest
+
+    def _write_part(self, part_key: str, orders) -> dict | None:
+        """Writes the next orders to a part, returns its rows, bytes and the position
+        after its last order. Returns None, without writing a part, if there is no order
+        left."""
+        first = next(orders, None)
+        if first is None:
+            return None
+        rows = 0
+        position = None
+        with self.store.open_writer(part_key) as file:
+            # mtime=0: the same orders always give the same file
+            with gzip.GzipFile(fileobj=file, mode="wb", mtime=0) as gzip_file:
+                text_file = io.TextIOWrapper(gzip_file, encoding="utf-8", newline="")
+                write_row = self._row_writer(text_file)
+                order_data, position = first
+                write_row(order_data)
+                rows = 1
+                while rows < self.part_rows:
+                    next_order = next(orders, None)
+                    if next_order is None:
+                        break
+                    order_data, position = next_order
+                    write_row(order_data)
+                    rows += 1
+                text_file.flush()
+                text_file.detach()
+            compressed_bytes = file.tell()
+        return {"rows": rows, "bytes": compressed_bytes, "position": position}
+
+    def _row_writer(self, text_file):
+        if self.export_format == "ndjson":
+
+            def write_ndjson_row(order_data: dict) -> None:
+                text_file.write(json.dumps(order_data, cls=DecimalEncoder) + "\n")
+
+            return write_ndjson_row
+
+        csv_writer = csv.DictWriter(
+            text_file, fieldnames=ORDER_FIELDS, extrasaction="ignore"
+        )
+        csv_writer.writeheader()
+        return csv_writer.writerow
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -4,8 +4,7 @@ from functools import wraps, partial
 from decimal import Decimal
 from typing import Any
 from aws_lambda_powertools import Logger
-from aws_lambda_powertools.utilities.data_masking import DataMasking
-from aws_lambda_powertools.utilities.data_masking.provider import BaseProvider
+from timing_helpers import timed_phase
 
 
 def mockup_logger():
@@ -50,7 +49,7 @@ def log_masking_decorator(masked_fields: list[str]):
             if is_valid_json_string(msg) or isinstance(msg, dict):
                 # DataMasker erase method, raises a lot of warning messages when it is set to not raise an exception
                 # On missing fields. But we don't want to see these warnings either, so we ignore them
-                with catch_warnings(action="ignore"):
+                with catch_warnings(action="ignore"), timed_phase("masking"):
                     msg = self.data_masker.erase(msg, fields=masked_fields)
             return func(self, msg, *args, **kwargs)
 
@@ -92,10 +91,23 @@ def decorate_log_methods(decorator):
 class CustomLogger(Logger):
     def __init__(self):
         super().__init__()
-        self.datamasking_provider = BaseProvider(
-            json_serializer=partial(json.dumps, default=decimal_serializer),
-            json_deserializer=json.loads,
-        )
-        self.data_masker = DataMasking(
-            provider=self.datamasking_provider, raise_on_missing_field=False
-        )
+        self._data_masker = None
+
+    @property
+    def data_masker(self):
+        # The data masking utility is slow to import, it is only loaded when the first
+        # dict or JSON message is logged instead of during the Lambda cold start
+        if self._data_masker is None:
+            from aws_lambda_powertools.utilities.data_masking import DataMasking
+            from aws_lambda_powertools.utilities.data_masking.provider import (
+                BaseProvider,
+            )
+
+            self.datamasking_provider = BaseProvider(
+                json_serializer=partial(json.dumps, default=decimal_serializer),
+                json_deserializer=json.loads,
+            )
+            self._data_masker = DataMasking(
+                provider=self.datamasking_provider, raise_on_missing_field=False
+            )
+        return self._data_masker
@@ -0,0 +1,279 @@
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from functools import wraps
+from log_helpers import ensure_logger
+
+# The fraction of the invocations which are profiled, e.g. 0.01 for 1%
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+# An invocation with the header X-Debug-Profile: <PROFILE_DEBUG_TOKEN> is profiled. The
+# header is ignored if there is no token, so that no caller can profile the invocations.
+PROFILE_DEBUG_TOKEN = os.environ.get("PROFILE_DEBUG_TOKEN")
+PROFILE_DEBUG_HEADER = "X-Debug-Profile"
+# "log" to log the profile summaries, or the folder they are written to (e.g. /tmp/profiles)
+PROFILE_OUTPUT = os.environ.get("PROFILE_OUTPUT", "log")
+PROFILE_INTERVAL_SECONDS = float(os.environ.get("PROFILE_INTERVAL_SECONDS", "0.005"))
+# The number of functions and lines in the summaries
+PROFILE_TOP = int(os.environ.get("PROFILE_TOP", "15"))
+
+# tracemalloc and the profiler are process wide, one invocation is profiled at a time
+_profiling_lock = threading.Lock()
+
+
+def _short_filename(filename: str) -> str:
+    """Returns the folder and name of a file, e.g. dynamodb_helpers/__init__.py"""
+    return "/".join(filename.replace("\\", "/").split("/")[-2:])
+
+
+def _code_name(code) -> str:
+    """Returns the short name of a function, e.g. dynamodb_helpers/__init__.py:1290(list_orders_by_shop_id)"""
+    return f"{_short_filename(code.co_filename)}:{code.co_firstlineno}({code.co_name})"
+
+
+def _is_running_pool_work(frame) -> bool:
+    """True if the frame is the stack of a thread pool worker running a task (e.g. the
+    concurrent lookups of concurrency_helpers.submit), not waiting for one"""
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == "run" and code.co_filename.endswith(
+            os.path.join("concurrent", "futures", "thread.py")
+        ):
+            return True
+        frame = frame.f_back
+    return False
+
+
+class InvocationProfiler:
+    """
+    Profiles one invocation:
+    - a sampling profiler: a background thread records the stack of the invoking thread,
+      and of the thread pool workers running tasks (e.g. its concurrent lookups), every
+      interval. The samples are wall clock samples, the time waiting for DynamoDB or
+      Cognito is counted in the functions waiting. A function is counted in "self" when it is at the top of the
+      stack and in "total" when it is anywhere in the stack.
+    - tracemalloc peak tracking: the peak of the traced memory and the allocations by
+      line when the traced memory was the highest, from a snapshot taken by the sampling
+      thread each time the traced memory grew by more than 10% (at most every 50 ms).
+
+    Args:
+        interval (float): The seconds between two samples
+        max_depth (int): The maximum number of frames of a sampled stack
+        track_memory (bool): Also track the memory allocations with tracemalloc
+    """
+
+    def __init__(
+        self, interval: float = 0.005, max_depth: int = 100, track_memory: bool = True
+    ):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.track_memory = track_memory
+        self.samples = 0
+        self.self_counts = Counter()
+        self.total_counts = Counter()
+        self.seconds = None
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._sampler = None
+        self._started_tracemalloc = False
+        self._snapshot = None
+        self._snapshot_current = 0
+        self._next_snapshot = 0.0
+        self._peak = 0
+        self._start = None
+
+    def start(self) -> None:
+        self._thread_id = threading.get_ident()
+        if self.track_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            tracemalloc.reset_peak()
+        self._start = time.perf_counter()
+        self._sampler = threading.Thread(
+            target=self._run, name="invocation-profiler", daemon=True
+        )
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self.seconds = time.perf_counter() - self._start
+        self._stop.set()
+        self._sampler.join()
+        if self.track_memory:
+            current, self._peak = tracemalloc.get_traced_memory()
+            if self._snapshot is None or current > self._snapshot_current:
+                self._take_snapshot(current)
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+            if self.track_memory:
+                current, _ = tracemalloc.get_traced_memory()
+                if (
+                    current > self._snapshot_current * 1.1
+                    and time.perf_counter() >= self._next_snapshot
+                ):
+                    self._take_snapshot(current)
+
+    def _take_snapshot(self, current: int) -> None:
+        self._snapshot = tracemalloc.take_snapshot().filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ]
+        )
+        self._snapshot_current = current
+        self._next_snapshot = time.perf_counter() + 0.05
+
+    def sample(self) -> None:
+        """Records the stacks of the profiled threads"""
+        sampler_id = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == sampler_id:
+                continue
+            if thread_id != self._thread_id and not _is_running_pool_work(frame):
+                continue
+            self.samples += 1
+            self.self_counts[frame.f_code] += 1
+            seen = set()
+            depth = 0
+            while frame is not None and depth < self.max_depth:
+                # Recursive functions are counted once per sample
+                if frame.f_code not in seen:
+                    seen.add(frame.f_code)
+                    self.total_counts[frame.f_code] += 1
+                frame = frame.f_back
+                depth += 1
+
+    def summary(self, top: int = 15) -> dict:
+        """Returns the compact summary of the profile: the functions with the most samples
+        and, if the memory is tracked, the peak memory and the lines which allocated the
+        most memory"""
+        summary = {
+            "seconds": round(self.seconds, 4),
+            "samples": self.samples,
+            "intervalMs": self.interval * 1000,
+            "topFunctions": [
+                {
+                    "function": _code_name(code),
+                    "self": self.self_counts[code],
+                    "total": count,
+                }
+                for code, count in self.total_counts.most_common(top)
+            ],
+            "topSelfFunctions": [
+                {"function": _code_name(code), "self": count}
+                for code, count in self.self_counts.most_common(top)
+            ],
+        }
+        if self.track_memory and self._snapshot is not None:
+            summary["memory"] = {
+                "peakBytes": self._peak,
+                "snapshotBytes": self._snapshot_current,
+                "topLines": [
+                    {
+                        "line": f"{_short_filename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                        "bytes": stat.size,
+                        "blocks": stat.count,
+                    }
+                    for stat in self._snapshot.statistics("lineno")[:top]
+                ],
+            }
+        return summary
+
+
+def _get_header(event: dict, name: str) -> str | None:
+    name = name.lower()
+    for header, value in (event.get("headers") or {}).items():
+        if header.lower() == name:
+            return value
+    return None
+
+
+def _should_profile(event: dict) -> bool:
+    if PROFILE_DEBUG_TOKEN:
+        token = _get_header(event, PROFILE_DEBUG_HEADER)
+        if token is not None and hmac.compare_digest(
+            token.encode(), PROFILE_DEBUG_TOKEN.encode()
+        ):
+            return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def write_profile_summary(summary: dict, logger=None) -> str | None:
+    """Logs the profile summary, or writes it as a JSON file in the PROFILE_OUTPUT folder.
+    Returns the path of the file, if any."""
+    if PROFILE_OUTPUT == "log":
+        ensure_logger(logger).info(json.dumps(summary))
+        return None
+    os.makedirs(PROFILE_OUTPUT, exist_ok=True)
+    path = os.path.join(
+        PROFILE_OUTPUT,
+        f"{summary['handler']}-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.json",
+    )
+    with open(path, "w") as profile_file:
+        json.dump(summary, profile_file)
+    ensure_logger(logger).info(f"Profile written to {path}")
+    return path
+
+
+def profile_handler(logger=None, handler: str = None):
+    """
+    Profiles a fraction (PROFILE_SAMPLE_RATE) of the invocations of a Lambda handler, and
+    the invocations with the X-Debug-Profile header set to PROFILE_DEBUG_TOKEN, with an
+    InvocationProfiler. The summaries are logged or written to the PROFILE_OUTPUT folder.
+    Relies on the arguments of the handler being (event, context).
+
+    If PROFILE_SAMPLE_RATE is 0 and PROFILE_DEBUG_TOKEN is not set, the handler is not
+    wrapped at all. An invocation is not profiled while another one is (e.g. on the
+    threads of the HTTP server).
+    """
+
+    def decorator(lambda_handler_func):
+        if PROFILE_SAMPLE_RATE <= 0 and not PROFILE_DEBUG_TOKEN:
+            return lambda_handler_func
+        handler_name = handler or os.environ.get(
+            "AWS_LAMBDA_FUNCTION_NAME", lambda_handler_func.__module__
+        )
+
+        @wraps(lambda_handler_func)
+        def wrapper(event, context):
+            if not _should_profile(event):
+                return lambda_handler_func(event, context)
+            if not _profiling_lock.acquire(blocking=False):
+                return lambda_handler_func(event, context)
+            try:
+                profiler = InvocationProfiler(interval=PROFILE_INTERVAL_SECONDS)
+                profiler.start()
+                try:
+                    return lambda_handler_func(event, context)
+                finally:
+                    profiler.stop()
+                    try:
+                        write_profile_summary(
+                            {
+                                "type": "profile",
+                                "handler": handler_name,
+                                **profiler.summary(PROFILE_TOP),
+                            },
+                            logger,
+                        )
+                    except Exception as e:
+                        # The profile must not fail the invocation
+                        ensure_logger(logger).warning(
+                            f"Failed to write the profile: {e}"
+                        )
+            finally:
+                _profiling_lock.release()
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,112 @@
+import json
+import threading
+import uuid
+from collections import deque
+from client_helpers import get_client
+
+
+class SqsQueue:
+    """
+    Queue of JSON messages backed by an SQS queue
+
+    Args:
+        queue_url (str): The URL of the SQS queue
+        sqs_client: The SQS client, the shared one by default
+    """
+
+    def __init__(self, queue_url: str, sqs_client=None):
+        self.queue_url = queue_url
+        self.sqs_client = sqs_client if sqs_client is not None else get_client("sqs")
+
+    def send_messages(self, messages: list[dict]) -> list[dict]:
+        """Send messages to the queue, 10 per call.
+        Returns the messages which could not be sent."""
+        failed = []
+        for i in range(0, len(messages), 10):
+            chunk = messages[i : i + 10]
+            response = self.sqs_client.send_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[
+                    {"Id": str(index), "MessageBody": json.dumps(message)}
+                    for index, message in enumerate(chunk)
+                ],
+            )
+            failed.extend(
+                chunk[int(entry["Id"])] for entry in response.get("Failed", [])
+            )
+        return failed
+
+
+class LocalQueue:
+    """
+    In memory stand-in of an SQS queue with a dead-letter queue, for the tests and the
+    local server. The messages are delivered to a consumer as an SQS Lambda event, the
+    messages reported as failed are delivered again and moved to the dead-letter queue
+    after max_receive_count deliveries, like an SQS redrive policy.
+
+    Args:
+        max_receive_count (int): Deliveries of a message before it is dead-lettered
+    """
+
+    def __init__(self, max_receive_count: int = 5):
+        self.max_receive_count = max_receive_count
+        self.messages = deque()
+        self.dead_letters = []
+        self._lock = threading.Lock()
+
+    def send_messages(self, messages: list[dict]) -> list[dict]:
+        with self._lock:
+            for message in messages:
+                self.messages.append(
+                    {"messageId": str(uuid.uuid4()), "body": message, "receiveCount": 0}
+                )
+        return []
+
+    def deliver(self, consumer, batch_size: int = 10) -> int:
+        """Deliver the queued messages to consumer(event) in batches until the queue is
+        empty. The consumer returns the SQS partial batch response
+        {"batchItemFailures": [{"itemIdentifier": message_id}]}.
+        Returns the number of messages delivered.
+        """
+        delivered = 0
+        while True:
+            with self._lock:
+                batch = [
+                    self.messages.popleft()
+                    for _ in range(min(batch_size, len(self.messages)))
+                ]
+            if not batch:
+                return delivered
+            for message in batch:
+                message["receiveCount"] += 1
+            event = {
+                "Records": [
+                    {
+                        "messageId": message["messageId"],
+                        "body": json.dumps(message["body"]),
+                        "attributes": {
+                            "ApproximateReceiveCount": str(message["receiveCount"])
+                        },
+                        "eventSource": "aws:sqs",
+                    }
+                    for message in batch
+                ]
+            }
+            try:
+                response = consumer(event) or {}
+                failed_ids = {
+                    failure["itemIdentifier"]
+                    for failure in response.get("batchItemFailures", [])
+                }
+            except Exception:
+                # Like SQS, the whole batch is delivered again
+                failed_ids = {message["messageId"] for message in batch}
+            delivered += len(batch)
+            with self._lock:
+                for message in batch:
+                    if message["messageId"] not in failed_ids:
+                        continue
+                    if message["receiveCount"] >= self.max_receive_count:
+                        self.dead_letters.append(message)
+                    else:
+                        self.messages.append(message)
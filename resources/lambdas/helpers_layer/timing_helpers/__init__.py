@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+# Add the durations of the phases of each invocation as a Server-Timing response header
+SERVER_TIMING_HEADER = os.environ.get("SERVER_TIMING_HEADER", "false").lower() == "true"
+# Publish the durations of the phases of each invocation as CloudWatch metrics
+PHASE_METRICS = os.environ.get("PHASE_METRICS", "false").lower() == "true"
+
+# The timer of the current invocation, None when the phases are not timed. The threads of
+# concurrency_helpers.submit run with the context of the caller, so they share its timer.
+_current_timer: ContextVar["PhaseTimer | None"] = ContextVar(
+    "phase_timer", default=None
+)
+
+
+class PhaseTimer:
+    """
+    The durations of the phases (e.g. "parse", "cognito", "shop_lookup") of one invocation.
+    A phase can be timed several times in an invocation, its durations are added. The
+    phases run concurrently (see concurrency_helpers.submit) overlap, so their sum can be
+    more than the total duration.
+
+    Args:
+        handler (str): The name of the handler or route, e.g. "place_order"
+    """
+
+    def __init__(self, handler: str):
+        self.handler = handler
+        self.start = time.perf_counter()
+        self.total = None
+        # The total duration in seconds and the number of calls of each phase, in the
+        # order the phases were first timed
+        self.phases: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def record(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            durations = self.phases.get(phase)
+            if durations is None:
+                self.phases[phase] = [seconds, 1]
+            else:
+                durations[0] += seconds
+                durations[1] += 1
+
+    def stop(self) -> float:
+        """Stops the timer and returns the total duration of the invocation in seconds"""
+        if self.total is None:
+            self.total = time.perf_counter() - self.start
+        return self.total
+
+    def server_timing(self) -> str:
+        """Returns the Server-Timing header value, the durations are in milliseconds:
+        parse;dur=0.12, shop_lookup;dur=8.5, total;dur=12.3"""
+        with self._lock:
+            phases = [
+                f"{phase};dur={seconds * 1000:.2f}"
+                for phase, (seconds, _) in self.phases.items()
+            ]
+        phases.append(f"total;dur={self.stop() * 1000:.2f}")
+        return ", ".join(phases)
+
+    def publish_metrics(self, namespace: str = None) -> None:
+        """Publishes the PhaseDuration metric of each phase, in milliseconds, with the
+        handler and phase dimensions. The total duration is the "total" phase."""
+        # Imported here so that the metrics utility is only loaded when it is used
+        from aws_lambda_powertools.metrics import EphemeralMetrics, MetricUnit
+
+        namespace = namespace or os.environ.get(
+            "POWERTOOLS_METRICS_NAMESPACE", "ApiSecurityDemo"
+        )
+        with self._lock:
+            phases = [(phase, seconds) for phase, (seconds, _) in self.phases.items()]
+        phases.append(("total", self.stop()))
+        for phase, seconds in phases:
+            # One metrics blob per phase, the dimensions are shared by its metrics
+            metrics = EphemeralMetrics(namespace=namespace)
+            metrics.add_dimension(name="handler", value=self.handler)
+            metrics.add_dimension(name="phase", value=phase)
+            metrics.add_metric(
+                name="PhaseDuration", unit=MetricUnit.Milliseconds, value=seconds * 1000
+            )
+            metrics.flush_metrics()
+
+
+class timed_phase:
+    """
+    Times a phase of the current invocation, as a context manager or a decorator:
+
+        with timed_phase("serialize"):
+            body = json.dumps(data)
+
+        @timed_phase("shop_lookup")
+        def get_shop_by_id(self, shop_id): ...
+
+    Nothing is timed outside of a timed invocation (see time_invocation), which costs a
+    context variable lookup. Do not decorate generator functions, only the creation of the
+    generator would be timed.
+    """
+
+    __slots__ = ("phase", "_timer", "_start")
+
+    def __init__(self, phase: str):
+        self.phase = phase
+
+    def __enter__(self):
+        self._timer = _current_timer.get()
+        if self._timer is not None:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._timer is not None:
+            self._timer.record(self.phase, time.perf_counter() - self._start)
+            self._timer = None
+
+    def __call__(self, func):
+        phase = self.phase
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            timer = _current_timer.get()
+            if timer is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timer.record(phase, time.perf_counter() - start)
+
+        return wrapper
+
+
+def current_timer() -> PhaseTimer | None:
+    """Returns the timer of the current invocation, None if the phases are not timed"""
+    return _current_timer.get()
+
+
+def is_timing_enabled() -> bool:
+    return SERVER_TIMING_HEADER or PHASE_METRICS
+
+
+def time_invocation(handler: str, func, *args, **kwargs) -> dict:
+    """
+    Calls func(*args, **kwargs), which returns an API Gateway response, and times the
+    phases of the call. The durations are added to the response as a Server-Timing header
+    if SERVER_TIMING_HEADER is set and published as metrics if PHASE_METRICS is set.
+    When both are off, func is only called.
+    """
+    if not is_timing_enabled():
+        return func(*args, **kwargs)
+    timer = PhaseTimer(handler)
+    token = _current_timer.set(timer)
+    response = None
+    try:
+        response = func(*args, **kwargs)
+        return response
+    finally:
+        _current_timer.reset(token)
+        timer.stop()
+        if SERVER_TIMING_HEADER and response is not None:
+            headers = response.setdefault("headers", {})
+            headers["Server-Timing"] = timer.server_timing()
+            # The browsers only expose the timings of cross origin responses to the
+            # allowed origins
+            if "Access-Control-Allow-Origin" in headers:
+                headers["Timing-Allow-Origin"] = headers["Access-Control-Allow-Origin"]
+        if PHASE_METRICS:
+            timer.publish_metrics()
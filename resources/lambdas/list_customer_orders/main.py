@@ -0,0 +1,82 @@
+import os
+from aws_lambda_powertools import Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from client_helpers import prime
+from api_helpers import (
+    ORDER_FIELDS,
+    LambdaEvent,
+    validate_method,
+    build_api_response,
+    parse_fields_parameter,
+    select_fields,
+)
+from dynamodb_helpers import get_orders_table, prime_orders_table
+from cognito_helpers import AppUser
+from log_helpers import CustomLogger
+
+logger = CustomLogger()
+tracer = Tracer()
+
+CORS_ORIGIN = os.environ.get("CORS_ORIGIN")
+TABLE_NAME = os.environ.get("TABLE_NAME")
+COGNITO_USER_POOL_ID = os.environ.get("COGNITO_USER_POOL_ID")
+
+# Build the AWS clients and the table handle during the init phase of the Lambda
+prime(clients=["cognito-idp"], resources=["dynamodb"])
+prime_orders_table(TABLE_NAME, logger)
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+@logger.inject_lambda_context(log_event=True)
+@tracer.capture_lambda_handler(capture_response=False)
+@validate_method("GET", logger)
+def lambda_handler(event: dict, context: LambdaContext):
+    lambda_event_object = LambdaEvent(event)
+    orders_table = get_orders_table(TABLE_NAME, logger)
+    response = api_list_customer_orders(lambda_event_object, orders_table)
+    return response
+
+
+def api_list_customer_orders(lambda_event_object, orders_table):
+    user = AppUser(
+        request_identity=lambda_event_object.requestidentity,
+        user_pool_id=COGNITO_USER_POOL_ID,
+        logger=logger,
+    )
+    customer_key = user.get_customer_dynamodb_key()
+    if customer_key is None:
+        return build_api_response(401, {"message": "Unauthorized"}, CORS_ORIGIN)
+
+    try:
+        limit = int(lambda_event_object.querystring.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return build_api_response(400, {"message": "Invalid limit"}, CORS_ORIGIN)
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return build_api_response(
+            400,
+            {"message": f"limit must be between 1 and {MAX_PAGE_SIZE}"},
+            CORS_ORIGIN,
+        )
+
+    try:
+        fields = parse_fields_parameter(lambda_event_object.querystring, ORDER_FIELDS)
+        orders_list, next_cursor = orders_table.list_orders_by_customer(
+            customer_key,
+            limit=limit,
+            cursor=lambda_event_object.querystring.get("cursor"),
+            date_from=lambda_event_object.querystring.get("from"),
+            date_to=lambda_event_object.querystring.get("to"),
+            fields=fields,
+        )
+    except ValueError as e:
+        return build_api_response(400, {"message": str(e)}, CORS_ORIGIN)
+    orders_list = [select_fields(order_data, fields) for order_data in orders_list]
+    response_object = {
+        "customerId": user.id,
+        "ordersList": orders_list,
+        "nextCursor": next_cursor,
+    }
+    logger.info(response_object)
+    return build_api_response(200, response_object, CORS_ORIGIN)
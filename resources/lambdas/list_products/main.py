@@ -1,27 +1,28 @@
 import os
-import boto3
 from aws_lambda_powertools import Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
+from client_helpers import prime
 from api_helpers import LambdaEvent, validate_method, build_api_response
-from dynamodb_helpers import DynamodbTestOrdersData
+from dynamodb_helpers import get_orders_table, prime_orders_table
 from log_helpers import CustomLogger
 
 logger = CustomLogger()
 tracer = Tracer()
-ddb = boto3.resource("dynamodb")
 
 CORS_ORIGIN = os.environ.get("CORS_ORIGIN")
 TABLE_NAME = os.environ.get("TABLE_NAME")
 
+# Build the AWS clients and the table handle during the init phase of the Lambda
+prime(resources=["dynamodb"])
+prime_orders_table(TABLE_NAME, logger)
+
 
 @logger.inject_lambda_context(log_event=True)
 @tracer.capture_lambda_handler(capture_response=False)
 @validate_method("GET", logger)
 def lambda_handler(event: dict, context: LambdaContext):
     lambda_event_object = LambdaEvent(event)
-    orders_table = DynamodbTestOrdersData(
-        TABLE_NAME, dynamodb_resource=ddb, logger=logger
-    )
+    orders_table = get_orders_table(TABLE_NAME, logger)
     response = api_list_shop_products(lambda_event_object, orders_table)
     return response
 
@@ -1,35 +1,55 @@
 import os
-import boto3
 from aws_lambda_powertools import Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
-from api_helpers import LambdaEvent, validate_method, build_api_response
-from dynamodb_helpers import DynamodbTestOrdersData
+from client_helpers import prime
+from api_helpers import (
+    ORDER_FIELDS,
+    LambdaEvent,
+    validate_method,
+    build_api_response,
+    parse_fields_parameter,
+    select_fields,
+)
+from dynamodb_helpers import get_orders_table, prime_orders_table
 from log_helpers import CustomLogger
+from profiling_helpers import profile_handler
 
 logger = CustomLogger()
 tracer = Tracer()
-ddb = boto3.resource("dynamodb")
 
 CORS_ORIGIN = os.environ.get("CORS_ORIGIN")
 TABLE_NAME = os.environ.get("TABLE_NAME")
 COGNITO_USER_POOL_ID = os.environ.get("COGNITO_USER_POOL_ID")
 
+# Build the AWS clients and the table handle during the init phase of the Lambda
+prime(resources=["dynamodb"])
+prime_orders_table(TABLE_NAME, logger)
+
 
 @logger.inject_lambda_context(log_event=True)
 @tracer.capture_lambda_handler(capture_response=False)
+@profile_handler(logger)
 @validate_method("GET", logger)
 def lambda_handler(event: dict, context: LambdaContext):
     lambda_event_object = LambdaEvent(event)
-    orders_table = DynamodbTestOrdersData(
-        TABLE_NAME, dynamodb_resource=ddb, logger=logger
-    )
+    orders_table = get_orders_table(TABLE_NAME, logger)
     response = api_list_shop_orders(lambda_event_object, orders_table)
     return response
 
 
 def api_list_shop_orders(lambda_event_object, orders_table):
     shop_id = lambda_event_object.pathparameters["id"]
-    orders_list = orders_table.list_orders_by_shop_id(shop_id)
+    try:
+        fields = parse_fields_parameter(lambda_event_object.querystring, ORDER_FIELDS)
+        orders_list = orders_table.list_orders_by_shop_id(
+            shop_id,
+            date_from=lambda_event_object.querystring.get("from"),
+            date_to=lambda_event_object.querystring.get("to"),
+            fields=fields,
+        )
+    except ValueError as e:
+        return build_api_response(400, {"message": str(e)}, CORS_ORIGIN)
+    orders_list = [select_fields(order_data, fields) for order_data in orders_list]
     response_object = {"shopId": shop_id, "ordersList": orders_list}
     logger.info(response_object)
     return build_api_response(200, response_object, CORS_ORIGIN)
@@ -1,13 +1,13 @@
 import os
-import boto3
 from aws_lambda_powertools import Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
+from client_helpers import get_resource
 from dynamodb_helpers import DynamodbTestOrdersData
 from log_helpers import CustomLogger
 
 logger = CustomLogger()
 tracer = Tracer()
-ddb = boto3.resource("dynamodb")
+ddb = get_resource("dynamodb")
 
 TABLE_NAME = os.environ.get("TABLE_NAME")
 
@@ -22,8 +22,7 @@ def lambda_handler(event: dict, context: LambdaContext):
 
 
 def ensure_shop_token(orders_table):
-    shops = orders_table.list_shops()
-    for shop in shops:
+    for shop in orders_table.iter_shops():
         if not shop.get("shopToken"):
             logger.info(
                 f"Regenerating token for shop {shop['shopId']} {shop.get('name')}"
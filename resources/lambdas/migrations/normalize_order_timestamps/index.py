@@ -0,0 +1,87 @@
+import os
+from boto3.dynamodb.conditions import Attr
+from client_helpers import get_resource
+from botocore.exceptions import ClientError
+from aws_lambda_powertools import Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from dynamodb_helpers import DynamodbTestOrdersData, normalize_timestamp
+from log_helpers import CustomLogger
+
+logger = CustomLogger()
+tracer = Tracer()
+ddb = get_resource("dynamodb")
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+
+TIMESTAMP_ATTRIBUTES = ["GSI1-SK", "GSI2-SK", "date"]
+
+
+@logger.inject_lambda_context(log_event=True)
+@tracer.capture_lambda_handler(capture_response=False)
+def lambda_handler(event: dict, context: LambdaContext):
+    orders_table = DynamodbTestOrdersData(
+        TABLE_NAME, dynamodb_resource=ddb, logger=logger
+    )
+    normalize_order_timestamps(orders_table)
+
+
+def normalize_order_timestamps(orders_table) -> int:
+    """Rewrite the order dates and GSI sort keys which are not in the sortable timestamp format.
+    Returns the number of orders which have been updated.
+    """
+    updated_orders = 0
+    for order in orders_table.iter_scan(
+        FilterExpression=Attr("entityType").eq("order"),
+        ProjectionExpression="PK, SK, #gsi1sk, #gsi2sk, #date",
+        ExpressionAttributeNames={
+            "#gsi1sk": "GSI1-SK",
+            "#gsi2sk": "GSI2-SK",
+            "#date": "date",
+        },
+    ):
+        if _normalize_order(orders_table, order):
+            updated_orders += 1
+    logger.info(f"{updated_orders} orders timestamps have been normalized")
+    return updated_orders
+
+
+def _normalize_order(orders_table, order: dict) -> bool:
+    """Normalize the timestamps of one order. Returns True if the order was updated"""
+    update_expressions = []
+    condition_expressions = []
+    attribute_names = {}
+    attribute_values = {}
+    for i, attribute in enumerate(TIMESTAMP_ATTRIBUTES):
+        value = order.get(attribute)
+        if value is None:
+            continue
+        try:
+            normalized_value = normalize_timestamp(value)
+        except ValueError:
+            logger.warning(f"Order {order['PK']} has an invalid {attribute}: {value}")
+            continue
+        if normalized_value == value:
+            continue
+        attribute_names[f"#a{i}"] = attribute
+        attribute_values[f":new{i}"] = normalized_value
+        attribute_values[f":old{i}"] = value
+        update_expressions.append(f"#a{i} = :new{i}")
+        # Do not overwrite a value which has been changed since it was read
+        condition_expressions.append(f"#a{i} = :old{i}")
+    if not update_expressions:
+        return False
+    try:
+        orders_table.table.update_item(
+            Key={"PK": order["PK"], "SK": order["SK"]},
+            UpdateExpression="SET " + ", ".join(update_expressions),
+            ConditionExpression=" AND ".join(condition_expressions),
+            ExpressionAttributeNames=attribute_names,
+            ExpressionAttributeValues=attribute_values,
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            logger.warning(f"Order {order['PK']} was modified, it is not normalized")
+            return False
+        raise
+    logger.info(f"Order {order['PK']} timestamps have been normalized")
+    return True
@@ -0,0 +1,67 @@
+import os
+from collections import defaultdict
+from decimal import Decimal
+from aws_lambda_powertools import Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from client_helpers import get_resource
+from dynamodb_helpers import (
+    DynamodbTestOrdersData,
+    SALES_DAY_PREFIX,
+    gsi1_shop_key,
+    sales_rollup_keys,
+)
+from log_helpers import CustomLogger
+
+logger = CustomLogger()
+tracer = Tracer()
+ddb = get_resource("dynamodb")
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+
+
+@logger.inject_lambda_context(log_event=True)
+@tracer.capture_lambda_handler(capture_response=False)
+def lambda_handler(event: dict, context: LambdaContext):
+    orders_table = DynamodbTestOrdersData(
+        TABLE_NAME, dynamodb_resource=ddb, logger=logger
+    )
+    rebuild_sales_rollups(orders_table)
+
+
+def rebuild_sales_rollups(orders_table) -> int:
+    """Recompute the daily and monthly sales rollup items of all the shops from the orders.
+    The rollups are overwritten with the recomputed values, so the migration can be run again.
+    Orders placed while the migration runs may be missed, so it should run in a quiet period.
+    Returns the number of rollup items which have been written.
+    """
+    rollups = defaultdict(lambda: {"totalAmount": Decimal(0), "ordersCount": 0})
+    for order in orders_table.iter_scan(
+        IndexName="GSI1",
+        ProjectionExpression="#pk, #sk, #amount",
+        ExpressionAttributeNames={
+            "#pk": "GSI1-PK",
+            "#sk": "GSI1-SK",
+            "#amount": "amount",
+        },
+    ):
+        # The rollups of a sharded shop are in its shop partition, not in its shards
+        shop_key = gsi1_shop_key(order["GSI1-PK"])
+        for rollup_key in sales_rollup_keys(order["GSI1-SK"]):
+            rollup = rollups[(shop_key, rollup_key)]
+            rollup["totalAmount"] += order["amount"]
+            rollup["ordersCount"] += 1
+
+    with orders_table.table.batch_writer() as batch:
+        for (shop_key, rollup_key), rollup in rollups.items():
+            batch.put_item(
+                Item={
+                    "PK": shop_key,
+                    "SK": rollup_key,
+                    "entityType": "salesDay"
+                    if rollup_key.startswith(SALES_DAY_PREFIX)
+                    else "salesMonth",
+                    **rollup,
+                }
+            )
+    logger.info(f"{len(rollups)} sales rollup items have been rebuilt")
+    return len(rollups)
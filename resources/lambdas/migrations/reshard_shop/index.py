@@ -0,0 +1,76 @@
+import os
+from boto3.dynamodb.conditions import Key
+from client_helpers import get_resource
+from botocore.exceptions import ClientError
+from aws_lambda_powertools import Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from dynamodb_helpers import DynamodbTestOrdersData, shop_gsi1_pk, shop_gsi1_pks
+from log_helpers import CustomLogger
+
+logger = CustomLogger()
+tracer = Tracer()
+ddb = get_resource("dynamodb")
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+
+
+@logger.inject_lambda_context(log_event=True)
+@tracer.capture_lambda_handler(capture_response=False)
+def lambda_handler(event: dict, context: LambdaContext):
+    """Expects an event like {"shopId": "0001", "shards": 4}.
+    Use "shards": 1 to move the orders of a shop back to a single GSI1 partition.
+    """
+    orders_table = DynamodbTestOrdersData(
+        TABLE_NAME, dynamodb_resource=ddb, logger=logger
+    )
+    return {"movedOrders": reshard_shop(orders_table, event["shopId"], event["shards"])}
+
+
+def reshard_shop(orders_table, shop_id: str, shards: int) -> int:
+    """Move the orders of a shop to the GSI1 partitions of the new number of shards.
+    The shop stays online: new orders are written to the new shards as soon as the
+    resharding starts and the reads include the previous partitions until it is finished.
+    Returns the number of orders which have been moved.
+    """
+    previous_shards = orders_table.start_shop_resharding(shop_id, shards)
+    logger.info(
+        f"Resharding shop {shop_id} from {previous_shards} to {shards} GSI1 shards"
+    )
+    moved_orders = 0
+    for gsi1_pk in shop_gsi1_pks(
+        shop_id, max(previous_shards, shards), resharding=True
+    ):
+        for order in orders_table.iter_query(
+            IndexName="GSI1",
+            KeyConditionExpression=Key("GSI1-PK").eq(gsi1_pk),
+            ProjectionExpression="PK, SK, #pk",
+            ExpressionAttributeNames={"#pk": "GSI1-PK"},
+        ):
+            order_id = order["PK"].split("#")[-1]
+            new_gsi1_pk = shop_gsi1_pk(shop_id, order_id, shards)
+            if new_gsi1_pk != order["GSI1-PK"] and _move_order(
+                orders_table, order, new_gsi1_pk
+            ):
+                moved_orders += 1
+    orders_table.finish_shop_resharding(shop_id)
+    logger.info(f"{moved_orders} orders of shop {shop_id} have been moved")
+    return moved_orders
+
+
+def _move_order(orders_table, order: dict, new_gsi1_pk: str) -> bool:
+    """Move one order to a new GSI1 partition. Returns True if the order was moved"""
+    try:
+        orders_table.table.update_item(
+            Key={"PK": order["PK"], "SK": order["SK"]},
+            UpdateExpression="SET #pk = :new",
+            # Do not move an order which has been changed since it was read
+            ConditionExpression="#pk = :old",
+            ExpressionAttributeNames={"#pk": "GSI1-PK"},
+            ExpressionAttributeValues={":new": new_gsi1_pk, ":old": order["GSI1-PK"]},
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            logger.warning(f"Order {order['PK']} was modified, it is not moved")
+            return False
+        raise
+    return True
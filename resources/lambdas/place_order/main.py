@@ -1,20 +1,33 @@
+import hashlib
 import json
 import os
-import boto3
 from aws_lambda_powertools import Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
+from client_helpers import prime
 from api_helpers import LambdaEvent, validate_method, build_api_response
-from dynamodb_helpers import DynamodbTestOrdersData
+from dynamodb_helpers import get_orders_table, prime_orders_table
 from cognito_helpers import AppUser
+from concurrency_helpers import submit, discard
 from log_helpers import CustomLogger
+from queue_helpers import SqsQueue
+from timing_helpers import timed_phase
 
 logger = CustomLogger()
 tracer = Tracer()
-ddb = boto3.resource("dynamodb")
 
 CORS_ORIGIN = os.environ.get("CORS_ORIGIN")
 TABLE_NAME = os.environ.get("TABLE_NAME")
 COGNITO_USER_POOL_ID = os.environ.get("COGNITO_USER_POOL_ID")
+# When set, the orders are queued and placed by the process_orders_queue function
+ORDERS_QUEUE_URL = os.environ.get("ORDERS_QUEUE_URL")
+ORDERS_QUEUE = SqsQueue(ORDERS_QUEUE_URL) if ORDERS_QUEUE_URL else None
+# How long the response of a request with an Idempotency-Key header is returned again
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", "86400"))
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+# Build the AWS clients and the table handle during the init phase of the Lambda
+prime(clients=["cognito-idp"], resources=["dynamodb"])
+prime_orders_table(TABLE_NAME, logger)
 
 
 @logger.inject_lambda_context(log_event=True)
@@ -22,34 +35,147 @@ COGNITO_USER_POOL_ID = os.environ.get("COGNITO_USER_POOL_ID")
 @validate_method("POST", logger)
 def lambda_handler(event: dict, context: LambdaContext):
     lambda_event_object = LambdaEvent(event)
-    orders_table = DynamodbTestOrdersData(
-        TABLE_NAME, dynamodb_resource=ddb, logger=logger
-    )
+    orders_table = get_orders_table(TABLE_NAME, logger)
     response = api_place_order(lambda_event_object, orders_table)
     return response
 
 
-def api_place_order(lambda_event_object, orders_table):
-    event_data = json.loads(lambda_event_object.body)
+def api_place_order(lambda_event_object, orders_table, orders_queue=None):
+    """Places the order, or queues it if there is an orders queue (the ORDERS_QUEUE_URL
+    queue by default).
+
+    With an Idempotency-Key header, the successful response is stored and returned again
+    for the retries of the same request, without placing the order again. The order ID is
+    reserved in the idempotency record before the order is placed, a retry after an attempt
+    which did not complete places the order with the same ID, at most once.
+    """
+    idempotency_key = lambda_event_object.get_header("Idempotency-Key")
+    if idempotency_key is None:
+        return place_order(lambda_event_object, orders_table, orders_queue)
+    if not 0 < len(idempotency_key) <= MAX_IDEMPOTENCY_KEY_LENGTH:
+        return build_api_response(
+            400, {"message": "ERROR : Invalid Idempotency-Key"}, CORS_ORIGIN
+        )
+    # The keys are scoped to the caller, no one can get the response of another caller
+    caller = AppUser(
+        request_identity=lambda_event_object.requestidentity, attributes={}
+    )
+    scoped_key = f"{caller.id}#{idempotency_key}"
+    # The shop token is part of the request, a retry without the token is rejected
+    request_hash = hashlib.sha256(
+        json.dumps(
+            [lambda_event_object.body, lambda_event_object.querystring.get("shopToken")]
+        ).encode()
+    ).hexdigest()
+
+    record = orders_table.start_idempotent_request(
+        scoped_key, request_hash, ttl_seconds=IDEMPOTENCY_TTL_SECONDS
+    )
+    if record is not None and record["status"] != "RESUMED":
+        if record["status"] == "IN_PROGRESS":
+            return build_api_response(
+                409,
+                {
+                    "message": "ERROR : A request with this Idempotency-Key is in progress"
+                },
+                CORS_ORIGIN,
+            )
+        if record["requestHash"] != request_hash:
+            return build_api_response(
+                422,
+                {"message": "ERROR : Idempotency-Key already used for another request"},
+                CORS_ORIGIN,
+            )
+        response = build_api_response(
+            record["response"]["statusCode"],
+            json.loads(record["response"]["body"]),
+            CORS_ORIGIN,
+        )
+        response["headers"]["Idempotent-Replayed"] = "true"
+        return response
+
+    try:
+        if record is None:
+            order_id = orders_table.reserve_idempotent_order_id(scoped_key)
+        else:
+            order_id = record["orderId"]
+        response = place_order(
+            lambda_event_object, orders_table, orders_queue, order_id
+        )
+    except Exception:
+        orders_table.release_idempotent_request(scoped_key)
+        raise
+    if 200 <= response["statusCode"] < 300:
+        try:
+            orders_table.complete_idempotent_request(
+                scoped_key,
+                {"statusCode": response["statusCode"], "body": response["body"]},
+                ttl_seconds=IDEMPOTENCY_TTL_SECONDS,
+            )
+        except Exception:
+            # The order is placed, a retry once the lock expired gets the same order ID
+            logger.exception("Failed to complete the idempotent request")
+    else:
+        # The errors are not stored, the request can be retried with the same key
+        orders_table.release_idempotent_request(scoped_key)
+    return response
+
+
+def place_order(lambda_event_object, orders_table, orders_queue=None, order_id=None):
+    """Places or queues the order of the event, with the given order ID if it was
+    reserved (see api_place_order)"""
+    if orders_queue is None:
+        orders_queue = ORDERS_QUEUE
+    with timed_phase("parse"):
+        event_data = json.loads(lambda_event_object.body)
     try:
         shop_token = lambda_event_object.querystring["shopToken"]
     except KeyError:
         return build_api_response(400, {"message": "Missing shopToken"}, CORS_ORIGIN)
 
     if lambda_event_object.is_proper_order():
+        items = event_data["items"]
+        if not isinstance(items, list) or not all(
+            isinstance(item, dict) for item in items
+        ):
+            return build_api_response(
+                400, {"message": "ERROR : Invalid order items"}, CORS_ORIGIN
+            )
         shop_id = event_data["shopId"]
-        shop_data = orders_table.get_shop_by_id(shop_id)
-        user = AppUser(
+        # The shop, the user and the products are independent lookups, run them concurrently
+        shop_future = submit(orders_table.get_shop_record, shop_id)
+        user_future = submit(
+            AppUser,
             request_identity=lambda_event_object.requestidentity,
             user_pool_id=COGNITO_USER_POOL_ID,
             logger=logger,
         )
-        if shop_data["shopToken"] != shop_token:
+        # Queued orders are priced by the queue consumer
+        products_future = (
+            submit(
+                orders_table.get_products_data_by_keys,
+                f"s#{shop_id}",
+                [f"p#{item.get('productId')}" for item in event_data["items"]],
+            )
+            if orders_queue is None
+            else None
+        )
+        shop = shop_future.result()
+        if shop is None:
+            discard(user_future, products_future)
+            return build_api_response(404, {"message": "Shop not found"}, CORS_ORIGIN)
+        if shop.shopToken != shop_token:
+            discard(user_future, products_future)
             return build_api_response(
                 401,
                 {"message": "Unauthorized this is not the Token we hanged at the door"},
                 CORS_ORIGIN,
             )
+        user = user_future.result()
+        if orders_queue is not None:
+            return queue_order(
+                orders_table, orders_queue, event_data, shop, user, order_id
+            )
 
         try:
             order_id = orders_table.put_new_order(
@@ -58,6 +184,9 @@ def api_place_order(lambda_event_object, orders_table):
                 phone_number=event_data["phoneNumber"],
                 customer_name=event_data["name"],
                 items=event_data["items"],
+                gsi1_shards=shop.gsi1_shards(),
+                products_data=products_future.result(),
+                order_id=order_id,
             )
             return build_api_response(200, {"orderId": order_id}, CORS_ORIGIN)
         except Exception:
@@ -68,3 +197,41 @@ def api_place_order(lambda_event_object, orders_table):
         return build_api_response(
             400, {"message": "ERROR : Invalid order"}, CORS_ORIGIN
         )
+
+
+def queue_order(orders_table, orders_queue, event_data, shop, user, order_id=None):
+    """Reserves the order ID and queues the order, returns 202 with the order ID.
+    The status of the order is returned by GET /order/{id}/status."""
+    shop_id = event_data["shopId"]
+    customer_key = user.get_customer_dynamodb_key()
+    try:
+        order_id = orders_table.reserve_order_request(
+            shop_id, customer_key, order_id=order_id
+        )
+    except Exception:
+        logger.exception("Failed to reserve an order ID")
+        return build_api_response(
+            400, {"message": "ERROR :  Failed to store order"}, CORS_ORIGIN
+        )
+    message = {
+        "orderId": order_id,
+        "shopId": shop_id,
+        "customerKey": customer_key,
+        "phoneNumber": event_data["phoneNumber"],
+        "name": event_data["name"],
+        "items": event_data["items"],
+        "gsi1Shards": shop.gsi1_shards(),
+    }
+    try:
+        failed = orders_queue.send_messages([message])
+    except Exception:
+        logger.exception(f"Failed to queue the order {order_id}")
+        failed = [message]
+    if failed:
+        orders_table.fail_order_request(order_id, "The order could not be queued")
+        return build_api_response(
+            400, {"message": "ERROR :  Failed to store order"}, CORS_ORIGIN
+        )
+    return build_api_response(
+        202, {"orderId": order_id, "status": "QUEUED"}, CORS_ORIGIN
+    )
@@ -0,0 +1,143 @@
+import json
+import os
+from aws_lambda_powertools import Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from client_helpers import prime
+from api_helpers import LambdaEvent, validate_method, build_api_response
+from dynamodb_helpers import get_orders_table, prime_orders_table
+from cognito_helpers import AppUser
+from concurrency_helpers import submit, discard
+from log_helpers import CustomLogger
+from timing_helpers import timed_phase
+
+logger = CustomLogger()
+tracer = Tracer()
+
+CORS_ORIGIN = os.environ.get("CORS_ORIGIN")
+TABLE_NAME = os.environ.get("TABLE_NAME")
+COGNITO_USER_POOL_ID = os.environ.get("COGNITO_USER_POOL_ID")
+# Maximum number of orders in a batch
+MAX_BATCH_SIZE = int(os.environ.get("ORDERS_BATCH_MAX_SIZE", "100"))
+
+# Build the AWS clients and the table handle during the init phase of the Lambda
+prime(clients=["cognito-idp"], resources=["dynamodb"])
+prime_orders_table(TABLE_NAME, logger)
+
+
+@logger.inject_lambda_context(log_event=True)
+@tracer.capture_lambda_handler(capture_response=False)
+@validate_method("POST", logger)
+def lambda_handler(event: dict, context: LambdaContext):
+    lambda_event_object = LambdaEvent(event)
+    orders_table = get_orders_table(TABLE_NAME, logger)
+    return api_place_orders_batch(lambda_event_object, orders_table)
+
+
+def validate_order(order) -> str | None:
+    """Returns why an order of the batch is invalid, None if it is valid"""
+    if not isinstance(order, dict):
+        return "Invalid order"
+    missing = {"phoneNumber", "name", "items"} - order.keys()
+    if missing:
+        return f"Invalid order, missing {sorted(missing)}"
+    if not isinstance(order["items"], list) or not order["items"]:
+        return "Invalid order, items must be a non empty list"
+    for item in order["items"]:
+        if (
+            not isinstance(item, dict)
+            or "productId" not in item
+            or not isinstance(item.get("quantity"), int)
+            or item["quantity"] < 1
+        ):
+            return "Invalid order, each item needs a productId and a positive quantity"
+    return None
+
+
+def api_place_orders_batch(lambda_event_object, orders_table):
+    try:
+        shop_token = lambda_event_object.querystring["shopToken"]
+    except KeyError:
+        return build_api_response(400, {"message": "Missing shopToken"}, CORS_ORIGIN)
+    try:
+        with timed_phase("parse"):
+            event_data = json.loads(lambda_event_object.body)
+        shop_id = event_data["shopId"]
+        orders = event_data["orders"]
+    except (TypeError, KeyError, json.decoder.JSONDecodeError):
+        return build_api_response(
+            400, {"message": "ERROR : Invalid orders batch"}, CORS_ORIGIN
+        )
+    if not isinstance(orders, list) or not 0 < len(orders) <= MAX_BATCH_SIZE:
+        return build_api_response(
+            400,
+            {"message": f"ERROR : A batch must have 1 to {MAX_BATCH_SIZE} orders"},
+            CORS_ORIGIN,
+        )
+
+    # The shop token is checked once for the whole batch
+    shop_future = submit(orders_table.get_shop_record, shop_id)
+    user_future = submit(
+        AppUser,
+        request_identity=lambda_event_object.requestidentity,
+        user_pool_id=COGNITO_USER_POOL_ID,
+        logger=logger,
+    )
+    shop = shop_future.result()
+    if shop is None:
+        discard(user_future)
+        return build_api_response(404, {"message": "Shop not found"}, CORS_ORIGIN)
+    if shop.shopToken != shop_token:
+        discard(user_future)
+        return build_api_response(
+            401,
+            {"message": "Unauthorized this is not the Token we hanged at the door"},
+            CORS_ORIGIN,
+        )
+    user = user_future.result()
+    # Customers order for themselves, the owner of the shop imports orders which are not
+    # linked to a customer (e.g. from a point of sale)
+    customer_key = user.get_customer_dynamodb_key()
+    if customer_key is None and not (
+        user.is_shop_owner() and user.attributes.get("custom:shopId") == shop_id
+    ):
+        return build_api_response(403, {"message": "Forbidden"}, CORS_ORIGIN)
+
+    results = [{"index": index} for index in range(len(orders))]
+    valid_indexes = []
+    for index, order in enumerate(orders):
+        error = validate_order(order)
+        if error:
+            results[index]["error"] = error
+        else:
+            valid_indexes.append(index)
+    if valid_indexes:
+        try:
+            stored = orders_table.put_new_orders(
+                shop_id,
+                # Only the fields a caller may set, the order IDs, dates and customer
+                # are never taken from the request
+                [
+                    {
+                        key: orders[index][key]
+                        for key in ("phoneNumber", "name", "items")
+                    }
+                    for index in valid_indexes
+                ],
+                customer_key=customer_key,
+                gsi1_shards=shop.gsi1_shards(),
+            )
+        except Exception:
+            logger.exception(f"Failed to store the orders batch of shop {shop_id}")
+            stored = [{"error": "Failed to store the order"}] * len(valid_indexes)
+        for index, result in zip(valid_indexes, stored):
+            results[index].update(result)
+
+    succeeded = sum(1 for result in results if "orderId" in result)
+    response_object = {
+        "shopId": shop_id,
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results,
+    }
+    logger.info({"succeeded": succeeded, "failed": len(results) - succeeded})
+    return build_api_response(200, response_object, CORS_ORIGIN)
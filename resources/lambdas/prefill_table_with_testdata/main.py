@@ -1,14 +1,14 @@
 import os
-import boto3
 from aws_lambda_powertools import Logger
 from aws_lambda_powertools.utilities.typing import LambdaContext
+from client_helpers import get_client, get_resource
 from dynamodb_helpers import DynamodbTestOrdersData
 from crhelper import CfnResource
 
 helper = CfnResource()
 logger = Logger()
-ddb = boto3.resource("dynamodb")
-cognito_idp = boto3.client("cognito-idp")
+ddb = get_resource("dynamodb")
+cognito_idp = get_client("cognito-idp")
 
 TABLE_NAME = os.environ.get("TABLE_NAME")
 COGNITO_USERPOOL_ID = os.environ.get("COGNITO_USERPOOL_ID")
@@ -0,0 +1,99 @@
+import json
+import os
+from collections import defaultdict
+from aws_lambda_powertools import Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from client_helpers import prime
+from dynamodb_helpers import get_orders_table, prime_orders_table
+from log_helpers import CustomLogger
+
+logger = CustomLogger()
+tracer = Tracer()
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+# The keys of the messages queued by place_order (see queue_order)
+MESSAGE_KEYS = {"orderId", "shopId", "phoneNumber", "name", "items"}
+
+# Build the AWS clients and the table handle during the init phase of the Lambda
+prime(resources=["dynamodb"])
+prime_orders_table(TABLE_NAME, logger)
+
+
+@logger.inject_lambda_context(log_event=False)
+@tracer.capture_lambda_handler(capture_response=False)
+def lambda_handler(event: dict, context: LambdaContext):
+    orders_table = get_orders_table(TABLE_NAME, logger)
+    return process_queued_orders(event, orders_table)
+
+
+def process_queued_orders(event: dict, orders_table) -> dict:
+    """
+    Places the orders queued by place_order, in bulk per shop (see put_queued_orders).
+
+    * Orders which are invalid (e.g. unknown product) are marked as FAILED and are not retried
+    * Orders which could not be written are reported as failed to the queue, which delivers
+      them again and moves them to the dead-letter queue after too many attempts
+    * Orders already placed or failed (the queue delivers a message at least once) are skipped
+    * Messages which are not order messages (e.g. without shopId) are reported as failed,
+      the queue moves them to the dead-letter queue and the rest of the batch is placed
+
+    Returns the SQS partial batch response with the messages to deliver again.
+    """
+    retry_message_ids = set()
+    messages_by_order_id = {}
+    for record in event["Records"]:
+        try:
+            message = json.loads(record["body"])
+            if not isinstance(message, dict) or not MESSAGE_KEYS <= message.keys():
+                raise ValueError("Missing order keys")
+            messages_by_order_id[message["orderId"]] = (record["messageId"], message)
+        except (TypeError, KeyError, ValueError):
+            # It can never be processed, let the queue dead-letter it
+            logger.error(f"Invalid queued order message {record['messageId']}")
+            retry_message_ids.add(record["messageId"])
+
+    order_requests = orders_table.get_order_requests(list(messages_by_order_id))
+    orders_by_shop = defaultdict(list)
+    for order_id, (message_id, message) in messages_by_order_id.items():
+        order_request = order_requests.get(order_id, {})
+        if (
+            order_request.get("entityType") != "orderRequest"
+            or order_request.get("status") != "QUEUED"
+        ):
+            logger.info(f"Order {order_id} is not queued anymore, skipping it")
+            continue
+        orders_by_shop[message["shopId"]].append((message_id, message))
+
+    for shop_id, shop_messages in orders_by_shop.items():
+        orders = [
+            {
+                "orderId": message["orderId"],
+                "customerKey": message.get("customerKey"),
+                "phoneNumber": message["phoneNumber"],
+                "name": message["name"],
+                "items": message["items"],
+            }
+            for _, message in shop_messages
+        ]
+        try:
+            results = orders_table.put_queued_orders(
+                shop_id, orders, gsi1_shards=shop_messages[0][1].get("gsi1Shards")
+            )
+        except Exception:
+            logger.exception(f"Failed to place the queued orders of shop {shop_id}")
+            retry_message_ids.update(message_id for message_id, _ in shop_messages)
+            continue
+        for (message_id, message), result in zip(shop_messages, results):
+            if "orderId" in result:
+                continue
+            if result.get("retryable"):
+                retry_message_ids.add(message_id)
+            else:
+                orders_table.fail_order_request(message["orderId"], result["error"])
+
+    logger.info({"messages": len(event["Records"]), "retried": len(retry_message_ids)})
+    return {
+        "batchItemFailures": [
+            {"itemIdentifier": message_id} for message_id in sorted(retry_message_ids)
+        ]
+    }
@@ -0,0 +1,54 @@
+import os
+from aws_lambda_powertools import Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from client_helpers import prime
+from api_helpers.router import Router
+from dynamodb_helpers import get_orders_table, prime_orders_table
+from log_helpers import CustomLogger
+from profiling_helpers import profile_handler
+
+logger = CustomLogger()
+tracer = Tracer()
+
+CORS_ORIGIN = os.environ.get("CORS_ORIGIN")
+TABLE_NAME = os.environ.get("TABLE_NAME")
+
+# The api_* function of each API resource and method, see the OpenAPI definition
+ROUTES = {
+    "/products": {"GET": "list_products.main:api_list_shop_products"},
+    "/order": {"POST": "place_order.main:api_place_order"},
+    "/orders/batch": {"POST": "place_orders_batch.main:api_place_orders_batch"},
+    "/order/{id}": {"GET": "get_order.main:api_get_order"},
+    "/order/{id}/status": {"GET": "get_order_status.main:api_get_order_status"},
+    "/orders": {"GET": "get_orders.main:api_get_orders"},
+    "/me/orders": {"GET": "list_customer_orders.main:api_list_customer_orders"},
+    "/shop/{id}": {"GET": "get_shop.main:api_get_shop"},
+    "/shops": {"GET": "get_shops.main:api_get_shops"},
+    "/shop/{id}/token": {
+        "POST": "regenerate_shop_token.main:api_regenerate_shop_token"
+    },
+    "/shop/{id}/orders": {"GET": "list_shop_orders.main:api_list_shop_orders"},
+    "/shop/{id}/sales": {"GET": "get_shop_sales.main:api_get_shop_total_sales"},
+    "/service-stats": {"GET": "get_service_stats.main:api_compute_statistics"},
+}
+
+# Build the AWS clients and the table handle during the init phase of the Lambda
+prime(clients=["cognito-idp"], resources=["dynamodb"])
+prime_orders_table(TABLE_NAME, logger)
+
+# The route modules are next to this one. When deployed they are top level modules,
+# in the tests they are in the "lambdas" package.
+router = Router(
+    ROUTES,
+    get_orders_table=lambda: get_orders_table(TABLE_NAME, logger),
+    package=__name__.rpartition(".")[0].rpartition(".")[0],
+    logger=logger,
+    cors_origin=CORS_ORIGIN,
+)
+
+
+@logger.inject_lambda_context(log_event=True)
+@tracer.capture_lambda_handler(capture_response=False)
+@profile_handler(logger)
+def lambda_handler(event: dict, context: LambdaContext):
+    return router.dispatch(event)
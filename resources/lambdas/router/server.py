@@ -0,0 +1,191 @@
+"""
+Serves the API routes as a long lived HTTP service (e.g. in a container) instead of Lambda
+functions. The requests are turned into API Gateway events and dispatched by the same
+router as the router Lambda function.
+
+Run from the resources/lambdas folder with the helpers layer on the PYTHONPATH:
+    PYTHONPATH=helpers_layer python -m router.server --threads 16 --processes 2
+
+    --local                 Serve against an in-process DynamoDB stand-in (moto) prefilled
+                            with the test data, instead of the TABLE_NAME table
+    --endpoint-url URL      Use another DynamoDB endpoint, e.g. DynamoDB Local
+    --memory                Serve against an in-memory storage prefilled with the test
+                            data (single process), instead of the TABLE_NAME table
+    --load-test             Serve locally and run a load test against the server
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from api_helpers.server import WsgiApp, free_port, make_wsgi_server, serve
+
+
+def start_local_dynamodb() -> tuple[object, str]:
+    """Starts the moto server as a local stand-in of the AWS services"""
+    from moto.server import ThreadedMotoServer
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    port = free_port()
+    moto_server = ThreadedMotoServer(port=port, verbose=False)
+    moto_server.start()
+    return moto_server, f"http://127.0.0.1:{port}"
+
+
+def configure_environment(args) -> None:
+    """Sets the environment read by the helpers before they are imported"""
+    # Every worker thread must be able to keep its own connection to DynamoDB
+    os.environ.setdefault(
+        "AWS_CLIENT_MAX_POOL_CONNECTIONS", str(max(args.threads * 2, 20))
+    )
+    os.environ.setdefault("AWS_DEFAULT_REGION", "eu-west-1")
+    if args.local or args.endpoint_url or args.memory:
+        os.environ.setdefault("TABLE_NAME", "local-OrdersTable")
+        os.environ.setdefault("CORS_ORIGIN", "*")
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    if args.endpoint_url:
+        os.environ["AWS_ENDPOINT_URL_DYNAMODB"] = args.endpoint_url
+    if args.memory:
+        os.environ["ORDERS_TABLE_STORAGE"] = "memory"
+    if args.load_test:
+        os.environ.setdefault("POWERTOOLS_LOG_LEVEL", "WARNING")
+        os.environ.setdefault("POWERTOOLS_METRICS_DISABLED", "true")
+
+
+def build_app(trust_identity_headers: bool) -> WsgiApp:
+    from .main import router
+
+    return WsgiApp(router, trust_identity_headers=trust_identity_headers)
+
+
+def reset_clients_after_fork() -> None:
+    import client_helpers
+    import dynamodb_helpers
+
+    client_helpers.reset_clients()
+    dynamodb_helpers.reset_orders_tables()
+
+
+def _get(base_url: str, path: str) -> tuple[int, bytes]:
+    try:
+        with urllib.request.urlopen(base_url + path, timeout=30) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def _percentile(sorted_values: list[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))
+    return sorted_values[index]
+
+
+def run_load_test(base_url: str, requests: int, concurrency: int) -> dict:
+    """Sends GET requests on the shop routes of the test data and returns the latencies"""
+    _, shop_body = _get(base_url, "/shop/0001")
+    shop_token = json.loads(shop_body)["shopToken"]
+    paths = [
+        "/shop/0001",
+        "/shop/0001/sales",
+        "/shop/0001/orders",
+        f"/products?shopId=0001&shopToken={shop_token}",
+    ]
+
+    def timed_get(index: int) -> tuple[str, int, float]:
+        path = paths[index % len(paths)]
+        start = time.perf_counter()
+        status, _ = _get(base_url, path)
+        return path.split("?")[0], status, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed_get, range(requests)))
+    duration = time.perf_counter() - start
+
+    latencies = sorted(latency for _, _, latency in results)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": sum(1 for _, status, _ in results if status >= 400),
+        "durationSeconds": round(duration, 3),
+        "requestsPerSecond": round(requests / duration, 1),
+        "latencyMs": {
+            "mean": round(statistics.fmean(latencies), 2),
+            "p50": round(_percentile(latencies, 50), 2),
+            "p95": round(_percentile(latencies, 95), 2),
+            "p99": round(_percentile(latencies, 99), 2),
+            "max": round(latencies[-1], 2),
+        },
+    }
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the API routes over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--threads", type=int, default=8, help="Worker threads")
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes")
+    parser.add_argument("--local", action="store_true", help="Use a local stand-in")
+    parser.add_argument("--endpoint-url", help="DynamoDB endpoint, e.g. DynamoDB Local")
+    parser.add_argument(
+        "--memory", action="store_true", help="Use an in-memory storage"
+    )
+    parser.add_argument(
+        "--trust-identity-headers",
+        action="store_true",
+        help="Read the caller identity from the X-Cognito-* headers",
+    )
+    parser.add_argument("--load-test", action="store_true")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args(argv)
+    if args.memory and args.processes > 1:
+        # Each process would have its own items
+        parser.error("--memory can only be used with a single process")
+    if args.load_test:
+        args.local = args.local or not (args.endpoint_url or args.memory)
+        args.port = free_port(args.host)
+
+    configure_environment(args)
+    moto_server = None
+    if args.local:
+        moto_server, endpoint_url = start_local_dynamodb()
+        os.environ["AWS_ENDPOINT_URL"] = endpoint_url
+    if args.local or args.endpoint_url or args.memory:
+        from dynamodb_helpers import get_orders_table
+
+        get_orders_table(os.environ["TABLE_NAME"]).prefill_table_with_testdata()
+
+    app = build_app(args.trust_identity_headers or args.local or args.memory)
+    server = make_wsgi_server(
+        app, args.host, args.port, workers=args.threads, quiet=args.load_test
+    )
+    try:
+        if not args.load_test:
+            serve(server, args.processes, after_fork=reset_clients_after_fork)
+            return 0
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        report = run_load_test(
+            f"http://{args.host}:{args.port}", args.requests, args.concurrency
+        )
+        server.shutdown()
+        server.server_close()
+        print(json.dumps(report, indent=2))
+        return 0 if report["errors"] == 0 else 1
+    finally:
+        if moto_server is not None:
+            moto_server.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,15 @@
 import os
-import boto3
 import json
 from aws_lambda_powertools import Logger
 from aws_lambda_powertools.utilities.typing import LambdaContext
+from client_helpers import get_client
 from botocore.exceptions import ClientError
 from crhelper import CfnResource
 
 helper = CfnResource()
 logger = Logger()
-cognito_idp = boto3.client("cognito-idp")
-asm = boto3.client("secretsmanager")
+cognito_idp = get_client("cognito-idp")
+asm = get_client("secretsmanager")
 
 USER_POOL_ID = os.environ["USER_POOL_ID"]
 USERS = os.environ["USERS"].split(",")
@@ -1,5 +1,7 @@
 import json
 import os
+import pytest
+import client_helpers
 from api_helpers import LambdaEvent
 
 
@@ -16,6 +18,7 @@ class FakeLambdaEvent(LambdaEvent):
         querystring_params: dict = None,
         request_identity: dict = None,
         body: dict = None,
+        headers: dict = None,
     ):
         if path_params is None:
             path_params = {}
@@ -29,3 +32,12 @@ class FakeLambdaEvent(LambdaEvent):
         self.pathparameters = path_params
         self.requestidentity = request_identity
         self.body = body_params
+        self.headers = headers if headers is not None else {}
+
+
+@pytest.fixture(autouse=True)
+def shared_aws_clients():
+    """Each test starts without the AWS clients and resources cached by a previous test"""
+    client_helpers.reset_clients()
+    yield
+    client_helpers.reset_clients()
@@ -0,0 +1,93 @@
+import boto3
+import os
+import random
+import pytest
+from collections import Counter, defaultdict
+from decimal import Decimal
+from aggregation_helpers import OrderColumns
+from dynamodb_helpers import DynamodbTestOrdersData
+from moto import mock_aws
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+
+
+def random_order_items(count: int) -> list[dict]:
+    generator = random.Random(42)
+    items = []
+    for _ in range(count):
+        item = {
+            "GSI1-PK": f"s#{generator.randint(1, 5):04d}#{generator.randint(0, 3)}",
+            "GSI1-SK": f"2024-0{generator.randint(1, 3)}-1{generator.randint(0, 9)}T10:00:00Z",
+            "amount": Decimal(generator.randint(1, 100000)) / 100,
+        }
+        if generator.random() < 0.9:
+            item["GSI2-PK"] = f"c#{generator.randint(1, 50)}"
+        items.append(item)
+    return items
+
+
+def test_aggregations_match_the_decimal_results():
+    items = random_order_items(5000)
+    orders = OrderColumns.from_items(items)
+    shop_amounts = defaultdict(list)
+    for item in items:
+        shop_amounts[item["GSI1-PK"].split("#")[1]].append(item["amount"])
+
+    assert len(orders) == 5000
+    assert orders.total_amount() == sum(item["amount"] for item in items)
+    assert orders.sum_by("shop") == {
+        shop_id: sum(amounts) for shop_id, amounts in shop_amounts.items()
+    }
+    assert orders.count_by("shop") == {
+        shop_id: len(amounts) for shop_id, amounts in shop_amounts.items()
+    }
+    assert orders.mean_by("shop") == {
+        shop_id: sum(amounts) / len(amounts)
+        for shop_id, amounts in shop_amounts.items()
+    }
+    # The orders without customer are not counted
+    assert orders.count_by("customer") == Counter(
+        item["GSI2-PK"] for item in items if "GSI2-PK" in item
+    )
+    day_amounts = defaultdict(Decimal)
+    for item in items:
+        day_amounts[item["GSI1-SK"][:10]] += item["amount"]
+    assert orders.sum_by("day") == day_amounts
+
+    for shop_id, quantiles in orders.quantiles_by("shop", [0, 0.5, 0.9, 1]).items():
+        amounts = sorted(float(amount) for amount in shop_amounts[shop_id])
+        assert quantiles[0] == amounts[0]
+        assert quantiles[-1] == amounts[-1]
+        # Linear interpolation between the closest ranks
+        rank = (len(amounts) - 1) * 0.9
+        low = int(rank)
+        expected = amounts[low] + (rank - low) * (amounts[low + 1] - amounts[low])
+        assert quantiles[2] == pytest.approx(expected)
+
+
+def test_aggregation_rejects_inexact_amounts():
+    items = random_order_items(1)
+    items[0]["amount"] = Decimal("1.00001")
+    with pytest.raises(ValueError):
+        OrderColumns.from_items(items)
+    assert OrderColumns.from_items(items, amount_digits=5).total_amount() == Decimal(
+        "1.00001"
+    )
+    empty = OrderColumns.from_items([])
+    assert empty.total_amount() == 0
+    assert empty.sum_by("shop") == {}
+    assert empty.count_by("customer") == {}
+
+
+@mock_aws
+def test_order_columns_from_table():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+
+    orders = OrderColumns.from_table(fake_table, page_size=2)
+    totals = orders.sum_by("shop")
+    for shop in fake_table.list_shops():
+        assert totals[shop["shopId"]] == fake_table.get_total_amount_by_shop_id(
+            shop["shopId"]
+        )
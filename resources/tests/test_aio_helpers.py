@@ -0,0 +1,191 @@
+import asyncio
+import boto3
+import os
+import pytest
+import requests
+import uuid
+from dynamodb_helpers import DynamodbTestOrdersData
+from dynamodb_helpers.aio import AsyncDynamodbTestOrdersData
+from cognito_helpers.aio import get_app_user
+from moto.server import ThreadedMotoServer
+
+from .test_cognito_helpers import setup_cognito
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+
+# aiobotocore does not work with the in-process mock_aws, so these tests run against
+# a local moto server
+AWS_TEST_CONFIG = {
+    "region_name": "eu-west-1",
+    "aws_access_key_id": "testing",
+    "aws_secret_access_key": "testing",
+}
+
+
+@pytest.fixture(scope="module")
+def moto_server_url():
+    server = ThreadedMotoServer(port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    yield f"http://{host}:{port}"
+    server.stop()
+
+
+@pytest.fixture
+def aws_config(moto_server_url):
+    requests.post(f"{moto_server_url}/moto-api/reset")
+    return {**AWS_TEST_CONFIG, "endpoint_url": moto_server_url}
+
+
+@pytest.fixture
+def fake_table(aws_config):
+    ddb = boto3.resource("dynamodb", **aws_config)
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    return fake_table
+
+
+def test_async_data_layer_matches_sync(aws_config, fake_table):
+    customer_key = f"v#{fake_table.get_order_data('1111')['customerId']}"
+
+    async def read_all():
+        async with AsyncDynamodbTestOrdersData.connect(
+            TABLE_NAME, **aws_config
+        ) as async_table:
+            # Independent lookups are awaited concurrently
+            return await asyncio.gather(
+                async_table.get_shop_by_id("0001"),
+                async_table.get_shop_by_id("1111"),
+                async_table.list_shops(),
+                async_table.get_order_data("1111"),
+                async_table.get_order_data("1111", include_items=False),
+                async_table.get_order_data("9999"),
+                async_table.list_products_by_shop_id("0001"),
+                async_table.list_orders_by_shop_id("0001"),
+                async_table.list_orders_by_customer(customer_key, limit=1),
+                async_table.get_total_amount_by_shop_id("0001"),
+                async_table.get_sales_by_shop_id("0001"),
+                async_table.get_product_data_by_number(1, 1),
+            )
+
+    async_results = asyncio.run(read_all())
+    sync_results = [
+        fake_table.get_shop_by_id("0001"),
+        fake_table.get_shop_by_id("1111"),
+        fake_table.list_shops(),
+        fake_table.get_order_data("1111"),
+        fake_table.get_order_data("1111", include_items=False),
+        fake_table.get_order_data("9999"),
+        fake_table.list_products_by_shop_id("0001"),
+        fake_table.list_orders_by_shop_id("0001"),
+        fake_table.list_orders_by_customer(customer_key, limit=1),
+        fake_table.get_total_amount_by_shop_id("0001"),
+        fake_table.get_sales_by_shop_id("0001"),
+        fake_table.get_product_data_by_number(1, 1),
+    ]
+    for async_result, sync_result in zip(async_results, sync_results):
+        assert async_result == sync_result
+
+
+def test_async_list_products_by_shop_id_pages(aws_config, fake_table):
+    async def list_products(page_size):
+        async with AsyncDynamodbTestOrdersData.connect(
+            TABLE_NAME, **aws_config
+        ) as async_table:
+            return await async_table.list_products_by_shop_id("0001", page_size)
+
+    products = fake_table.list_products_by_shop_id("0001")
+    assert len(products) > 1
+    # All the pages are read
+    assert asyncio.run(list_products(1)) == products
+
+
+def test_async_put_new_order(aws_config, fake_table):
+    async def place_order():
+        async with AsyncDynamodbTestOrdersData.connect(
+            TABLE_NAME, **aws_config
+        ) as async_table:
+            return await async_table.put_new_order(
+                shop_id="0001",
+                customer_key="v#1234",
+                phone_number="0771112233",
+                customer_name="John Doe",
+                items=[
+                    {"productId": "0011", "quantity": 1},
+                    {"productId": "0012", "quantity": 2},
+                ],
+            )
+
+    order_id = asyncio.run(place_order())
+    order = fake_table.get_order_data(order_id)
+    # The product 0011 costs 110 and the product 0012 costs 120
+    assert order["amount"] == 110 + 2 * 120
+    assert len(order["items"]) == 2
+    assert fake_table.get_sales_by_shop_id("0001")["totalAmount"] == 350 + 350
+
+
+def test_async_put_new_order_matches_sync(aws_config, fake_table):
+    order = {
+        "shop_id": "0001",
+        "customer_key": None,
+        "phone_number": "0771112233",
+        "customer_name": "Point of sale",
+        "items": [{"productId": "0011", "quantity": 1}],
+    }
+    unknown_product_order = {**order, "items": [{"productId": "0099", "quantity": 1}]}
+
+    async def place_orders():
+        async with AsyncDynamodbTestOrdersData.connect(
+            TABLE_NAME, **aws_config
+        ) as async_table:
+            order_id = await async_table.put_new_order(**order)
+            with pytest.raises(ValueError, match="Unknown product 0099"):
+                await async_table.put_new_order(**unknown_product_order)
+            return order_id
+
+    async_order_id = asyncio.run(place_orders())
+    sync_order_id = fake_table.put_new_order(**order)
+    with pytest.raises(ValueError, match="Unknown product 0099"):
+        fake_table.put_new_order(**unknown_product_order)
+
+    def order_item(order_id):
+        item = fake_table.table.get_item(
+            Key={"PK": f"o#{order_id}", "SK": f"o#{order_id}"}
+        )["Item"]
+        for name in ("PK", "SK", "GSI1-SK", "date"):
+            del item[name]
+        return item
+
+    # Orders without customer are not in GSI2
+    assert "GSI2-PK" not in order_item(async_order_id)
+    assert order_item(async_order_id) == order_item(sync_order_id)
+
+
+def test_async_app_user_matches_sync(aws_config):
+    cognito_idp_client = boto3.client("cognito-idp", **aws_config)
+    cognito_identity_client = boto3.client("cognito-identity", **aws_config)
+    cognito_setup = setup_cognito(cognito_idp_client, cognito_identity_client)
+    request_identity = {
+        "cognitoIdentityPoolId": cognito_setup.identity_pool_id,
+        "cognitoIdentityId": f"eu-west-1:{uuid.uuid4()}",
+        "cognitoAuthenticationType": "authenticated",
+        "cognitoAuthenticationProvider": f"cognito-idp.eu-west-1.amazonaws.com/{cognito_setup.user_pool_id}:CognitoSignIn:{cognito_setup.sub}",
+    }
+
+    async def get_user():
+        import aioboto3
+
+        async with aioboto3.Session().client(
+            "cognito-idp", **aws_config
+        ) as async_cognito_idp_client:
+            return await get_app_user(
+                request_identity,
+                cognito_setup.user_pool_id,
+                cognito_idp_client=async_cognito_idp_client,
+            )
+
+    async_user = asyncio.run(get_user())
+    assert async_user.id == cognito_setup.sub
+    assert async_user.type == "registered_user"
+    assert async_user.attributes["custom:role"] == "customer"
+    assert async_user.is_customer()
@@ -0,0 +1,103 @@
+import boto3
+import csv
+import gzip
+import io
+import json
+import os
+from decimal import Decimal
+from dynamodb_helpers import DynamodbTestOrdersData
+from dynamodb_helpers.importer import BulkImporter, read_records
+from moto import mock_aws
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+
+RECORDS = [
+    {
+        "type": "shop",
+        "shopId": "0100",
+        "name": "Imported shop",
+        "phoneNumber": "+41 22 000 00 00",
+        "address": "Rue du Lac 1, Geneva",
+    },
+    {
+        "type": "product",
+        "shopId": "0100",
+        "productId": "0101",
+        "name": "Coffee",
+        "price": 3.5,
+    },
+    {
+        "type": "order",
+        "orderId": "9001",
+        "shopId": "0100",
+        "customerKey": "c#0001",
+        "date": "2024-03-01T10:00:00",
+        "name": "Jane",
+        "phoneNumber": "+41 79 000 00 00",
+        "status": "DELIVERED",
+        "items": [{"productId": "0101", "name": "Coffee", "price": 3.5, "quantity": 2}],
+    },
+]
+
+
+@mock_aws
+def test_bulk_import_ndjson():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    lines = [json.dumps(record) for record in RECORDS]
+    # An empty line is skipped, an unknown type and an order without items are rejected
+    lines += ["", json.dumps({"type": "customer"}), json.dumps({"type": "order"})]
+    data = gzip.compress("\n".join(lines).encode("utf-8"))
+
+    report = BulkImporter(fake_table, writers=2).run(
+        read_records(gzip.GzipFile(fileobj=io.BytesIO(data)), "ndjson")
+    )
+    assert report["records"] == 3
+    # The shop, the product, the order line item and the order
+    assert report["items"] == 4
+    assert report["failedItems"] == 0
+    assert report["rejectedRecords"] == 2
+    assert [error["line"] for error in report["errors"]] == [5, 6]
+
+    assert fake_table.get_shop_by_id("0100")["name"] == "Imported shop"
+    assert fake_table.list_products_by_shop_id("0100")[0]["price"] == Decimal("3.5")
+    order = fake_table.get_order_data("9001")
+    assert order["amount"] == Decimal("7.0")
+    assert order["status"] == "DELIVERED"
+    assert order["date"] == "2024-03-01T10:00:00Z"
+    assert [o["orderId"] for o in fake_table.list_orders_by_shop_id("0100")] == ["9001"]
+
+
+@mock_aws
+def test_bulk_import_csv(tmp_path):
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    order = RECORDS[2]
+    csv_file = tmp_path / "orders.csv"
+    with open(csv_file, "w", newline="") as file:
+        writer = csv.DictWriter(
+            file,
+            fieldnames=["type", "orderId", "shopId", "customerKey", "date", "name"]
+            + ["phoneNumber", "items"],
+        )
+        writer.writeheader()
+        writer.writerow(
+            {
+                "type": "order",
+                "orderId": "9002",
+                "shopId": "0001",
+                "date": "2024-03-02",
+                "name": "Bob",
+                "phoneNumber": "+41 79 111 11 11",
+                "items": json.dumps(order["items"]),
+            }
+        )
+
+    report = BulkImporter(fake_table).run(read_records(str(csv_file), "csv"))
+    assert report["records"] == 1
+    assert report["rejectedRecords"] == 0
+    order_data = fake_table.get_order_data("9002")
+    assert order_data["status"] == "PENDING"
+    assert order_data["shopId"] == "0001"
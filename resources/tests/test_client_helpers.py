@@ -0,0 +1,58 @@
+import boto3
+import os
+import client_helpers
+import dynamodb_helpers
+from concurrent.futures import ThreadPoolExecutor
+from client_helpers import (
+    CLIENT_CONFIG,
+    get_client,
+    get_resource,
+    set_client,
+    reset_clients,
+)
+from dynamodb_helpers import get_orders_table, prime_orders_table
+from moto import mock_aws
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+
+
+def test_get_client_is_shared():
+    client = get_client("dynamodb")
+    assert get_client("dynamodb") is client
+    assert get_client("cognito-idp") is not client
+    # The clients are built with the tuned configuration
+    assert client.meta.config.max_pool_connections == CLIENT_CONFIG.max_pool_connections
+    assert client.meta.config.tcp_keepalive is True
+    assert client.meta.config.retries["mode"] == "standard"
+
+
+def test_get_resource_is_shared_between_threads():
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        resources = list(executor.map(lambda _: get_resource("dynamodb"), range(16)))
+    assert all(resource is resources[0] for resource in resources)
+
+
+def test_set_client_and_reset_clients():
+    client = boto3.client("cognito-idp")
+    set_client("cognito-idp", client)
+    assert get_client("cognito-idp") is client
+    reset_clients()
+    assert get_client("cognito-idp") is not client
+    assert client_helpers._session is not None
+
+
+def test_prime_builds_the_clients():
+    client_helpers.prime(clients=["cognito-idp"], resources=["dynamodb"])
+    assert "cognito-idp" in client_helpers._clients
+    assert "dynamodb" in client_helpers._resources
+
+
+@mock_aws
+def test_get_orders_table_is_shared(monkeypatch):
+    monkeypatch.setattr(dynamodb_helpers, "_orders_tables", {})
+    # Outside of Lambda the table handle is not built during the init phase
+    assert prime_orders_table(TABLE_NAME) is None
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_NAME", "test")
+    orders_table = prime_orders_table(TABLE_NAME)
+    assert orders_table is get_orders_table(TABLE_NAME)
+    assert orders_table.ddb is get_resource("dynamodb")
@@ -0,0 +1,86 @@
+import boto3
+import os
+from itertools import islice
+from dynamodb_helpers import (
+    DynamodbTestOrdersData,
+    chunked,
+    iter_merge_gsi1_partitions,
+)
+from moto import mock_aws
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+
+
+class CountingTable:
+    """Counts the Query and Scan requests made on a table"""
+
+    def __init__(self, table):
+        self.table = table
+        self.requests = 0
+
+    def __getattr__(self, name):
+        return getattr(self.table, name)
+
+    def query(self, **kwargs):
+        self.requests += 1
+        return self.table.query(**kwargs)
+
+    def scan(self, **kwargs):
+        self.requests += 1
+        return self.table.scan(**kwargs)
+
+
+@mock_aws
+def test_iterators_return_the_listed_items():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+
+    assert list(fake_table.iter_shops(page_size=2)) == fake_table.list_shops()
+    assert list(
+        fake_table.iter_products_by_shop_id("0001", page_size=1)
+    ) == fake_table.list_products_by_shop_id("0001")
+    assert list(
+        fake_table.iter_orders_by_shop_id("0001", page_size=1)
+    ) == fake_table.list_orders_by_shop_id("0001")
+    assert [
+        product.to_api() for product in fake_table.iter_product_records("0001")
+    ] == fake_table.list_products_by_shop_id("0001")
+    assert [
+        order.to_api() for order in fake_table.iter_order_records_by_shop_id("0001")
+    ] == fake_table.list_orders_by_shop_id("0001")
+    customer_key = "v#" + fake_table.get_order_data("1111")["customerId"]
+    orders, _ = fake_table.list_orders_by_customer(customer_key, limit=100)
+    assert orders
+    assert list(fake_table.iter_orders_by_customer(customer_key, page_size=1)) == orders
+
+
+@mock_aws
+def test_iterators_read_the_pages_lazily():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    fake_table.table = CountingTable(fake_table.table)
+
+    products = fake_table.iter_products_by_shop_id("0001", page_size=1)
+    assert fake_table.table.requests == 0
+    first_product = next(products)
+    assert first_product["productId"] == "0011"
+    assert fake_table.table.requests == 1
+    assert [product["productId"] for product in products] == ["0012"]
+
+
+def test_iter_merge_gsi1_partitions():
+    partitions = [
+        iter([{"PK": "o#1", "GSI1-SK": "1"}, {"PK": "o#3", "GSI1-SK": "3"}]),
+        # o#3 is briefly in both partitions while the shop is resharded
+        iter([{"PK": "o#2", "GSI1-SK": "2"}, {"PK": "o#3", "GSI1-SK": "3"}]),
+    ]
+    merged = iter_merge_gsi1_partitions(partitions)
+    assert [order["PK"] for order in islice(merged, 2)] == ["o#1", "o#2"]
+    assert [order["PK"] for order in merged] == ["o#3"]
+
+
+def test_chunked():
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(chunked([], 2)) == []
@@ -0,0 +1,99 @@
+import boto3
+import csv
+import gzip
+import io
+import json
+import os
+import pytest
+from dynamodb_helpers import DynamodbTestOrdersData
+from export_helpers import LocalFileStore, OrdersExport, S3Store
+from moto import mock_aws
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+
+
+def read_ndjson_parts(store, manifest: dict) -> list[dict]:
+    orders = []
+    for part in manifest["parts"]:
+        data = gzip.decompress(store.get_bytes(part["key"])).decode("utf-8")
+        orders.extend(json.loads(line) for line in data.splitlines())
+    return orders
+
+
+@mock_aws
+def test_export_shop_orders(tmp_path):
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    store = LocalFileStore(str(tmp_path))
+
+    manifest = OrdersExport(
+        fake_table, store, "export-1", shop_id="0001", part_rows=1
+    ).run()
+    assert manifest["status"] == "COMPLETE"
+    assert manifest["rows"] == 2
+    assert [part["key"] for part in manifest["parts"]] == [
+        "export-1/part-00000.ndjson.gz",
+        "export-1/part-00001.ndjson.gz",
+    ]
+    assert (tmp_path / "export-1" / "manifest.json").exists()
+    orders = read_ndjson_parts(store, manifest)
+    assert sorted(order["orderId"] for order in orders) == sorted(
+        order["orderId"] for order in fake_table.list_orders_by_shop_id("0001")
+    )
+    assert all(order["shopId"] == "0001" for order in orders)
+
+
+@mock_aws
+def test_export_all_orders_is_resumed(tmp_path):
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    store = LocalFileStore(str(tmp_path))
+
+    # The export is interrupted after its first part
+    manifest = OrdersExport(
+        fake_table, store, "export-2", export_format="csv", part_rows=1
+    ).run(should_stop=lambda: True)
+    assert manifest["status"] == "IN_PROGRESS"
+    assert len(manifest["parts"]) == 1
+
+    manifest = OrdersExport(
+        fake_table, store, "export-2", export_format="csv", part_rows=1
+    ).run()
+    assert manifest["status"] == "COMPLETE"
+    order_ids = []
+    for part in manifest["parts"]:
+        data = gzip.decompress(store.get_bytes(part["key"])).decode("utf-8")
+        rows = list(csv.DictReader(io.StringIO(data)))
+        order_ids.extend(row["orderId"] for row in rows)
+    assert sorted(order_ids) == ["1111", "2222", "3333", "4444"]
+    assert manifest["rows"] == 4
+
+    # A complete export is not written again, another format is rejected
+    export = OrdersExport(fake_table, store, "export-2", export_format="csv")
+    assert export.run() == manifest
+    with pytest.raises(ValueError):
+        OrdersExport(fake_table, store, "export-2", export_format="ndjson").run()
+
+
+@mock_aws
+def test_export_to_s3():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    s3 = boto3.client("s3", region_name="eu-west-1")
+    s3.create_bucket(
+        Bucket="exports",
+        CreateBucketConfiguration={"LocationConstraint": "eu-west-1"},
+    )
+    store = S3Store("exports", prefix="exports/", s3_client=s3)
+
+    manifest = OrdersExport(fake_table, store, "export-3", shop_id="0001").run()
+    assert manifest["status"] == "COMPLETE"
+    assert len(read_ndjson_parts(store, manifest)) == 2
+    assert store.get_bytes("export-3/missing.json") is None
+    manifest_object = s3.get_object(
+        Bucket="exports", Key="exports/export-3/manifest.json"
+    )
+    assert json.loads(manifest_object["Body"].read())["rows"] == 2
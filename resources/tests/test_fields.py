@@ -0,0 +1,136 @@
+import boto3
+import json
+import os
+import uuid
+import yaml
+from pathlib import Path
+from .conftest import FakeLambdaEvent
+from api_helpers import ORDER_FIELDS, SHOP_FIELDS
+from dynamodb_helpers import DynamodbTestOrdersData
+from moto import mock_aws
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+API_DEFINITION = Path(__file__).parent.parent / "openapi" / "api-definition.yaml"
+
+
+def customer_identity(customer_id: str) -> dict:
+    current_region = boto3.session.Session().region_name
+    return {
+        "cognitoIdentityPoolId": uuid.uuid4(),
+        "cognitoIdentityId": f"{current_region}:{customer_id}",
+        "cognitoAuthenticationType": "unauthenticated",
+        "cognitoAuthenticationProvider": None,
+    }
+
+
+def test_fields_match_the_api_definition():
+    paths = yaml.safe_load(API_DEFINITION.read_text())["paths"]
+    expected_fields = {
+        "/order/{id}": ORDER_FIELDS + ("items",),
+        "/orders": ORDER_FIELDS,
+        "/me/orders": ORDER_FIELDS,
+        "/shop/{id}/orders": ORDER_FIELDS,
+        "/shop/{id}": SHOP_FIELDS,
+        "/shops": SHOP_FIELDS,
+    }
+    for path, fields in expected_fields.items():
+        parameters = {
+            parameter["name"]: parameter
+            for parameter in paths[path]["get"]["parameters"]
+        }
+        assert parameters["fields"]["schema"]["items"]["enum"] == list(fields), path
+    # The fields are properties of the responses
+    order_properties = paths["/order/{id}"]["get"]["responses"]["200"]["content"][
+        "application/json"
+    ]["schema"]["properties"]
+    assert set(ORDER_FIELDS + ("items",)) == set(order_properties)
+    shop_properties = paths["/shop/{id}"]["get"]["responses"]["200"]["content"][
+        "application/json"
+    ]["schema"]["properties"]
+    assert set(SHOP_FIELDS) == set(shop_properties)
+
+
+@mock_aws
+def test_get_orders_data_with_fields():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+
+    orders_data = fake_table.get_orders_data(["1111", "2222"], fields=["amount"])
+    # Only the key and the requested attributes are read
+    assert orders_data["1111"].keys() == {"orderId", "amount"}
+    assert orders_data["2222"].keys() == {"orderId", "amount"}
+
+    order_data = fake_table.get_order_data("1111", fields=["shopId", "status"])
+    assert order_data["shopId"] == "0001"
+    assert {"orderId", "shopId", "status", "items"} <= order_data.keys()
+    assert "phoneNumber" not in order_data
+    assert all(
+        item.keys() == {"productId", "name", "price", "quantity"}
+        for item in order_data["items"]
+    )
+
+
+@mock_aws
+def test_api_list_shop_orders_with_fields():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+
+    from lambdas.list_shop_orders.main import api_list_shop_orders
+
+    api_response = api_list_shop_orders(
+        FakeLambdaEvent(
+            path_params={"id": "0001"},
+            querystring_params={"fields": "orderId,amount"},
+        ),
+        fake_table,
+    )
+    assert api_response["statusCode"] == 200
+    orders_list = json.loads(api_response["body"])["ordersList"]
+    assert len(orders_list) == 2
+    assert all(order.keys() == {"orderId", "amount"} for order in orders_list)
+
+    api_response = api_list_shop_orders(
+        FakeLambdaEvent(
+            path_params={"id": "0001"},
+            querystring_params={"fields": "orderId,creditCard"},
+        ),
+        fake_table,
+    )
+    assert api_response["statusCode"] == 400
+
+
+@mock_aws
+def test_api_get_order_with_fields():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    customer_id = fake_table.get_order_data("1111")["customerId"]
+
+    from lambdas.get_order.main import api_get_order
+
+    # The customer ID is read to authorize the customer but not returned
+    api_response = api_get_order(
+        FakeLambdaEvent(
+            path_params={"id": "1111"},
+            querystring_params={"fields": "amount"},
+            request_identity=customer_identity(customer_id),
+        ),
+        fake_table,
+    )
+    assert api_response["statusCode"] == 200
+    assert json.loads(api_response["body"]).keys() == {"amount"}
+
+    api_response = api_get_order(
+        FakeLambdaEvent(
+            path_params={"id": "1111"},
+            querystring_params={"fields": "orderId,items"},
+            request_identity=customer_identity(customer_id),
+        ),
+        fake_table,
+    )
+    assert api_response["statusCode"] == 200
+    order_data = json.loads(api_response["body"])
+    assert order_data.keys() == {"orderId", "items"}
+    assert len(order_data["items"]) > 0
@@ -1,4 +1,5 @@
 import boto3
+import json
 import os
 import uuid
 from .conftest import FakeLambdaEvent
@@ -53,3 +54,53 @@ def test_api_order_id_get_same_user():
 
     api_response = api_get_order(lambda_event_object, fake_table)
     assert api_response["statusCode"] == 200
+
+
+@mock_aws
+def test_api_order_id_get_with_items():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    order = fake_table.get_order_data("1111")
+    current_region = boto3.session.Session().region_name
+    request_identity = {
+        "cognitoIdentityPoolId": uuid.uuid4(),
+        "cognitoIdentityId": f"{current_region}:{order['customerId']}",
+        "cognitoAuthenticationType": "unauthenticated",
+        "cognitoAuthenticationProvider": None,
+    }
+
+    from lambdas.get_order.main import api_get_order
+
+    # By default the order header and its items are returned
+    lambda_event_object = FakeLambdaEvent(
+        path_params={"id": "1111"}, request_identity=request_identity
+    )
+    api_response = api_get_order(lambda_event_object, fake_table)
+    assert api_response["statusCode"] == 200
+    body = json.loads(api_response["body"])
+    assert body["orderId"] == "1111"
+    # Each test order has 1 product ordered
+    assert len(body["items"]) == 1
+    assert body["items"][0]["productId"] == "0011"
+    assert "PK" not in body["items"][0]
+
+    # The items can be skipped
+    lambda_event_object = FakeLambdaEvent(
+        path_params={"id": "1111"},
+        querystring_params={"includeItems": "false"},
+        request_identity=request_identity,
+    )
+    api_response = api_get_order(lambda_event_object, fake_table)
+    assert api_response["statusCode"] == 200
+    body = json.loads(api_response["body"])
+    assert body["orderId"] == "1111"
+    assert "items" not in body
+
+
+@mock_aws
+def test_get_order_data_non_existing():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    assert fake_table.get_order_data("9999") == {}
@@ -0,0 +1,129 @@
+import boto3
+import json
+import os
+import uuid
+from .conftest import FakeLambdaEvent
+from dynamodb_helpers import DynamodbTestOrdersData
+from moto import mock_aws
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+
+
+def visitor_identity(cognito_identity_id: str = None) -> dict:
+    current_region = boto3.session.Session().region_name
+    return {
+        "cognitoIdentityPoolId": uuid.uuid4(),
+        "cognitoIdentityId": f"{current_region}:{cognito_identity_id or uuid.uuid4()}",
+        "cognitoAuthenticationType": "unauthenticated",
+        "cognitoAuthenticationProvider": None,
+    }
+
+
+def shop_owner_identity(shop_id: str) -> tuple[str, dict]:
+    """Creates a shop owner in a Cognito User Pool, returns the pool ID and the identity"""
+    cognito_idp = boto3.client("cognito-idp", region_name="eu-west-1")
+    user_pool_id = cognito_idp.create_user_pool(
+        PoolName="TestUserPool",
+        UsernameAttributes=["email"],
+        Schema=[
+            {"Name": "role", "AttributeDataType": "String", "Mutable": True},
+            {"Name": "shopId", "AttributeDataType": "String", "Mutable": True},
+        ],
+    )["UserPool"]["Id"]
+    user = cognito_idp.admin_create_user(
+        UserPoolId=user_pool_id,
+        Username="owner@example.com",
+        UserAttributes=[
+            {"Name": "email", "Value": "owner@example.com"},
+            {"Name": "custom:role", "Value": "shop_owner"},
+            {"Name": "custom:shopId", "Value": shop_id},
+        ],
+        MessageAction="SUPPRESS",
+    )["User"]
+    sub = next(a["Value"] for a in user["Attributes"] if a["Name"] == "sub")
+    return user_pool_id, {
+        "cognitoIdentityPoolId": uuid.uuid4(),
+        "cognitoIdentityId": f"eu-west-1:{uuid.uuid4()}",
+        "cognitoAuthenticationType": "authenticated",
+        "cognitoAuthenticationProvider": f"cognito-idp.eu-west-1.amazonaws.com/{user_pool_id},cognito-idp.eu-west-1.amazonaws.com/{user_pool_id}:CognitoSignIn:{sub}",
+    }
+
+
+@mock_aws
+def test_api_get_orders_of_customer():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    order = fake_table.get_order_data("1111", include_items=False)
+    lambda_event_object = FakeLambdaEvent(
+        querystring_params={"ids": "1111,2222,1111,9999"},
+        request_identity=visitor_identity(order["customerId"]),
+    )
+
+    from lambdas.get_orders.main import api_get_orders
+
+    api_response = api_get_orders(lambda_event_object, fake_table)
+    assert api_response["statusCode"] == 200
+    body = json.loads(api_response["body"])
+    customer_orders = {
+        order_id
+        for order_id in ["1111", "2222"]
+        if fake_table.get_order_data(order_id, include_items=False)["customerId"]
+        == order["customerId"]
+    }
+    assert {o["orderId"] for o in body["ordersList"]} == customer_orders
+    # The orders of other customers are reported like the missing ones
+    assert set(body["notFound"]) == {"1111", "2222", "9999"} - customer_orders
+
+
+@mock_aws
+def test_api_get_orders_of_shop_owner(monkeypatch):
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    user_pool_id, identity = shop_owner_identity("0001")
+
+    from lambdas.get_orders import main
+
+    monkeypatch.setattr(main, "COGNITO_USER_POOL_ID", user_pool_id)
+    lambda_event_object = FakeLambdaEvent(
+        querystring_params={"ids": "1111,2222,3333"}, request_identity=identity
+    )
+    body = json.loads(main.api_get_orders(lambda_event_object, fake_table)["body"])
+    # The orders 1111 and 3333 are orders of the shop 0001
+    assert [o["orderId"] for o in body["ordersList"]] == ["1111", "3333"]
+    assert body["notFound"] == ["2222"]
+
+
+@mock_aws
+def test_api_get_shops(monkeypatch):
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    user_pool_id, identity = shop_owner_identity("0001")
+
+    from lambdas.get_shops import main
+
+    monkeypatch.setattr(main, "COGNITO_USER_POOL_ID", user_pool_id)
+    lambda_event_object = FakeLambdaEvent(
+        querystring_params={"ids": "0001,0002"}, request_identity=identity
+    )
+    body = json.loads(main.api_get_shops(lambda_event_object, fake_table)["body"])
+    assert [shop["shopId"] for shop in body["shopsList"]] == ["0001"]
+    assert body["notFound"] == ["0002"]
+
+    lambda_event_object = FakeLambdaEvent(request_identity=identity)
+    assert main.api_get_shops(lambda_event_object, fake_table)["statusCode"] == 400
+
+
+@mock_aws
+def test_get_shops_and_orders_by_ids():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    shops = fake_table.get_shops_by_ids(["0001", "0002", "0003", "0001"])
+    assert shops["0001"] == fake_table.get_shop_by_id("0001")
+    assert set(shops) == {"0001", "0002"}
+    orders = fake_table.get_orders_data(["1111", "4444", "5555"])
+    assert orders["1111"] == fake_table.get_order_data("1111", include_items=False)
+    assert set(orders) == {"1111", "4444"}
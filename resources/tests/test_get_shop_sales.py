@@ -2,6 +2,7 @@ import boto3
 import os
 import json
 from .conftest import FakeLambdaEvent
+from boto3.dynamodb.conditions import Key
 from dynamodb_helpers import DynamodbTestOrdersData
 from moto import mock_aws
 
@@ -24,3 +25,115 @@ def test_api_order_id_get():
     body = json.loads(api_response["body"])
     # There are 2 orders per shop in the test data. The orders for the first shops have an amount of 110 and 120
     assert body["totalAmount"] == 350
+
+
+@mock_aws
+def test_api_get_shop_sales_date_range():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    # Only the order 1111 of the first shop (amount 110) was placed since its own date
+    order = fake_table.get_order_data("1111")
+    lambda_event_object = FakeLambdaEvent(
+        path_params={"id": "0001"},
+        querystring_params={"from": order["date"]},
+    )
+
+    from lambdas.get_shop_sales.main import api_get_shop_total_sales
+
+    api_response = api_get_shop_total_sales(lambda_event_object, fake_table)
+    assert api_response["statusCode"] == 200
+    body = json.loads(api_response["body"])
+    assert body["totalAmount"] == 110
+
+
+@mock_aws
+def test_get_sales_by_shop_id_from_rollups():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    # All time sales are read from the monthly rollups
+    sales = fake_table.get_sales_by_shop_id("0001")
+    assert sales == {"totalAmount": 350, "ordersCount": 2}
+    # The order 1111 (amount 110) is the only one placed on its day
+    order_day = fake_table.get_order_data("1111")["date"][: len("YYYY-MM-DD")]
+    sales = fake_table.get_sales_by_shop_id("0001", order_day, order_day)
+    assert sales == {"totalAmount": 110, "ordersCount": 1}
+    # Ranges spanning full months combine day and month rollups
+    sales = fake_table.get_sales_by_shop_id("0001", "2000-01-15", "2999-12-31")
+    assert sales == {"totalAmount": 350, "ordersCount": 2}
+    sales = fake_table.get_sales_by_shop_id("0001", "2000-01-01", "2000-03-15")
+    assert sales == {"totalAmount": 0, "ordersCount": 0}
+
+
+@mock_aws
+def test_api_get_shop_sales_day_range_with_new_order():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    order_id = fake_table.put_new_order(
+        shop_id="0001",
+        customer_key="v#1234",
+        phone_number="0771112233",
+        customer_name="John Doe",
+        items=[{"productId": "0011", "quantity": 2}],
+    )
+    order_day = fake_table.get_order_data(order_id)["date"][: len("YYYY-MM-DD")]
+    lambda_event_object = FakeLambdaEvent(
+        path_params={"id": "0001"},
+        querystring_params={"from": order_day, "to": order_day},
+    )
+
+    from lambdas.get_shop_sales.main import api_get_shop_total_sales
+
+    api_response = api_get_shop_total_sales(lambda_event_object, fake_table)
+    assert api_response["statusCode"] == 200
+    body = json.loads(api_response["body"])
+    # The new order is 2 times the product 0011 which costs 110
+    assert body["totalAmount"] == 220
+
+
+@mock_aws
+def test_rebuild_sales_rollups():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    sales_before = fake_table.get_sales_by_shop_id("0001")
+
+    from lambdas.migrations.rebuild_sales_rollups.index import rebuild_sales_rollups
+
+    # Running the migration twice does not count the orders twice
+    assert rebuild_sales_rollups(fake_table) > 0
+    rebuild_sales_rollups(fake_table)
+    assert fake_table.get_sales_by_shop_id("0001") == sales_before
+
+
+@mock_aws
+def test_rebuild_sales_rollups_of_a_sharded_shop():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+
+    from lambdas.migrations.reshard_shop.index import reshard_shop
+    from lambdas.migrations.rebuild_sales_rollups.index import rebuild_sales_rollups
+
+    # The 2 orders of the test data and 6 new orders spread over 4 shards
+    reshard_shop(fake_table, "0001", 4)
+    for _ in range(6):
+        fake_table.put_new_order(
+            shop_id="0001",
+            customer_key="v#1234",
+            phone_number="0771112233",
+            customer_name="John Doe",
+            items=[{"productId": "0011", "quantity": 1}],
+        )
+    sales_before = fake_table.get_sales_by_shop_id("0001")
+    assert sales_before == {"totalAmount": 350 + 6 * 110, "ordersCount": 8}
+
+    # The rollups are rebuilt from the orders, e.g. after failed rollup updates
+    for rollup in fake_table.iter_query(
+        KeyConditionExpression=Key("PK").eq("s#0001") & Key("SK").begins_with("sales#")
+    ):
+        fake_table.table.delete_item(Key={"PK": rollup["PK"], "SK": rollup["SK"]})
+    rebuild_sales_rollups(fake_table)
+    assert fake_table.get_sales_by_shop_id("0001") == sales_before
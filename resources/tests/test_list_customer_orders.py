@@ -0,0 +1,93 @@
+import boto3
+import json
+import os
+import uuid
+from .conftest import FakeLambdaEvent
+from dynamodb_helpers import DynamodbTestOrdersData
+from moto import mock_aws
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+
+
+def visitor_request_identity(identity_id):
+    current_region = boto3.session.Session().region_name
+    return {
+        "cognitoIdentityPoolId": uuid.uuid4(),
+        "cognitoIdentityId": f"{current_region}:{identity_id}",
+        "cognitoAuthenticationType": "unauthenticated",
+        "cognitoAuthenticationProvider": None,
+    }
+
+
+@mock_aws
+def test_list_customer_orders_paginated():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    # The first customer placed the orders 1111 and 2222
+    customer_id = fake_table.get_order_data("1111")["customerId"]
+
+    from lambdas.list_customer_orders.main import api_list_customer_orders
+
+    lambda_event_object = FakeLambdaEvent(
+        querystring_params={"limit": "1"},
+        request_identity=visitor_request_identity(customer_id),
+    )
+    api_response = api_list_customer_orders(lambda_event_object, fake_table)
+    assert api_response["statusCode"] == 200
+    first_page = json.loads(api_response["body"])
+    assert len(first_page["ordersList"]) == 1
+    assert first_page["nextCursor"] is not None
+
+    lambda_event_object = FakeLambdaEvent(
+        querystring_params={"limit": "1", "cursor": first_page["nextCursor"]},
+        request_identity=visitor_request_identity(customer_id),
+    )
+    api_response = api_list_customer_orders(lambda_event_object, fake_table)
+    assert api_response["statusCode"] == 200
+    second_page = json.loads(api_response["body"])
+    assert len(second_page["ordersList"]) == 1
+
+    # Orders are returned newest first: order 1111 was placed 1 day ago, 2222 2 days ago
+    orders = first_page["ordersList"] + second_page["ordersList"]
+    assert [order["orderId"] for order in orders] == ["1111", "2222"]
+    assert all(order["customerId"] == customer_id for order in orders)
+
+
+@mock_aws
+def test_list_customer_orders_date_range():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    order = fake_table.get_order_data("2222")
+
+    from lambdas.list_customer_orders.main import api_list_customer_orders
+
+    lambda_event_object = FakeLambdaEvent(
+        querystring_params={"to": order["date"]},
+        request_identity=visitor_request_identity(order["customerId"]),
+    )
+    api_response = api_list_customer_orders(lambda_event_object, fake_table)
+    assert api_response["statusCode"] == 200
+    body = json.loads(api_response["body"])
+    assert [order["orderId"] for order in body["ordersList"]] == ["2222"]
+    assert body["nextCursor"] is None
+
+
+@mock_aws
+def test_list_customer_orders_foreign_cursor():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    customer_id = fake_table.get_order_data("1111")["customerId"]
+    _, cursor = fake_table.list_orders_by_customer(f"v#{customer_id}", limit=1)
+
+    from lambdas.list_customer_orders.main import api_list_customer_orders
+
+    # Another visitor cannot reuse the cursor of the first customer
+    lambda_event_object = FakeLambdaEvent(
+        querystring_params={"cursor": cursor},
+        request_identity=visitor_request_identity(uuid.uuid4()),
+    )
+    api_response = api_list_customer_orders(lambda_event_object, fake_table)
+    assert api_response["statusCode"] == 400
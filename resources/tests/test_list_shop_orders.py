@@ -3,6 +3,7 @@ import json
 import os
 from .conftest import FakeLambdaEvent
 from dynamodb_helpers import DynamodbTestOrdersData
+from boto3.dynamodb.conditions import Key
 from moto import mock_aws
 
 TABLE_NAME = os.environ.get("TABLE_NAME")
@@ -24,3 +25,156 @@ def test_api_order_id_get():
     body = json.loads(api_response["body"])
     # There are 2 orders per shop in the test data
     assert len(body["ordersList"]) == 2
+
+
+@mock_aws
+def test_api_list_shop_orders_date_range():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    # The orders of the first shop were placed 1 day (1111) and 3 days (3333) ago
+    order = fake_table.get_order_data("1111")
+    order_day = order["date"][: len("YYYY-MM-DD")]
+    lambda_event_object = FakeLambdaEvent(
+        path_params={"id": "0001"},
+        querystring_params={"from": order_day, "to": order_day},
+    )
+
+    from lambdas.list_shop_orders.main import api_list_shop_orders
+
+    api_response = api_list_shop_orders(lambda_event_object, fake_table)
+    assert api_response["statusCode"] == 200
+    body = json.loads(api_response["body"])
+    assert [order["orderId"] for order in body["ordersList"]] == ["1111"]
+
+
+@mock_aws
+def test_api_list_shop_orders_invalid_date():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    lambda_event_object = FakeLambdaEvent(
+        path_params={"id": "0001"},
+        querystring_params={"from": "yesterday"},
+    )
+
+    from lambdas.list_shop_orders.main import api_list_shop_orders
+
+    api_response = api_list_shop_orders(lambda_event_object, fake_table)
+    assert api_response["statusCode"] == 400
+
+
+@mock_aws
+def test_normalize_order_timestamps():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    # Simulate an order written with the former isoformat() timestamps
+    legacy_timestamp = "2024-01-31T13:45:00.123456+00:00"
+    fake_table.table.update_item(
+        Key={"PK": "o#1111", "SK": "o#1111"},
+        UpdateExpression="SET #gsi1sk = :ts, #gsi2sk = :ts, #date = :ts",
+        ExpressionAttributeNames={
+            "#gsi1sk": "GSI1-SK",
+            "#gsi2sk": "GSI2-SK",
+            "#date": "date",
+        },
+        ExpressionAttributeValues={":ts": legacy_timestamp},
+    )
+
+    from lambdas.migrations.normalize_order_timestamps.index import (
+        normalize_order_timestamps,
+    )
+
+    assert normalize_order_timestamps(fake_table) == 1
+    order = fake_table.table.get_item(Key={"PK": "o#1111", "SK": "o#1111"})["Item"]
+    assert order["GSI1-SK"] == order["GSI2-SK"] == order["date"]
+    assert order["date"] == "2024-01-31T13:45:00Z"
+    # Running the migration again does not change anything
+    assert normalize_order_timestamps(fake_table) == 0
+
+
+@mock_aws
+def test_list_shop_orders_unsharded_shop_reads_one_partition():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    gsi1_queries = []
+    table = fake_table.table
+
+    class QueryRecordingTable:
+        def __getattr__(self, name):
+            return getattr(table, name)
+
+        def query(self, **kwargs):
+            if kwargs.get("IndexName") == "GSI1":
+                gsi1_queries.append(kwargs)
+            return table.query(**kwargs)
+
+    fake_table.table = QueryRecordingTable()
+    assert len(fake_table.list_orders_by_shop_id("0001")) == 2
+    assert len(gsi1_queries) == 1
+
+    # Once sharded, only the shards are read
+    fake_table.table = table
+    from lambdas.migrations.reshard_shop.index import reshard_shop
+
+    reshard_shop(fake_table, "0001", 4)
+    fake_table.table = QueryRecordingTable()
+    gsi1_queries.clear()
+    assert len(fake_table.list_orders_by_shop_id("0001")) == 2
+    assert len(gsi1_queries) == 4
+
+
+@mock_aws
+def test_list_shop_orders_sharded_shop():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+
+    from lambdas.migrations.reshard_shop.index import reshard_shop
+
+    # Shard the shop 0001, its 2 existing orders are spread over the shards
+    reshard_shop(fake_table, "0001", 4)
+    shop = fake_table.get_shop_record("0001")
+    assert shop.extra == {"gsi1Shards": 4}
+    # The sharding attributes are internal
+    assert "gsi1Shards" not in fake_table.get_shop_by_id("0001")
+    for _ in range(6):
+        fake_table.put_new_order(
+            shop_id="0001",
+            customer_key="v#1234",
+            phone_number="0771112233",
+            customer_name="John Doe",
+            items=[{"productId": "0011", "quantity": 1}],
+        )
+    lambda_event_object = FakeLambdaEvent(path_params={"id": "0001"})
+
+    from lambdas.list_shop_orders.main import api_list_shop_orders
+
+    api_response = api_list_shop_orders(lambda_event_object, fake_table)
+    body = json.loads(api_response["body"])
+    orders = body["ordersList"]
+    assert len(orders) == 8
+    assert all(order["shopId"] == "0001" for order in orders)
+    # The orders of all the shards are merged by date
+    assert [order["date"] for order in orders] == sorted(
+        order["date"] for order in orders
+    )
+    # 2 orders of 110 and 240 in the test data and 6 new orders of 110
+    assert fake_table.get_total_amount_by_shop_id("0001") == 350 + 6 * 110
+
+    from lambdas.get_service_stats.main import api_compute_statistics
+
+    stats = json.loads(api_compute_statistics(lambda_event_object, fake_table)["body"])
+    assert stats["totalNumberOfShops"] == 2
+
+    # Moving the orders back to a single partition
+    reshard_shop(fake_table, "0001", 1)
+    api_response = api_list_shop_orders(lambda_event_object, fake_table)
+    assert len(json.loads(api_response["body"])["ordersList"]) == 8
+    orders = fake_table.table.query(
+        IndexName="GSI1",
+        KeyConditionExpression=Key("GSI1-PK").eq("s#0001"),
+    )["Items"]
+    assert len(orders) == 8
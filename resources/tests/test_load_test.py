@@ -0,0 +1,55 @@
+import boto3
+import os
+import random
+from dynamodb_helpers import DynamodbTestOrdersData
+from moto import mock_aws
+from tools.load_test import (
+    LatencyHistogram,
+    LoadTest,
+    RequestData,
+    load_handlers,
+    parse_mix,
+)
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+
+
+def test_latency_histogram_precision():
+    generator = random.Random(1)
+    values = sorted(generator.randint(0, 10_000_000) for _ in range(10000))
+    histogram = LatencyHistogram(significant_digits=2)
+    for value in values:
+        histogram.record(value)
+    for percent in (50, 95, 99):
+        exact = values[int(len(values) * percent / 100) - 1]
+        assert abs(histogram.percentile(percent) - exact) <= exact / 100
+    assert histogram.percentile(100) == values[-1]
+
+    merged = LatencyHistogram()
+    merged.merge(histogram)
+    merged.record(5)
+    assert merged.total_count == 10001
+    assert merged.min == min(5, values[0])
+
+
+@mock_aws
+def test_load_test_replays_the_request_mix():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    weights = parse_mix("list_products=80,get_order=15,place_order=5")
+
+    load_test = LoadTest(
+        load_handlers(list(weights)),
+        RequestData(fake_table),
+        weights,
+        threads=4,
+        rate=500,
+    )
+    report = load_test.run(requests=40)
+    assert report["mode"] == "open-loop"
+    assert report["requests"] == 40
+    assert report["errors"] == 0
+    assert report["latency"]["count"] == 40
+    assert sum(data["count"] for data in report["operations"].values()) == 40
+    assert report["operations"]["list_products"]["statuses"]["200"] > 0
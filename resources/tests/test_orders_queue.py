@@ -0,0 +1,202 @@
+import boto3
+import json
+import os
+import uuid
+from .conftest import FakeLambdaEvent
+from dynamodb_helpers import DynamodbTestOrdersData
+from queue_helpers import LocalQueue, SqsQueue
+from moto import mock_aws
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+
+
+def queue_order(fake_table, orders_queue, product_id="0011", cognito_identity_id=None):
+    current_region = boto3.session.Session().region_name
+    lambda_event_object = FakeLambdaEvent(
+        request_identity={
+            "cognitoIdentityPoolId": uuid.uuid4(),
+            "cognitoIdentityId": f"{current_region}:{cognito_identity_id or uuid.uuid4()}",
+            "cognitoAuthenticationType": "unauthenticated",
+            "cognitoAuthenticationProvider": None,
+        },
+        body={
+            "shopId": "0001",
+            "phoneNumber": "0771112233",
+            "name": "John Doe",
+            "items": [{"productId": product_id, "quantity": 2}],
+        },
+        querystring_params={
+            "shopToken": fake_table.get_shop_by_id("0001")["shopToken"]
+        },
+    )
+
+    from lambdas.place_order.main import api_place_order
+
+    return api_place_order(lambda_event_object, fake_table, orders_queue=orders_queue)
+
+
+def consumer(fake_table):
+    from lambdas.process_orders_queue.main import process_queued_orders
+
+    return lambda event: process_queued_orders(event, fake_table)
+
+
+@mock_aws
+def test_queued_order_is_placed():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    sales_before = fake_table.get_sales_by_shop_id("0001")
+    orders_queue = LocalQueue()
+    customer_id = str(uuid.uuid4())
+
+    api_response = queue_order(
+        fake_table, orders_queue, cognito_identity_id=customer_id
+    )
+    assert api_response["statusCode"] == 202
+    order_id = json.loads(api_response["body"])["orderId"]
+    assert fake_table.get_order_status(order_id)["status"] == "QUEUED"
+    # The order is not visible until it is placed
+    assert fake_table.get_order_data(order_id) == {}
+
+    assert orders_queue.deliver(consumer(fake_table)) == 1
+    order_status = fake_table.get_order_status(order_id)
+    assert order_status["status"] == "COMMITTED"
+    assert order_status["customerId"] == customer_id
+    assert fake_table.get_order_data(order_id)["amount"] == 220
+    assert (
+        fake_table.get_sales_by_shop_id("0001")["totalAmount"]
+        == sales_before["totalAmount"] + 220
+    )
+
+    # A message delivered twice does not place the order twice
+    orders_queue.send_messages(
+        [
+            {
+                "orderId": order_id,
+                "shopId": "0001",
+                "phoneNumber": "1",
+                "name": "x",
+                "items": [],
+            }
+        ]
+    )
+    orders_queue.deliver(consumer(fake_table))
+    assert (
+        fake_table.get_sales_by_shop_id("0001")["totalAmount"]
+        == sales_before["totalAmount"] + 220
+    )
+
+    from lambdas.get_order_status.main import api_get_order_status
+
+    current_region = boto3.session.Session().region_name
+    lambda_event_object = FakeLambdaEvent(
+        path_params={"id": order_id},
+        request_identity={
+            "cognitoIdentityPoolId": uuid.uuid4(),
+            "cognitoIdentityId": f"{current_region}:{customer_id}",
+            "cognitoAuthenticationType": "unauthenticated",
+            "cognitoAuthenticationProvider": None,
+        },
+    )
+    api_response = api_get_order_status(lambda_event_object, fake_table)
+    assert api_response["statusCode"] == 200
+    assert json.loads(api_response["body"])["status"] == "COMMITTED"
+
+
+@mock_aws
+def test_concurrent_deliveries_place_the_order_once(monkeypatch):
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    sales_before = fake_table.get_sales_by_shop_id("0001")
+    orders_queue = LocalQueue()
+
+    api_response = queue_order(fake_table, orders_queue)
+    order_id = json.loads(api_response["body"])["orderId"]
+    event = {
+        "Records": [
+            {"messageId": "1", "body": json.dumps(orders_queue.messages[0]["body"])}
+        ]
+    }
+    # Both deliveries read the order request before any of them placed the order
+    order_requests = fake_table.get_order_requests([order_id])
+    monkeypatch.setattr(fake_table, "get_order_requests", lambda _: order_requests)
+    process_queued_orders = consumer(fake_table)
+    assert process_queued_orders(event) == {"batchItemFailures": []}
+    assert process_queued_orders(event) == {"batchItemFailures": []}
+
+    assert fake_table.get_order_data(order_id)["amount"] == 220
+    sales_after = fake_table.get_sales_by_shop_id("0001")
+    assert sales_after["totalAmount"] == sales_before["totalAmount"] + 220
+    assert sales_after["ordersCount"] == sales_before["ordersCount"] + 1
+
+
+@mock_aws
+def test_invalid_queued_order_fails():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    orders_queue = LocalQueue()
+
+    api_response = queue_order(fake_table, orders_queue, product_id="0099")
+    order_id = json.loads(api_response["body"])["orderId"]
+    orders_queue.deliver(consumer(fake_table))
+    order_status = fake_table.get_order_status(order_id)
+    assert order_status["status"] == "FAILED"
+    assert "0099" in order_status["error"]
+    # The order is not retried
+    assert orders_queue.dead_letters == []
+
+
+@mock_aws
+def test_invalid_queued_order_message_is_dead_lettered():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    orders_queue = LocalQueue(max_receive_count=2)
+
+    order_ids = [
+        json.loads(queue_order(fake_table, orders_queue)["body"])["orderId"]
+        for _ in range(2)
+    ]
+    del orders_queue.messages[1]["body"]["shopId"]
+    orders_queue.deliver(consumer(fake_table))
+    # Only the invalid message fails, the rest of the batch is placed
+    assert fake_table.get_order_status(order_ids[0])["status"] == "COMMITTED"
+    assert [m["body"]["orderId"] for m in orders_queue.dead_letters] == [order_ids[1]]
+    assert fake_table.get_order_status(order_ids[1])["status"] == "QUEUED"
+
+
+@mock_aws
+def test_queued_order_is_dead_lettered(monkeypatch):
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    orders_queue = LocalQueue(max_receive_count=3)
+
+    api_response = queue_order(fake_table, orders_queue)
+    order_id = json.loads(api_response["body"])["orderId"]
+
+    def throttled(*args, **kwargs):
+        raise RuntimeError("Throttled")
+
+    monkeypatch.setattr(fake_table, "put_queued_orders", throttled)
+    assert orders_queue.deliver(consumer(fake_table)) == 3
+    assert [m["body"]["orderId"] for m in orders_queue.dead_letters] == [order_id]
+    assert fake_table.get_order_status(order_id)["status"] == "QUEUED"
+
+
+@mock_aws
+def test_sqs_queue():
+    sqs = boto3.client("sqs", region_name="eu-west-1")
+    queue_url = sqs.create_queue(QueueName="orders")["QueueUrl"]
+    orders_queue = SqsQueue(queue_url, sqs_client=sqs)
+    assert orders_queue.send_messages([{"orderId": str(i)} for i in range(12)]) == []
+    received = []
+    while True:
+        messages = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10)
+        if not messages.get("Messages"):
+            break
+        received.extend(json.loads(m["Body"])["orderId"] for m in messages["Messages"])
+    assert sorted(received, key=int) == [str(i) for i in range(12)]
@@ -113,3 +113,196 @@ def test_api_place_order_happy_path():
 
     api_response = api_place_order(lambda_event_object, fake_table)
     assert api_response["statusCode"] == 200
+
+
+@mock_aws
+def test_api_place_order_unknown_shop():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    current_region = boto3.session.Session().region_name
+    lambda_event_object = FakeLambdaEvent(
+        request_identity={
+            "cognitoIdentityPoolId": uuid.uuid4(),
+            "cognitoIdentityId": f"{current_region}:{uuid.uuid4()}",
+            "cognitoAuthenticationType": "unauthenticated",
+            "cognitoAuthenticationProvider": None,
+        },
+        body={
+            "shopId": "9999",
+            "phoneNumber": "0771112233",
+            "name": "John Doe",
+            "items": [{"productId": "9991", "quantity": 1}],
+        },
+        querystring_params={"shopToken": "ABC123"},
+    )
+
+    from lambdas.place_order.main import api_place_order
+
+    api_response = api_place_order(lambda_event_object, fake_table)
+    assert api_response["statusCode"] == 404
+
+
+@mock_aws
+def test_api_place_order_invalid_items():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    current_region = boto3.session.Session().region_name
+
+    from lambdas.place_order.main import api_place_order
+
+    for items in [[1], "0011", [{"productId": "0011", "quantity": 1}, None]]:
+        lambda_event_object = FakeLambdaEvent(
+            request_identity={
+                "cognitoIdentityPoolId": uuid.uuid4(),
+                "cognitoIdentityId": f"{current_region}:{uuid.uuid4()}",
+                "cognitoAuthenticationType": "unauthenticated",
+                "cognitoAuthenticationProvider": None,
+            },
+            body={
+                "shopId": "0001",
+                "phoneNumber": "0771112233",
+                "name": "John Doe",
+                "items": items,
+            },
+            querystring_params={
+                "shopToken": fake_table.get_shop_by_id("0001")["shopToken"]
+            },
+        )
+        api_response = api_place_order(lambda_event_object, fake_table)
+        assert api_response["statusCode"] == 400
+
+
+@mock_aws
+def test_get_products_data_by_keys():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    products_data = fake_table.get_products_data_by_keys(
+        "s#0001", ["p#0011", "p#0012", "p#0011", "p#9999"]
+    )
+    # Duplicated keys are read once and unknown products are missing
+    assert sorted(products_data) == ["p#0011", "p#0012"]
+    assert products_data["p#0011"] == fake_table.get_product_data_by_key(
+        "s#0001", "p#0011"
+    )
+
+
+def place_order_with_idempotency_key(
+    fake_table, idempotency_key, cognito_identity_id, quantity=1
+):
+    current_region = boto3.session.Session().region_name
+    lambda_event_object = FakeLambdaEvent(
+        request_identity={
+            "cognitoIdentityPoolId": uuid.uuid4(),
+            "cognitoIdentityId": f"{current_region}:{cognito_identity_id}",
+            "cognitoAuthenticationType": "unauthenticated",
+            "cognitoAuthenticationProvider": None,
+        },
+        body={
+            "shopId": "0001",
+            "phoneNumber": "0771112233",
+            "name": "John Doe",
+            "items": [{"productId": "0011", "quantity": quantity}],
+        },
+        querystring_params={
+            "shopToken": fake_table.get_shop_by_id("0001")["shopToken"]
+        },
+        headers={"idempotency-key": idempotency_key},
+    )
+
+    from lambdas.place_order.main import api_place_order
+
+    return api_place_order(lambda_event_object, fake_table)
+
+
+@mock_aws
+def test_api_place_order_idempotency_key():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    customer_id = str(uuid.uuid4())
+
+    first_response = place_order_with_idempotency_key(fake_table, "key-1", customer_id)
+    assert first_response["statusCode"] == 200
+    total_amount = fake_table.get_total_amount_by_shop_id("0001")
+
+    # The retry gets the same order without placing it again
+    retry_response = place_order_with_idempotency_key(fake_table, "key-1", customer_id)
+    assert retry_response["statusCode"] == 200
+    assert retry_response["body"] == first_response["body"]
+    assert retry_response["headers"]["Idempotent-Replayed"] == "true"
+    assert fake_table.get_total_amount_by_shop_id("0001") == total_amount
+
+    # The same key for another request is rejected
+    other_response = place_order_with_idempotency_key(
+        fake_table, "key-1", customer_id, quantity=2
+    )
+    assert other_response["statusCode"] == 422
+
+    # The keys of another caller are independent
+    another_caller_response = place_order_with_idempotency_key(
+        fake_table, "key-1", str(uuid.uuid4())
+    )
+    assert another_caller_response["statusCode"] == 200
+    assert another_caller_response["body"] != first_response["body"]
+
+
+@mock_aws
+def test_api_place_order_idempotency_key_in_progress():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    customer_id = str(uuid.uuid4())
+    # Another request with the same key is being processed
+    assert fake_table.start_idempotent_request(f"{customer_id}#key-1", "hash") is None
+
+    api_response = place_order_with_idempotency_key(fake_table, "key-1", customer_id)
+    assert api_response["statusCode"] == 409
+
+    # The key can be used again once the other request is released
+    fake_table.release_idempotent_request(f"{customer_id}#key-1")
+    api_response = place_order_with_idempotency_key(fake_table, "key-1", customer_id)
+    assert api_response["statusCode"] == 200
+
+
+@mock_aws
+def test_api_place_order_idempotency_key_not_completed(monkeypatch):
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    customer_id = str(uuid.uuid4())
+    total_amount = fake_table.get_total_amount_by_shop_id("0001")
+
+    def fail_to_complete(*args, **kwargs):
+        raise RuntimeError("Throttled")
+
+    # The order is placed but its response is not stored
+    with monkeypatch.context() as patch:
+        patch.setattr(fake_table, "complete_idempotent_request", fail_to_complete)
+        first_response = place_order_with_idempotency_key(
+            fake_table, "key-1", customer_id
+        )
+    assert first_response["statusCode"] == 200
+    assert fake_table.get_total_amount_by_shop_id("0001") == total_amount + 110
+
+    # The retry waits for the lock of the first attempt to expire
+    retry_response = place_order_with_idempotency_key(fake_table, "key-1", customer_id)
+    assert retry_response["statusCode"] == 409
+    fake_table.table.update_item(
+        Key={"PK": f"idem#{customer_id}#key-1", "SK": f"idem#{customer_id}#key-1"},
+        UpdateExpression="SET lockExpiresAt = :expired",
+        ExpressionAttributeValues={":expired": 0},
+    )
+
+    # It then gets the same order, which is not placed again
+    retry_response = place_order_with_idempotency_key(fake_table, "key-1", customer_id)
+    assert retry_response["statusCode"] == 200
+    assert retry_response["body"] == first_response["body"]
+    assert fake_table.get_total_amount_by_shop_id("0001") == total_amount + 110
+    replayed_response = place_order_with_idempotency_key(
+        fake_table, "key-1", customer_id
+    )
+    assert replayed_response["body"] == first_response["body"]
+    assert replayed_response["headers"]["Idempotent-Replayed"] == "true"
@@ -0,0 +1,197 @@
+import boto3
+import os
+import json
+import uuid
+from boto3.dynamodb.conditions import Key
+from .conftest import FakeLambdaEvent
+from dynamodb_helpers import DynamodbTestOrdersData
+from moto import mock_aws
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+
+
+def visitor_identity() -> dict:
+    current_region = boto3.session.Session().region_name
+    return {
+        "cognitoIdentityPoolId": uuid.uuid4(),
+        "cognitoIdentityId": f"{current_region}:{uuid.uuid4()}",
+        "cognitoAuthenticationType": "unauthenticated",
+        "cognitoAuthenticationProvider": None,
+    }
+
+
+def new_order(*items) -> dict:
+    return {
+        "phoneNumber": "0771112233",
+        "name": "John Doe",
+        "items": [
+            {"productId": product_id, "quantity": quantity}
+            for product_id, quantity in items
+        ],
+    }
+
+
+@mock_aws
+def test_api_place_orders_batch():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    shop_token = fake_table.get_shop_by_id("0001")["shopToken"]
+    sales_before = fake_table.get_sales_by_shop_id("0001")
+    lambda_event_object = FakeLambdaEvent(
+        request_identity=visitor_identity(),
+        querystring_params={"shopToken": shop_token},
+        body={
+            "shopId": "0001",
+            "orders": [
+                new_order(("0011", 1), ("0012", 2)),
+                new_order(("0099", 1)),
+                new_order(),
+                new_order(("0011", 3)),
+            ],
+        },
+    )
+
+    from lambdas.place_orders_batch.main import api_place_orders_batch
+
+    api_response = api_place_orders_batch(lambda_event_object, fake_table)
+    assert api_response["statusCode"] == 200
+    body = json.loads(api_response["body"])
+    assert body["succeeded"] == 2
+    assert body["failed"] == 2
+    results = body["results"]
+    assert [result["index"] for result in results] == [0, 1, 2, 3]
+    assert "Unknown product 0099" in results[1]["error"]
+    assert "items" in results[2]["error"]
+    first_order = fake_table.get_order_data(results[0]["orderId"])
+    assert first_order["amount"] == 110 + 2 * 120
+    assert len(first_order["items"]) == 2
+    assert fake_table.get_order_data(results[3]["orderId"])["amount"] == 330
+    # Both orders are added to the sales rollups
+    sales_after = fake_table.get_sales_by_shop_id("0001")
+    assert sales_after["totalAmount"] - sales_before["totalAmount"] == 350 + 330
+    assert sales_after["ordersCount"] - sales_before["ordersCount"] == 2
+
+
+@mock_aws
+def test_api_place_orders_batch_cannot_overwrite_orders():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    shop_token = fake_table.get_shop_by_id("0001")["shopToken"]
+    existing_order = fake_table.table.get_item(Key={"PK": "o#1111", "SK": "o#1111"})[
+        "Item"
+    ]
+    lambda_event_object = FakeLambdaEvent(
+        request_identity=visitor_identity(),
+        querystring_params={"shopToken": shop_token},
+        body={
+            "shopId": "0001",
+            "orders": [
+                {
+                    **new_order(("0011", 1)),
+                    "orderId": "1111",
+                    "customerKey": "c#victim",
+                    "date": "garbage",
+                }
+            ],
+        },
+    )
+
+    from lambdas.place_orders_batch.main import api_place_orders_batch
+
+    api_response = api_place_orders_batch(lambda_event_object, fake_table)
+    assert api_response["statusCode"] == 200
+    order_id = json.loads(api_response["body"])["results"][0]["orderId"]
+    # The order gets a new ID, the existing order and the rollups are untouched
+    assert order_id != "1111"
+    assert (
+        fake_table.table.get_item(Key={"PK": "o#1111", "SK": "o#1111"})["Item"]
+        == existing_order
+    )
+    order_item = fake_table.table.get_item(
+        Key={"PK": f"o#{order_id}", "SK": f"o#{order_id}"}
+    )["Item"]
+    assert order_item["GSI2-PK"] != "c#victim"
+    assert order_item["date"] != "garbage"
+    assert "Item" not in fake_table.table.get_item(
+        Key={"PK": "s#0001", "SK": "sales#d#garbage"}
+    )
+
+
+@mock_aws
+def test_put_new_orders_with_unprocessed_line_items(monkeypatch):
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    sales_before = fake_table.get_sales_by_shop_id("0001")
+    batch_write_item = fake_table.table.batch_write_item
+    unprocessed_order_keys = []
+
+    def partially_processed_batch_write_item(RequestItems):
+        # DynamoDB does not process the second line item of the first order
+        requests = RequestItems[TABLE_NAME]
+        unprocessed_order_keys.append(requests[0]["PutRequest"]["Item"]["PK"])
+        batch_write_item(RequestItems={TABLE_NAME: [requests[0], *requests[2:]]})
+        return {"UnprocessedItems": {TABLE_NAME: [requests[1]]}}
+
+    monkeypatch.setattr(
+        fake_table.table, "batch_write_item", partially_processed_batch_write_item
+    )
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+    results = fake_table.put_new_orders(
+        "0001",
+        [new_order(("0011", 1), ("0012", 2)), new_order(("0011", 3))],
+        max_attempts=1,
+    )
+
+    assert results[0] == {"error": "Failed to store the order", "retryable": True}
+    assert fake_table.get_order_data(results[1]["orderId"])["amount"] == 330
+    # Neither the order item nor the written line item of the failed order are left
+    failed_order_items = fake_table.table.query(
+        KeyConditionExpression=Key("PK").eq(unprocessed_order_keys[0])
+    )["Items"]
+    assert failed_order_items == []
+    # Only the stored order is added to the sales rollups
+    sales_after = fake_table.get_sales_by_shop_id("0001")
+    assert sales_after["totalAmount"] - sales_before["totalAmount"] == 330
+    assert sales_after["ordersCount"] - sales_before["ordersCount"] == 1
+
+
+@mock_aws
+def test_api_place_orders_batch_rejected():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+
+    from lambdas.place_orders_batch.main import api_place_orders_batch, MAX_BATCH_SIZE
+
+    # Wrong token
+    lambda_event_object = FakeLambdaEvent(
+        request_identity=visitor_identity(),
+        querystring_params={"shopToken": "wrong_token"},
+        body={"shopId": "0001", "orders": [new_order(("0011", 1))]},
+    )
+    api_response = api_place_orders_batch(lambda_event_object, fake_table)
+    assert api_response["statusCode"] == 401
+    # Too many orders
+    lambda_event_object = FakeLambdaEvent(
+        request_identity=visitor_identity(),
+        querystring_params={"shopToken": "wrong_token"},
+        body={
+            "shopId": "0001",
+            "orders": [new_order(("0011", 1))] * (MAX_BATCH_SIZE + 1),
+        },
+    )
+    api_response = api_place_orders_batch(lambda_event_object, fake_table)
+    assert api_response["statusCode"] == 400
+
+
+@mock_aws
+def test_generate_unique_request_ids():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    order_ids = fake_table._generate_unique_request_ids(150)
+    assert len(set(order_ids)) == 150
+    assert not {"1111", "2222", "3333", "4444"} & set(order_ids)
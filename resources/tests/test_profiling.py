@@ -0,0 +1,58 @@
+import json
+import profiling_helpers
+from profiling_helpers import InvocationProfiler, profile_handler
+
+
+def busy_handler(event, context):
+    # Allocates about 8 MB and keeps the CPU busy
+    blocks = [bytearray(1024) for _ in range(8000)]
+    total = 0
+    for i in range(300000):
+        total += i * i
+    return {"statusCode": 200, "blocks": len(blocks)}
+
+
+def profiled_event(token: str = None) -> dict:
+    return {"headers": {"x-debug-profile": token} if token else None}
+
+
+def test_handlers_are_not_wrapped_when_profiling_is_off(monkeypatch):
+    monkeypatch.setattr(profiling_helpers, "PROFILE_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(profiling_helpers, "PROFILE_DEBUG_TOKEN", None)
+    assert profile_handler()(busy_handler) is busy_handler
+
+
+def test_debug_header_profiles_the_invocation(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling_helpers, "PROFILE_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(profiling_helpers, "PROFILE_DEBUG_TOKEN", "secret")
+    monkeypatch.setattr(profiling_helpers, "PROFILE_OUTPUT", str(tmp_path))
+    monkeypatch.setattr(profiling_helpers, "PROFILE_INTERVAL_SECONDS", 0.001)
+    handler = profile_handler(handler="busy")(busy_handler)
+
+    # Without the token or with another token, the invocations are not profiled
+    assert handler(profiled_event(), None)["statusCode"] == 200
+    assert handler(profiled_event("guess"), None)["statusCode"] == 200
+    assert list(tmp_path.iterdir()) == []
+
+    assert handler(profiled_event("secret"), None)["statusCode"] == 200
+    (profile_file,) = tmp_path.iterdir()
+    assert profile_file.name.startswith("busy-")
+    summary = json.loads(profile_file.read_text())
+    assert summary["type"] == "profile"
+    assert summary["samples"] > 0
+    assert summary["topSelfFunctions"][0]["function"].endswith("(busy_handler)")
+    assert summary["memory"]["peakBytes"] >= 8000 * 1024
+    assert summary["memory"]["topLines"][0]["line"].startswith(
+        "tests/test_profiling.py:"
+    )
+
+
+def test_profiler_samples_the_invoking_thread():
+    profiler = InvocationProfiler(interval=0.001, track_memory=False)
+    profiler.start()
+    busy_handler({}, None)
+    profiler.stop()
+    summary = profiler.summary(top=5)
+    assert "memory" not in summary
+    assert len(summary["topFunctions"]) <= 5
+    assert summary["topFunctions"][0]["total"] <= summary["samples"]
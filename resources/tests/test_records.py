@@ -0,0 +1,78 @@
+import json
+from decimal import Decimal
+from api_helpers import DecimalEncoder
+from dynamodb_helpers import Order, OrderItem, Product, Shop
+
+
+def test_records_abstract_the_table_schema():
+    shop = Shop.from_item(
+        {
+            "PK": "s#0001",
+            "SK": "s#0001",
+            "entityType": "shop",
+            "name": "Shop 1",
+            "shopToken": "token",
+            "gsi1Shards": 4,
+        }
+    )
+    assert shop.shopId == "0001"
+    # The attributes which are not fields are kept, but not returned by the API
+    assert shop.to_api() == {
+        "shopId": "0001",
+        "name": "Shop 1",
+        "shopToken": "token",
+    }
+    assert shop.extra == {"gsi1Shards": 4}
+    assert shop.gsi1_shards() == 4
+    product = Product.from_item(
+        {
+            "PK": "s#0001",
+            "SK": "p#0011",
+            "entityType": "product",
+            "name": "Product 11",
+            "price": Decimal("110"),
+        }
+    )
+    assert product == Product(
+        shopId="0001", productId="0011", name="Product 11", price=Decimal("110")
+    )
+    assert not hasattr(product, "__dict__")
+
+
+def test_order_record():
+    order = Order.from_item(
+        {
+            "PK": "o#1111",
+            "SK": "o#1111",
+            "entityType": "order",
+            "GSI1-PK": "s#0001#2",
+            "GSI1-SK": "2024-03-01T10:00:00Z",
+            "GSI2-PK": "v#1234",
+            "GSI2-SK": "2024-03-01T10:00:00Z",
+            "date": "2024-03-01T10:00:00Z",
+            "amount": Decimal("12.5"),
+        }
+    )
+    assert order.to_api() == {
+        "orderId": "1111",
+        "shopId": "0001",
+        "customerId": "1234",
+        "date": "2024-03-01T10:00:00Z",
+        "amount": Decimal("12.5"),
+    }
+    order.items = [
+        OrderItem.from_item(
+            {"PK": "o#1111", "SK": "p#0011", "entityType": "orderItem", "quantity": 2}
+        )
+    ]
+    assert order.to_api()["items"] == [{"productId": "0011", "quantity": 2}]
+    assert json.loads(json.dumps(order, cls=DecimalEncoder))["amount"] == 12.5
+
+    # Orders without customer, unless the customerId was not read
+    assert Order.from_item({"PK": "o#2222"}).to_api() == {
+        "orderId": "2222",
+        "customerId": None,
+    }
+    assert Order.from_item({"PK": "o#2222"}, fields=["amount"]).to_api() == {
+        "orderId": "2222"
+    }
@@ -0,0 +1,63 @@
+import boto3
+import os
+import json
+from api_helpers.router import Router
+from dynamodb_helpers import DynamodbTestOrdersData
+from moto import mock_aws
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+
+
+def api_gateway_event(method: str, resource: str, path_params: dict = None) -> dict:
+    return {
+        "body": None,
+        "httpMethod": method,
+        "path": resource,
+        "resource": resource,
+        "headers": None,
+        "queryStringParameters": None,
+        "pathParameters": path_params,
+        "requestContext": {"identity": {}},
+    }
+
+
+def get_router(fake_table) -> Router:
+    from lambdas.router.main import ROUTES
+
+    return Router(ROUTES, get_orders_table=lambda: fake_table, package="lambdas")
+
+
+def test_routes_are_resolvable():
+    router = get_router(None)
+    for methods in router.routes.values():
+        for target in methods.values():
+            assert callable(router._get_function(target))
+
+
+@mock_aws
+def test_router_dispatch(capsys):
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    router = get_router(fake_table)
+
+    response = router.dispatch(api_gateway_event("GET", "/shop/{id}", {"id": "0001"}))
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"])["shopId"] == "0001"
+    # The route metrics are published in the Embedded Metric Format
+    metrics = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert metrics["route"] == "GET /shop/{id}"
+    assert metrics["Invocations"] == [1.0]
+
+    response = router.dispatch(
+        api_gateway_event("GET", "/shop/{id}/sales", {"id": "0001"})
+    )
+    assert json.loads(response["body"])["totalAmount"] == 350
+
+
+def test_router_rejects_unknown_routes():
+    router = get_router(None)
+    response = router.dispatch(api_gateway_event("POST", "/shop/{id}", {"id": "0001"}))
+    assert response["statusCode"] == 400
+    response = router.dispatch(api_gateway_event("GET", "/unknown"))
+    assert response["statusCode"] == 404
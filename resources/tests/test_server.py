@@ -0,0 +1,100 @@
+import asyncio
+import boto3
+import io
+import os
+import json
+from api_helpers.router import Router
+from api_helpers.server import AsgiApp, ResourceMatcher, WsgiApp, build_lambda_event
+from dynamodb_helpers import DynamodbTestOrdersData
+from moto import mock_aws
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+
+
+def get_app(fake_table, trust_identity_headers=False) -> WsgiApp:
+    from lambdas.router.main import ROUTES
+
+    router = Router(ROUTES, get_orders_table=lambda: fake_table, package="lambdas")
+    return WsgiApp(router, trust_identity_headers=trust_identity_headers)
+
+
+def test_build_lambda_event():
+    matcher = ResourceMatcher(["/shop/{id}", "/shop/{id}/orders"])
+    event = build_lambda_event(
+        matcher,
+        "get",
+        "/shop/0001/orders",
+        "from=2024-01-01&to=",
+        {"X-Cognito-Identity-Id": "eu-west-1:1234"},
+        "",
+    )
+    assert event["resource"] == "/shop/{id}/orders"
+    assert event["httpMethod"] == "GET"
+    assert event["pathParameters"] == {"id": "0001"}
+    assert event["queryStringParameters"] == {"from": "2024-01-01", "to": ""}
+    # The identity headers are ignored unless they are trusted
+    assert "cognitoIdentityId" not in event["requestContext"]["identity"]
+    event = build_lambda_event(
+        matcher,
+        "GET",
+        "/shop/0001",
+        "",
+        {"X-Cognito-Identity-Id": "eu-west-1:1234"},
+        "",
+        True,
+    )
+    assert event["resource"] == "/shop/{id}"
+    assert event["requestContext"]["identity"]["cognitoIdentityId"] == "eu-west-1:1234"
+
+
+@mock_aws
+def test_wsgi_app():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    app = get_app(fake_table)
+    responses = []
+
+    def start_response(status, headers):
+        responses.append((status, dict(headers)))
+
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": "/shop/0001/sales",
+        "QUERY_STRING": "",
+        "wsgi.input": io.BytesIO(b""),
+    }
+    body = b"".join(app(environ, start_response))
+    assert responses[0][0] == "200 OK"
+    assert int(responses[0][1]["Content-Length"]) == len(body)
+    assert json.loads(body)["totalAmount"] == 350
+
+    environ["PATH_INFO"] = "/unknown"
+    app(environ, start_response)
+    assert responses[1][0] == "404 Not Found"
+
+
+@mock_aws
+def test_asgi_app():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    fake_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    fake_table.prefill_table_with_testdata()
+    app = AsgiApp(get_app(fake_table), workers=2)
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/shop/0001",
+        "query_string": b"",
+        "headers": [],
+    }
+    asyncio.run(app(scope, receive, send))
+    assert messages[0]["status"] == 200
+    assert json.loads(messages[1]["body"])["shopId"] == "0001"
@@ -0,0 +1,289 @@
+import boto3
+import os
+import pytest
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+from decimal import Decimal
+from dynamodb_helpers import DynamodbTestOrdersData
+from dynamodb_helpers.storage import InMemoryStorage
+from moto import mock_aws
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+
+
+# The same tests run on every storage backend
+@pytest.fixture(params=["dynamodb", "memory"])
+def storage(request):
+    if request.param == "memory":
+        yield InMemoryStorage(TABLE_NAME)
+        return
+    with mock_aws():
+        ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+        yield DynamodbTestOrdersData(TABLE_NAME, ddb).table
+
+
+def put_orders(storage) -> None:
+    """Puts 5 orders of shop 0001 and 1 of shop 0002, with their line item"""
+    with storage.batch_writer() as batch:
+        for number, shop_id in enumerate(["0001"] * 5 + ["0002"], start=1):
+            order_key = f"o#{number:04}"
+            date = f"2024-01-{number:02}T10:00:00"
+            batch.put_item(
+                Item={
+                    "PK": order_key,
+                    "SK": order_key,
+                    "entityType": "order",
+                    "GSI1-PK": f"s#{shop_id}",
+                    "GSI1-SK": date,
+                    "GSI2-PK": f"c#{number % 2}",
+                    "GSI2-SK": date,
+                    "amount": Decimal(number) * 10,
+                }
+            )
+            batch.put_item(
+                Item={
+                    "PK": order_key,
+                    "SK": "p#0011",
+                    "entityType": "orderItem",
+                    "quantity": number,
+                }
+            )
+
+
+def test_put_get_and_delete_items(storage):
+    key = {"PK": "s#0001", "SK": "s#0001"}
+    assert "Item" not in storage.get_item(Key=key)
+    storage.put_item(
+        Item={**key, "name": "Shop", "gsi1Shards": 2, "tags": ["a", "b"]},
+        ConditionExpression="attribute_not_exists(PK)",
+    )
+    item = storage.get_item(Key=key)["Item"]
+    assert item == {**key, "name": "Shop", "gsi1Shards": Decimal(2), "tags": ["a", "b"]}
+    # The items read can be changed without changing the stored item
+    item["tags"].append("c")
+    assert storage.get_item(Key=key)["Item"]["tags"] == ["a", "b"]
+    assert storage.get_item(
+        Key=key,
+        ProjectionExpression="#name, phoneNumber",
+        ExpressionAttributeNames={"#name": "name"},
+    )["Item"] == {"name": "Shop"}
+
+    with pytest.raises(ClientError) as error:
+        storage.put_item(Item=key, ConditionExpression="attribute_not_exists(PK)")
+    assert error.value.response["Error"]["Code"] == "ConditionalCheckFailedException"
+
+    with pytest.raises(ClientError) as error:
+        storage.delete_item(
+            Key=key,
+            ConditionExpression="#name = :name",
+            ExpressionAttributeNames={"#name": "name"},
+            ExpressionAttributeValues={":name": "Other"},
+        )
+    assert error.value.response["Error"]["Code"] == "ConditionalCheckFailedException"
+    storage.delete_item(Key=key, ConditionExpression=Attr("name").eq("Shop"))
+    assert "Item" not in storage.get_item(Key=key)
+
+
+def test_update_items(storage):
+    key = {"PK": "s#0001", "SK": "sales#d#2024-01-01"}
+    for amount in (Decimal("12.5"), Decimal("7.5")):
+        response = storage.update_item(
+            Key=key,
+            UpdateExpression="SET entityType = :type ADD totalAmount :amount, ordersCount :count",
+            ExpressionAttributeValues={
+                ":type": "sales",
+                ":amount": amount,
+                ":count": 1,
+            },
+            ReturnValues="UPDATED_NEW",
+        )
+    assert response["Attributes"]["totalAmount"] == Decimal(20)
+    assert response["Attributes"]["ordersCount"] == Decimal(2)
+
+    storage.update_item(
+        Key=key,
+        UpdateExpression="SET ordersCount = ordersCount + :one, firstDay = if_not_exists(firstDay, :day) REMOVE entityType",
+        ExpressionAttributeValues={":one": 1, ":day": "2024-01-01"},
+    )
+    storage.update_item(
+        Key=key,
+        UpdateExpression="SET firstDay = if_not_exists(firstDay, :day)",
+        ExpressionAttributeValues={":day": "2024-02-01"},
+    )
+    assert storage.get_item(Key=key)["Item"] == {
+        **key,
+        "totalAmount": Decimal(20),
+        "ordersCount": Decimal(3),
+        "firstDay": "2024-01-01",
+    }
+
+    with pytest.raises(ClientError) as error:
+        storage.update_item(
+            Key=key,
+            UpdateExpression="SET ordersCount = :zero",
+            ConditionExpression="attribute_exists(PK) AND (totalAmount < :min OR NOT ordersCount > :zero)",
+            ExpressionAttributeValues={":zero": 0, ":min": 10},
+        )
+    assert error.value.response["Error"]["Code"] == "ConditionalCheckFailedException"
+    with pytest.raises(ClientError) as error:
+        storage.update_item(
+            Key=key,
+            UpdateExpression="SET SK = :sk",
+            ExpressionAttributeValues={":sk": "other"},
+        )
+    assert error.value.response["Error"]["Code"] == "ValidationException"
+
+
+def test_query_the_table_and_the_indexes(storage):
+    put_orders(storage)
+    gsi1_query = {
+        "IndexName": "GSI1",
+        "KeyConditionExpression": Key("GSI1-PK").eq("s#0001")
+        & Key("GSI1-SK").between("2024-01-02", "2024-01-04T99"),
+    }
+    response = storage.query(**gsi1_query)
+    assert [item["PK"] for item in response["Items"]] == ["o#0002", "o#0003", "o#0004"]
+    assert "LastEvaluatedKey" not in response
+    assert storage.query(**gsi1_query, Select="COUNT")["Count"] == 3
+
+    # Newest first, one page at a time
+    orders = []
+    start_key = {}
+    while True:
+        response = storage.query(
+            IndexName="GSI1",
+            KeyConditionExpression=Key("GSI1-PK").eq("s#0001"),
+            ScanIndexForward=False,
+            Limit=2,
+            **start_key,
+        )
+        orders += [item["PK"] for item in response["Items"]]
+        if "LastEvaluatedKey" not in response:
+            break
+        start_key = {"ExclusiveStartKey": response["LastEvaluatedKey"]}
+    assert orders == ["o#0005", "o#0004", "o#0003", "o#0002", "o#0001"]
+
+    response = storage.query(
+        IndexName="GSI2",
+        KeyConditionExpression="#pk = :customer AND #sk >= :date",
+        FilterExpression=Attr("amount").gt(10),
+        ProjectionExpression="PK, amount",
+        ExpressionAttributeNames={"#pk": "GSI2-PK", "#sk": "GSI2-SK"},
+        ExpressionAttributeValues={":customer": "c#1", ":date": "2024-01-01"},
+    )
+    assert response["Items"] == [
+        {"PK": "o#0003", "amount": Decimal(30)},
+        {"PK": "o#0005", "amount": Decimal(50)},
+    ]
+    assert response["ScannedCount"] == 3
+
+    response = storage.query(
+        KeyConditionExpression=Key("PK").eq("o#0003") & Key("SK").begins_with("p#")
+    )
+    assert [item["SK"] for item in response["Items"]] == ["p#0011"]
+
+
+def test_scan_and_batch_requests(storage):
+    put_orders(storage)
+    order_keys = []
+    start_key = {}
+    while True:
+        response = storage.scan(
+            FilterExpression=Attr("entityType").eq("order")
+            & Attr("amount").is_in([Decimal(20), Decimal(60)]),
+            Limit=3,
+            **start_key,
+        )
+        order_keys += [item["PK"] for item in response["Items"]]
+        if "LastEvaluatedKey" not in response:
+            break
+        start_key = {"ExclusiveStartKey": response["LastEvaluatedKey"]}
+    assert sorted(order_keys) == ["o#0002", "o#0006"]
+
+    response = storage.batch_get_item(
+        RequestItems={
+            TABLE_NAME: {
+                "Keys": [
+                    {"PK": "o#0001", "SK": "o#0001"},
+                    {"PK": "o#9999", "SK": "o#9999"},
+                ],
+                "ProjectionExpression": "PK, amount",
+            }
+        }
+    )
+    assert response["Responses"][TABLE_NAME] == [
+        {"PK": "o#0001", "amount": Decimal(10)}
+    ]
+    assert not response["UnprocessedKeys"]
+
+    response = storage.batch_write_item(
+        RequestItems={
+            TABLE_NAME: [
+                {"PutRequest": {"Item": {"PK": "o#0007", "SK": "o#0007"}}},
+                {"DeleteRequest": {"Key": {"PK": "o#0001", "SK": "o#0001"}}},
+            ]
+        }
+    )
+    assert not response["UnprocessedItems"]
+    assert "Item" in storage.get_item(Key={"PK": "o#0007", "SK": "o#0007"})
+    assert "Item" not in storage.get_item(Key={"PK": "o#0001", "SK": "o#0001"})
+    # The deleted order is not in the index anymore
+    response = storage.query(
+        IndexName="GSI1", KeyConditionExpression=Key("GSI1-PK").eq("s#0001")
+    )
+    assert response["Count"] == 4
+
+
+@mock_aws
+def test_data_layer_reads_are_the_same_on_every_storage():
+    ddb = boto3.resource("dynamodb", region_name="eu-west-1")
+    dynamodb_table = DynamodbTestOrdersData(TABLE_NAME, ddb)
+    dynamodb_table.prefill_table_with_testdata()
+    memory_table = DynamodbTestOrdersData(
+        TABLE_NAME, storage=InMemoryStorage(TABLE_NAME)
+    )
+    with memory_table.table.batch_writer() as batch:
+        for item in dynamodb_table.iter_scan():
+            batch.put_item(Item=item)
+
+    for orders_table in (dynamodb_table, memory_table):
+        orders_table.start_shop_resharding("0001", 4)
+        orders_table.put_queued_orders(
+            "0001",
+            [
+                {
+                    "orderId": f"777{number}",
+                    "customerKey": "v#0001",
+                    "date": f"2024-05-0{number}T10:00:00",
+                    "phoneNumber": "0770001111",
+                    "name": "Customer",
+                    "items": [{"productId": "0011", "quantity": number}],
+                }
+                for number in range(1, 4)
+            ],
+        )
+
+    def read(orders_table):
+        customer_orders, cursor = orders_table.list_orders_by_customer(
+            "v#0001", limit=2
+        )
+        return {
+            "shops": orders_table.list_shops(),
+            "products": orders_table.list_products_by_shop_id("0001"),
+            "shopOrders": orders_table.list_orders_by_shop_id("0001"),
+            "ordersFrom": orders_table.list_orders_by_shop_id(
+                "0001", date_from="2024-05-02", fields=["orderId", "amount"]
+            ),
+            "customerOrders": customer_orders,
+            "nextCustomerOrders": orders_table.list_orders_by_customer(
+                "v#0001", limit=2, cursor=cursor
+            ),
+            "order": orders_table.get_order_data("7772"),
+            "orders": orders_table.get_orders_data(["7771", "7773", "0000"]),
+            "sales": orders_table.get_sales_by_shop_id("0001"),
+            "totalAmount": orders_table.get_total_amount_by_shop_id("0001"),
+        }
+
+    memory_reads = read(memory_table)
+    assert len(memory_reads["shopOrders"]) == 5
+    assert memory_reads == read(dynamodb_table)
@@ -0,0 +1,143 @@
+import json
+import os
+import uuid
+import pytest
+import timing_helpers
+from api_helpers import build_api_response, validate_method
+from api_helpers.router import Router
+from dynamodb_helpers import DynamodbTestOrdersData
+from dynamodb_helpers.storage import InMemoryStorage
+from timing_helpers import current_timer, timed_phase
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+
+
+@pytest.fixture
+def orders_table():
+    orders_table = DynamodbTestOrdersData(
+        TABLE_NAME, storage=InMemoryStorage(TABLE_NAME)
+    )
+    orders_table.prefill_table_with_testdata()
+    return orders_table
+
+
+def server_timing_phases(response: dict) -> dict:
+    """Returns the durations of the Server-Timing header by phase"""
+    phases = {}
+    for metric in response["headers"]["Server-Timing"].split(", "):
+        phase, duration = metric.split(";dur=")
+        phases[phase] = float(duration)
+    return phases
+
+
+def test_place_order_phases_are_in_the_server_timing_header(orders_table, monkeypatch):
+    monkeypatch.setattr(timing_helpers, "SERVER_TIMING_HEADER", True)
+    from lambdas.router.main import ROUTES
+
+    router = Router(ROUTES, get_orders_table=lambda: orders_table, package="lambdas")
+    shop_token = orders_table.get_shop_by_id("0001")["shopToken"]
+    response = router.dispatch(
+        {
+            "body": json.dumps(
+                {
+                    "shopId": "0001",
+                    "phoneNumber": "0771112233",
+                    "name": "John Doe",
+                    "items": [{"productId": "0011", "quantity": 1}],
+                }
+            ),
+            "httpMethod": "POST",
+            "path": "/order",
+            "resource": "/order",
+            "headers": None,
+            "queryStringParameters": {"shopToken": shop_token},
+            "pathParameters": None,
+            "requestContext": {
+                "identity": {
+                    "cognitoIdentityPoolId": str(uuid.uuid4()),
+                    "cognitoIdentityId": f"eu-west-1:{uuid.uuid4()}",
+                    "cognitoAuthenticationType": "unauthenticated",
+                    "cognitoAuthenticationProvider": None,
+                }
+            },
+        }
+    )
+
+    assert response["statusCode"] == 200
+    phases = server_timing_phases(response)
+    # The shop and the products are read on the threads of concurrency_helpers
+    assert {
+        "parse",
+        "shop_lookup",
+        "product_pricing",
+        "order_write",
+        "serialize",
+    } <= phases.keys()
+    assert list(phases)[-1] == "total"
+    assert all(duration >= 0 for duration in phases.values())
+    assert response["headers"]["Timing-Allow-Origin"] == os.environ["CORS_ORIGIN"]
+
+
+def test_phase_metrics_of_a_handler(monkeypatch, capsys):
+    monkeypatch.setattr(timing_helpers, "PHASE_METRICS", True)
+
+    @validate_method("GET", logger=None)
+    def lambda_handler(event, context):
+        with timed_phase("shop_lookup"):
+            pass
+        with timed_phase("shop_lookup"):
+            pass
+        return build_api_response(200, {"ok": True})
+
+    event = {
+        "body": None,
+        "httpMethod": "GET",
+        "path": "/shop/0001",
+        "resource": "/shop/{id}",
+        "headers": None,
+        "queryStringParameters": None,
+        "pathParameters": {"id": "0001"},
+    }
+    response = lambda_handler(event, None)
+    # Opt-in: only the metrics are enabled
+    assert "Server-Timing" not in response["headers"]
+    # One Embedded Metric Format blob per phase
+    metrics = [
+        json.loads(line)
+        for line in capsys.readouterr().out.splitlines()
+        if line.startswith("{")
+    ]
+    assert [metric["phase"] for metric in metrics] == [
+        "parse",
+        "shop_lookup",
+        "serialize",
+        "total",
+    ]
+    assert {metric["handler"] for metric in metrics} == {"tests"}
+    assert all(len(metric["PhaseDuration"]) == 1 for metric in metrics)
+
+
+def test_phases_are_not_timed_when_disabled(monkeypatch):
+    monkeypatch.setattr(timing_helpers, "SERVER_TIMING_HEADER", False)
+    monkeypatch.setattr(timing_helpers, "PHASE_METRICS", False)
+    timers = []
+
+    @validate_method("GET", logger=None)
+    def lambda_handler(event, context):
+        timers.append(current_timer())
+        return build_api_response(200, {})
+
+    response = lambda_handler(
+        {
+            "body": None,
+            "httpMethod": "GET",
+            "path": "/shops",
+            "resource": "/shops",
+            "headers": None,
+            "queryStringParameters": None,
+            "pathParameters": None,
+        },
+        None,
+    )
+    assert timers == [None]
+    assert "Server-Timing" not in response["headers"]
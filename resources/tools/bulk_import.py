@@ -0,0 +1,59 @@
+"""
+Imports shops, products and orders from an NDJSON or CSV file (optionally gzip compressed)
+into the orders table with parallel batch writers, see dynamodb_helpers.importer.
+
+Usage (from the resources folder, with AWS credentials):
+    python tools/bulk_import.py FILE --table TABLE_NAME [--writers 8] [--format ndjson]
+
+    e.g. python tools/bulk_import.py orders.ndjson.gz --table ApiSecurityDemo-Table
+
+After importing orders, run the rebuild_sales_rollups migration so that the shop sales
+include them, and the ensure_shop_token migration for the shops imported without token.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+RESOURCES_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RESOURCES_DIR / "lambdas" / "helpers_layer"))
+
+from dynamodb_helpers import get_orders_table  # noqa: E402
+from dynamodb_helpers.importer import (  # noqa: E402
+    IMPORT_FORMATS,
+    BulkImporter,
+    read_records,
+)
+
+
+def guess_format(file: str) -> str:
+    """Returns the format of a file from its extension, e.g. orders.csv.gz is csv"""
+    suffixes = Path(file).suffixes
+    if suffixes and suffixes[-1] == ".gz":
+        suffixes = suffixes[:-1]
+    return "csv" if suffixes and suffixes[-1] == ".csv" else "ndjson"
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("file", help="The NDJSON or CSV file, .gz to decompress it")
+    parser.add_argument("--table", required=True, help="The name of the orders table")
+    parser.add_argument("--writers", type=int, default=8, help="Parallel batch writers")
+    parser.add_argument(
+        "--format",
+        choices=IMPORT_FORMATS,
+        help="The file format (default from the file extension)",
+    )
+    args = parser.parse_args(argv)
+
+    importer = BulkImporter(get_orders_table(args.table), writers=args.writers)
+    report = importer.run(
+        read_records(args.file, args.format or guess_format(args.file))
+    )
+    print(json.dumps(report, indent=2))
+    return 0 if not report["rejectedRecords"] and not report["failedItems"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Reports the import cost of each Lambda handler, to measure cold start regressions locally.
+
+Each handler module is imported in a fresh Python interpreter with "-X importtime" and the
+self import time of every imported module is summed per top level package.
+
+Usage (from the resources folder):
+    python tools/import_time_report.py [handler ...] [--top 10] [--json]
+
+    e.g. python tools/import_time_report.py get_shop place_order
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+RESOURCES_DIR = Path(__file__).resolve().parent.parent
+LAMBDAS_DIR = RESOURCES_DIR / "lambdas"
+
+
+def find_handlers() -> dict[str, str]:
+    """Returns the handler modules by handler name, e.g. {"get_shop": "lambdas.get_shop.main"}"""
+    handlers = {}
+    for main_file in sorted(LAMBDAS_DIR.glob("*/main.py")):
+        handlers[main_file.parent.name] = f"lambdas.{main_file.parent.name}.main"
+    for index_file in sorted(LAMBDAS_DIR.glob("migrations/*/index.py")):
+        handlers[f"migrations/{index_file.parent.name}"] = (
+            f"lambdas.migrations.{index_file.parent.name}.index"
+        )
+    return handlers
+
+
+def parse_importtime(output: str) -> list[tuple[str, int, int]]:
+    """
+    Parses the "-X importtime" output into a list of (module, self_us, cumulative_us).
+    The lines look like "import time:       125 |        532 |   boto3.session"
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # The header line
+            continue
+        modules.append(
+            (fields[2].strip(), int(fields[0].strip()), int(fields[1].strip()))
+        )
+    return modules
+
+
+def measure_handler(module_name: str) -> dict:
+    """Imports the handler module in a fresh interpreter and returns its import cost"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(LAMBDAS_DIR / "helpers_layer"), str(RESOURCES_DIR)]
+    )
+    # The handlers build their AWS clients at import time, which requires a region
+    env.setdefault("AWS_DEFAULT_REGION", "eu-west-1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        cwd=RESOURCES_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    modules = parse_importtime(result.stderr)
+    packages = defaultdict(int)
+    for name, self_us, _ in modules:
+        packages[name.split(".")[0]] += self_us
+    return {
+        "module": module_name,
+        "ok": result.returncode == 0,
+        "total_ms": sum(self_us for _, self_us, _ in modules) / 1000,
+        "modules_count": len(modules),
+        "packages_ms": {
+            package: self_us / 1000
+            for package, self_us in sorted(
+                packages.items(), key=lambda item: item[1], reverse=True
+            )
+        },
+    }
+
+
+def print_report(report: dict, top: int) -> None:
+    for handler, data in report.items():
+        status = "" if data["ok"] else " (import failed)"
+        print(
+            f"{handler}: {data['total_ms']:.1f} ms, {data['modules_count']} modules{status}"
+        )
+        for package, duration in list(data["packages_ms"].items())[:top]:
+            print(f"    {duration:9.1f} ms  {package}")
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("handlers", nargs="*", help="Handlers to measure (default all)")
+    parser.add_argument(
+        "--top", type=int, default=10, help="Packages listed per handler"
+    )
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    handlers = find_handlers()
+    unknown = [handler for handler in args.handlers if handler not in handlers]
+    if unknown:
+        parser.error(f"Unknown handlers {unknown}. Available: {list(handlers)}")
+    selected = args.handlers or list(handlers)
+
+    report = {handler: measure_handler(handlers[handler]) for handler in selected}
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, args.top)
+    return 0 if all(data["ok"] for data in report.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
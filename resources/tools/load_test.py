@@ -0,0 +1,506 @@
+"""
+Replays a mix of API requests on the lambda_handler functions in-process, on many threads,
+to measure how the handlers behave under concurrent traffic (e.g. the contention on the
+shared DynamoDB resource and connection pool).
+
+The handlers run against a local DynamoDB stand-in (the moto server) prefilled with the
+test data, against another endpoint (e.g. DynamoDB Local) or, with --storage memory,
+against an in-memory storage to measure the handlers without the DynamoDB round trips.
+The latencies are recorded in HDR-style histograms per operation.
+
+Without --rate the load is closed-loop: each thread sends its next request as soon as the
+previous one is answered. With --rate the load is open-loop: the requests are started at
+the given rate whether or not the previous ones are answered, and their latency is
+measured from the time they were scheduled, so that the queueing is not hidden
+("coordinated omission").
+
+Usage (from the resources folder):
+    python tools/load_test.py [--mix list_products=80,get_order=15,place_order=5]
+        [--threads 16] [--requests 2000 | --duration 30] [--rate 200]
+        [--storage dynamodb | memory] [--json]
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+RESOURCES_DIR = Path(__file__).resolve().parent.parent
+HELPERS_LAYER_DIR = RESOURCES_DIR / "lambdas" / "helpers_layer"
+
+DEFAULT_MIX = "list_products=80,get_order=15,place_order=5"
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of latencies in microseconds: the values are counted in buckets
+    whose width grows with the value, so that every value is recorded with the given number
+    of significant digits (2: less than 1% error) in a constant, small memory.
+
+    Args:
+        significant_digits (int): The precision of the recorded values
+    """
+
+    def __init__(self, significant_digits: int = 2):
+        # Values below sub_bucket_count are counted exactly, above they are counted in
+        # buckets of half_count sub buckets, each twice as wide as in the previous bucket
+        self.sub_bucket_bits = math.ceil(math.log2(2 * 10**significant_digits))
+        self.sub_bucket_count = 1 << self.sub_bucket_bits
+        self.half_count = self.sub_bucket_count // 2
+        self.counts = {}
+        self.total_count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        if value < self.sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        # The sub bucket is in [half_count, sub_bucket_count) above the exact values
+        return shift * self.half_count + (value >> shift)
+
+    def _value_range(self, index: int) -> tuple[int, int]:
+        """Returns the lowest and highest values counted at an index"""
+        if index < self.sub_bucket_count:
+            return index, index
+        shift = index // self.half_count - 1
+        sub_bucket = index % self.half_count + self.half_count
+        return sub_bucket << shift, ((sub_bucket + 1) << shift) - 1
+
+    def record(self, value_us: float) -> None:
+        value = max(0, int(value_us))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total_count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total_count += other.total_count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent: float) -> int:
+        """Returns the value below which percent of the values are, within the precision
+        of the histogram"""
+        if not self.total_count:
+            return 0
+        rank = max(1, math.ceil(self.total_count * percent / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._value_range(index)[1], self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        """Returns the count and the mean, p50, p95, p99, p99.9 and max latencies in ms"""
+        return {
+            "count": self.total_count,
+            "meanMs": round(self.total / self.total_count / 1000, 2)
+            if self.total_count
+            else 0,
+            **{
+                f"p{percent:g}Ms": round(self.percentile(percent) / 1000, 2)
+                for percent in (50, 95, 99, 99.9)
+            },
+            "maxMs": round(self.max / 1000, 2),
+        }
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    """Parses a request mix like "list_products=80,get_order=20" into weights"""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name}, use one of {list(OPERATIONS)}")
+        weights[name] = float(weight or 1)
+    if not weights or sum(weights.values()) <= 0:
+        raise ValueError(f"Invalid request mix {mix}")
+    return weights
+
+
+class LambdaContext:
+    """The attributes of the Lambda context read by the handlers and their decorators"""
+
+    function_name = "load-test"
+    function_version = "$LATEST"
+    memory_limit_in_mb = 1024
+    invoked_function_arn = "arn:aws:lambda:eu-west-1:123456789012:function:load-test"
+
+    def __init__(self, request_number: int):
+        self.aws_request_id = f"load-test-{request_number}"
+
+    @staticmethod
+    def get_remaining_time_in_millis() -> int:
+        return 30000
+
+
+class RequestData:
+    """The shops, products and orders of the test data the requests are built from"""
+
+    def __init__(self, orders_table):
+        self.shops = []
+        self.orders = []
+        for shop in orders_table.list_shops():
+            products = orders_table.list_products_by_shop_id(shop["shopId"])
+            self.shops.append((shop["shopId"], shop["shopToken"], products))
+            self.orders += [
+                (order["orderId"], order["customerId"])
+                for order in orders_table.list_orders_by_shop_id(shop["shopId"])
+                if order["customerId"]
+            ]
+
+
+def _event(
+    method, path, resource, path_parameters=None, query=None, identity=None, body=None
+):
+    return {
+        "httpMethod": method,
+        "path": path,
+        "resource": resource,
+        "headers": {"content-type": "application/json"},
+        "pathParameters": path_parameters,
+        "queryStringParameters": query,
+        "requestContext": {"identity": {"sourceIp": "127.0.0.1", **(identity or {})}},
+        "body": json.dumps(body) if body is not None else None,
+    }
+
+
+def _identity(customer_id: str) -> dict:
+    return {
+        "cognitoIdentityId": f"eu-west-1:{customer_id}",
+        "cognitoAuthenticationType": "unauthenticated",
+    }
+
+
+def list_products_event(data: RequestData, generator: random.Random) -> dict:
+    shop_id, shop_token, _ = generator.choice(data.shops)
+    return _event(
+        "GET",
+        "/products",
+        "/products",
+        query={"shopId": shop_id, "shopToken": shop_token},
+    )
+
+
+def get_order_event(data: RequestData, generator: random.Random) -> dict:
+    order_id, customer_id = generator.choice(data.orders)
+    return _event(
+        "GET",
+        f"/order/{order_id}",
+        "/order/{id}",
+        path_parameters={"id": order_id},
+        identity=_identity(customer_id),
+    )
+
+
+def place_order_event(data: RequestData, generator: random.Random) -> dict:
+    shop_id, shop_token, products = generator.choice(data.shops)
+    items = [
+        {"productId": product["productId"], "quantity": generator.randint(1, 3)}
+        for product in generator.sample(products, generator.randint(1, len(products)))
+    ]
+    return _event(
+        "POST",
+        "/order",
+        "/order",
+        query={"shopToken": shop_token},
+        identity=_identity(f"{generator.getrandbits(128):032x}"),
+        body={
+            "shopId": shop_id,
+            "phoneNumber": "0771112233",
+            "name": "Load Test",
+            "items": items,
+        },
+    )
+
+
+def get_shop_event(data: RequestData, generator: random.Random) -> dict:
+    shop_id = generator.choice(data.shops)[0]
+    return _event(
+        "GET", f"/shop/{shop_id}", "/shop/{id}", path_parameters={"id": shop_id}
+    )
+
+
+def list_shop_orders_event(data: RequestData, generator: random.Random) -> dict:
+    shop_id = generator.choice(data.shops)[0]
+    return _event(
+        "GET",
+        f"/shop/{shop_id}/orders",
+        "/shop/{id}/orders",
+        path_parameters={"id": shop_id},
+    )
+
+
+# The handler module and the event builder of each operation
+OPERATIONS = {
+    "list_products": ("list_products", list_products_event),
+    "get_order": ("get_order", get_order_event),
+    "place_order": ("place_order", place_order_event),
+    "get_shop": ("get_shop", get_shop_event),
+    "list_shop_orders": ("list_shop_orders", list_shop_orders_event),
+}
+
+
+class LoadTest:
+    """
+    Sends requests of a mix of operations to the lambda_handler functions on a pool of
+    threads and records their latencies.
+
+    Args:
+        handlers (dict): The lambda_handler function of each operation of the mix
+        data (RequestData): The test data the requests are built from
+        weights (dict): The weight of each operation in the mix
+        threads (int): The number of threads sending the requests
+        rate (float): The requests started per second (open-loop), None for closed-loop
+        seed (int): The seed of the random requests
+    """
+
+    def __init__(
+        self,
+        handlers: dict,
+        data: RequestData,
+        weights: dict[str, float],
+        threads: int = 16,
+        rate: float = None,
+        seed: int = 0,
+    ):
+        self.handlers = handlers
+        self.data = data
+        self.operations = list(weights)
+        self.weights = list(weights.values())
+        self.threads = threads
+        self.rate = rate
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._worker_results = []
+
+    def _results(self) -> dict:
+        """Returns the results of the current thread, recorded without locking"""
+        results = getattr(self._local, "results", None)
+        if results is None:
+            results = {
+                operation: {"histogram": LatencyHistogram(), "statuses": {}}
+                for operation in self.operations
+            }
+            self._local.results = results
+            with self._lock:
+                self._worker_results.append(results)
+        return results
+
+    def _send(self, request_number: int, operation: str, event: dict, start: float):
+        """Invokes the handler, start is the time the request was scheduled"""
+        try:
+            response = self.handlers[operation](event, LambdaContext(request_number))
+            status = str(response.get("statusCode"))
+        except Exception as e:
+            status = type(e).__name__
+        results = self._results()[operation]
+        results["histogram"].record((time.perf_counter() - start) * 1e6)
+        results["statuses"][status] = results["statuses"].get(status, 0) + 1
+
+    def run(self, requests: int = None, duration: float = None) -> dict:
+        """Sends the given number of requests, or requests for duration seconds, and returns
+        the report"""
+        if requests is None and duration is None:
+            raise ValueError("Either requests or duration must be set")
+        generator = random.Random(self.seed)
+        start = time.perf_counter()
+        deadline = start + duration if duration is not None else math.inf
+        sent = 0
+        with ThreadPoolExecutor(
+            max_workers=self.threads, thread_name_prefix="load-test"
+        ) as executor:
+            if self.rate is None:
+                # Closed-loop: at most one request in flight per thread
+                in_flight = threading.BoundedSemaphore(self.threads)
+
+                def send_closed_loop(*args):
+                    try:
+                        self._send(*args)
+                    finally:
+                        in_flight.release()
+
+            while (
+                requests is None or sent < requests
+            ) and time.perf_counter() < deadline:
+                operation = generator.choices(self.operations, self.weights)[0]
+                event = OPERATIONS[operation][1](self.data, generator)
+                if self.rate is None:
+                    in_flight.acquire()
+                    executor.submit(
+                        send_closed_loop, sent, operation, event, time.perf_counter()
+                    )
+                else:
+                    scheduled = start + sent / self.rate
+                    delay = scheduled - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    executor.submit(self._send, sent, operation, event, scheduled)
+                sent += 1
+        return self._report(sent, time.perf_counter() - start)
+
+    def _report(self, sent: int, seconds: float) -> dict:
+        operations = {}
+        total = LatencyHistogram()
+        total_errors = 0
+        for operation in self.operations:
+            histogram = LatencyHistogram()
+            statuses = {}
+            for worker_results in self._worker_results:
+                histogram.merge(worker_results[operation]["histogram"])
+                for status, count in worker_results[operation]["statuses"].items():
+                    statuses[status] = statuses.get(status, 0) + count
+            errors = sum(
+                count
+                for status, count in statuses.items()
+                if not status.startswith("2")
+            )
+            total.merge(histogram)
+            total_errors += errors
+            operations[operation] = {
+                **histogram.summary(),
+                "errors": errors,
+                "errorRate": round(errors / histogram.total_count, 4)
+                if histogram.total_count
+                else 0,
+                "statuses": statuses,
+            }
+        return {
+            "mode": "open-loop" if self.rate is not None else "closed-loop",
+            "threads": self.threads,
+            "targetRate": self.rate,
+            "requests": sent,
+            "seconds": round(seconds, 3),
+            "requestsPerSecond": round(sent / seconds, 1),
+            "errors": total_errors,
+            "errorRate": round(total_errors / sent, 4) if sent else 0,
+            "latency": total.summary(),
+            "operations": operations,
+        }
+
+
+def configure_environment(threads: int, endpoint_url: str = None) -> None:
+    """Sets the environment read by the handlers before they are imported"""
+    os.environ.setdefault("AWS_DEFAULT_REGION", "eu-west-1")
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    os.environ.setdefault("TABLE_NAME", "local-OrdersTable")
+    os.environ.setdefault("CORS_ORIGIN", "*")
+    # Every thread must be able to keep its own connection to DynamoDB
+    os.environ.setdefault("AWS_CLIENT_MAX_POOL_CONNECTIONS", str(max(threads * 2, 20)))
+    os.environ.setdefault("POWERTOOLS_LOG_LEVEL", "WARNING")
+    os.environ.setdefault("POWERTOOLS_TRACE_DISABLED", "true")
+    os.environ.setdefault("POWERTOOLS_METRICS_DISABLED", "true")
+    if endpoint_url:
+        os.environ["AWS_ENDPOINT_URL_DYNAMODB"] = endpoint_url
+
+
+def load_handlers(operations: list[str]) -> dict:
+    """Imports the lambda_handler of each operation, as in the Lambda init phase"""
+    import importlib
+
+    return {
+        operation: importlib.import_module(
+            f"lambdas.{OPERATIONS[operation][0]}.main"
+        ).lambda_handler
+        for operation in operations
+    }
+
+
+def print_report(report: dict) -> None:
+    print(
+        f"{report['mode']}, {report['threads']} threads: {report['requests']} requests in "
+        f"{report['seconds']} s, {report['requestsPerSecond']} requests/s, "
+        f"{report['errorRate']:.2%} errors"
+    )
+    rows = [("all", report["latency"], report["errors"])] + [
+        (operation, data, data["errors"])
+        for operation, data in report["operations"].items()
+    ]
+    print(f"{'':18}{'count':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  errors")
+    for name, data, errors in rows:
+        print(
+            f"{name:18}{data['count']:8}{data['p50Ms']:9.2f}{data['p95Ms']:9.2f}"
+            f"{data['p99Ms']:9.2f}{data['maxMs']:9.2f}  {errors}"
+        )
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Operations and weights")
+    parser.add_argument("--threads", type=int, default=16, help="Sending threads")
+    parser.add_argument("--requests", type=int, help="Requests to send (default 2000)")
+    parser.add_argument("--duration", type=float, help="Seconds to send requests for")
+    parser.add_argument("--rate", type=float, help="Requests per second (open-loop)")
+    parser.add_argument("--endpoint-url", help="DynamoDB endpoint, e.g. DynamoDB Local")
+    parser.add_argument(
+        "--storage",
+        choices=["dynamodb", "memory"],
+        default="dynamodb",
+        help="Store the items in DynamoDB or in memory",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed of the random requests"
+    )
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+    try:
+        weights = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.requests is None and args.duration is None:
+        args.requests = 2000
+
+    sys.path[:0] = [str(HELPERS_LAYER_DIR), str(RESOURCES_DIR)]
+    configure_environment(args.threads, args.endpoint_url)
+    os.environ["ORDERS_TABLE_STORAGE"] = args.storage
+    moto_server = None
+    if args.storage == "dynamodb" and not args.endpoint_url:
+        from lambdas.router.server import start_local_dynamodb
+
+        moto_server, endpoint_url = start_local_dynamodb()
+        os.environ["AWS_ENDPOINT_URL"] = endpoint_url
+    try:
+        from dynamodb_helpers import get_orders_table
+        from log_helpers import CustomLogger
+
+        orders_table = get_orders_table(os.environ["TABLE_NAME"], CustomLogger())
+        orders_table.prefill_table_with_testdata()
+        load_test = LoadTest(
+            load_handlers(list(weights)),
+            RequestData(orders_table),
+            weights,
+            threads=args.threads,
+            rate=args.rate,
+            seed=args.seed,
+        )
+        report = load_test.run(args.requests, args.duration)
+    finally:
+        if moto_server is not None:
+            moto_server.stop()
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 0 if report["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
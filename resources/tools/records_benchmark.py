@@ -0,0 +1,135 @@
+"""
+Compares the memory and CPU cost of listings held as item dicts and as the __slots__
+records of dynamodb_helpers.records.
+
+For each entity, N synthetic table items are mapped to the dicts returned by the data layer
+and to records, then serialized to the JSON body of an API response. The memory is the peak traced by tracemalloc while the listing is held.
+
+Usage (from the resources folder):
+    python tools/records_benchmark.py [--items 100000] [--repeat 3] [--json]
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from decimal import Decimal
+from pathlib import Path
+
+RESOURCES_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RESOURCES_DIR / "lambdas" / "helpers_layer"))
+
+from api_helpers import DecimalEncoder  # noqa: E402
+from dynamodb_helpers import DynamodbTestOrdersData  # noqa: E402
+from dynamodb_helpers.records import Order, Product  # noqa: E402
+
+
+def product_items(count: int) -> list[dict]:
+    return [
+        {
+            "PK": "s#0001",
+            "SK": f"p#{number:06d}",
+            "entityType": "product",
+            "name": f"Product {number}",
+            "description": "A product",
+            "price": Decimal("12.50"),
+        }
+        for number in range(count)
+    ]
+
+
+def order_items(count: int) -> list[dict]:
+    return [
+        {
+            "PK": f"o#{number:06d}",
+            "SK": f"o#{number:06d}",
+            "entityType": "order",
+            "GSI1-PK": f"s#0001#{number % 4}",
+            "GSI1-SK": "2024-03-01T10:00:00Z",
+            "GSI2-PK": "c#0042",
+            "GSI2-SK": "2024-03-01T10:00:00Z",
+            "date": "2024-03-01T10:00:00Z",
+            "name": "Jane",
+            "phoneNumber": "+41 79 000 00 00",
+            "status": "PENDING",
+            "amount": Decimal("25"),
+        }
+        for number in range(count)
+    ]
+
+
+def measure(make_items, mapper, repeat: int) -> dict:
+    """Returns the time to map and serialize the listing and the memory of the listing"""
+    map_seconds = serialize_seconds = float("inf")
+    for _ in range(repeat):
+        items = make_items()
+        start = time.perf_counter()
+        listing = [mapper(item) for item in items]
+        map_seconds = min(map_seconds, time.perf_counter() - start)
+        del items
+        start = time.perf_counter()
+        json.dumps({"list": listing}, cls=DecimalEncoder, sort_keys=True)
+        serialize_seconds = min(serialize_seconds, time.perf_counter() - start)
+        del listing
+    # The memory still used by the listing once the items read from the table are freed
+    tracemalloc.start()
+    items = make_items()
+    listing = [mapper(item) for item in items]
+    del items
+    listing_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del listing
+    return {
+        "map_ms": round(map_seconds * 1000, 1),
+        "serialize_ms": round(serialize_seconds * 1000, 1),
+        "listing_mb": round(listing_bytes / 1024 / 1024, 1),
+    }
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=100000, help="Items per listing")
+    parser.add_argument("--repeat", type=int, default=3, help="Best of repeat runs")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = {}
+    for entity, make_items, mappers in [
+        (
+            "products",
+            product_items,
+            {
+                "dicts": DynamodbTestOrdersData._abstract_product_item_schema,
+                "records": Product.from_item,
+            },
+        ),
+        (
+            "orders",
+            order_items,
+            {
+                "dicts": DynamodbTestOrdersData._abstract_order_item_schema,
+                "records": Order.from_item,
+            },
+        ),
+    ]:
+        for name, mapper in mappers.items():
+            report[f"{entity} {name}"] = measure(
+                lambda make_items=make_items: make_items(args.items),
+                mapper,
+                args.repeat,
+            )
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{args.items} items per listing, best of {args.repeat}")
+        for name, data in report.items():
+            print(
+                f"{name:18} map {data['map_ms']:8.1f} ms  serialize {data['serialize_ms']:8.1f} ms"
+                f"  listing {data['listing_mb']:6.1f} MB"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())